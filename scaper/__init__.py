@@ -4,4 +4,16 @@
 from .core import Scaper
 from .core import generate_from_jams
 from .core import trim
+from .corpus import pack_corpus
+from .corpus import PackedCorpus
+from .corpus import prepare_corpus
+from .ring import SharedAudioRing
+from .writer import AsyncWriter
+from .jsonl import JsonlWriter
+from .jsonl import read_jsonl
+from .jsonl import load_jsonl
+from .dataset import DatasetWriter
+from .dataset import Dataset
+from .shards import ShardWriter
+from .shards import read_shard
 from .version import version as __version__
@@ -0,0 +1,520 @@
+'''
+Batch generation
+================
+'''
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import functools
+import glob
+import itertools
+import json
+import numbers
+import os
+import shutil
+import numpy as np
+from .jams_io import save_jams
+from .scaper_exceptions import ScaperError
+from .util import _randint
+from .util import _random_state_from_seed
+
+
+BATCH_MANIFEST = '.scaper_batch.{:d}-of-{:d}.jsonl'
+
+# Object shared by the jobs run in a worker process, see _iter_jobs
+_WORKER_SHARED = None
+
+
+def _seed_sequence(seed, random_state):
+    '''
+    Root seed sequence of a batch.
+
+    Parameters
+    ----------
+    seed : int, sequence of ints, np.random.SeedSequence or None
+        Seed of the batch. If None, the seed is drawn from ``random_state``.
+    random_state : np.random.RandomState or np.random.Generator
+        Random state used to draw the seed if ``seed`` is None.
+
+    Returns
+    -------
+    seed_sequence : np.random.SeedSequence
+
+    '''
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if seed is None:
+        seed = _randint(random_state, 2**32, size=4, dtype=np.uint64)
+    # plain ints, so that the entropy can be recorded in manifests
+    if isinstance(seed, numbers.Integral):
+        seed = int(seed)
+    else:
+        seed = [int(x) for x in seed]
+    return np.random.SeedSequence(seed)
+
+
+def _item_seed(seed_sequence, index):
+    '''
+    Seed sequence of the item of a batch at ``index``: the same as
+    ``seed_sequence.spawn(n)[index]`` for a fresh ``seed_sequence``, without
+    creating the seed sequences of the other items.
+    '''
+    return np.random.SeedSequence(
+        seed_sequence.entropy,
+        spawn_key=tuple(seed_sequence.spawn_key) + (index,),
+        pool_size=seed_sequence.pool_size)
+
+
+def _check_filename_template(filename_template):
+    '''
+    Check that a file name template gives a different name to every item of
+    a batch.
+
+    Raises
+    ------
+    ScaperError
+        If the template can't be formatted with an index, or gives the same
+        name to different indices.
+
+    '''
+    try:
+        names = [filename_template.format(index=index) for index in (0, 1)]
+    except (KeyError, IndexError, ValueError):
+        names = None
+    if names is None or names[0] == names[1]:
+        raise ScaperError(
+            'filename_template must give a different name to every '
+            'soundscape, e.g. by including {index}.')
+
+
+def _item_paths(out_dir, filename_template, index, save_audio=True,
+                save_jams=True, save_txt=True, audio_extension='.wav'):
+    '''
+    Output paths of an item of a batch.
+
+    Parameters
+    ----------
+    out_dir : str
+        Folder in which the items are saved.
+    filename_template : str
+        Template of the file names (without extension), formatted with the
+        index of each item as ``filename_template.format(index=index)``.
+    index : int
+        Index of the item.
+    save_audio : bool
+        Whether the audio file is saved.
+    save_jams : bool
+        Whether the JAMS file is saved.
+    save_txt : bool
+        Whether the simplified txt annotation is saved.
+    audio_extension : str
+        Extension of the audio file (default '.wav').
+
+    Returns
+    -------
+    paths : tuple
+        The (audio_path, jams_path, txt_path) of the item, where paths of
+        files that are not saved are None.
+
+    '''
+    base = os.path.join(out_dir, filename_template.format(index=index))
+    return (base + audio_extension if save_audio else None,
+            base + '.jams' if save_jams else None,
+            base + '.txt' if save_txt else None)
+
+
+def _read_manifests(out_dir, entropy):
+    '''
+    Indices of the items of a batch already generated in ``out_dir``, as
+    recorded in the manifests of all its shards.
+
+    Parameters
+    ----------
+    out_dir : str
+        Folder in which the items are saved.
+    entropy : int or sequence of ints
+        Entropy of the seed sequence of the batch.
+
+    Returns
+    -------
+    done : set
+        Indices of the generated items.
+
+    Raises
+    ------
+    ScaperError
+        If the manifests record items of a batch with a different seed.
+
+    '''
+    # compare with the entropy as it is read back from JSON
+    entropy = json.loads(json.dumps(entropy))
+    done = set()
+    pattern = os.path.join(
+        glob.escape(out_dir), BATCH_MANIFEST.replace('{:d}', '*'))
+    for manifest_path in glob.glob(pattern):
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # line left incomplete by an interrupted process
+                    continue
+                if entry['entropy'] != entropy:
+                    raise ScaperError(
+                        '{:s} contains soundscapes generated with a different '
+                        'seed, use the same seed to resume a batch.'.format(
+                            out_dir))
+                done.add(entry['index'])
+    return done
+
+
+def _end_manifest_line(manifest_path):
+    '''
+    Terminate the last line of a manifest if it was left incomplete by an
+    interrupted process, so that new entries start on a line of their own.
+    '''
+    if not os.path.isfile(manifest_path) or \
+            os.path.getsize(manifest_path) == 0:
+        return
+    with open(manifest_path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+
+def _temp_path(path):
+    '''
+    Hidden path next to ``path``, with the same extension, to write a file
+    to before renaming it to ``path``.
+    '''
+    folder, name = os.path.split(path)
+    return os.path.join(folder, '.tmp{:d}.{:s}'.format(os.getpid(), name))
+
+
+def _generate_item(sc, index, seed_sequence, audio_path, jams_path,
+                   txt_path, generate_kwargs, manifest_path=None,
+                   writer=None, dataset_writer=None, shard_writer=None,
+                   shard_key=None):
+    '''
+    Generate and save one soundscape of a batch.
+
+    The Scaper object is copied and given a random state seeded from
+    ``seed_sequence``, so that the soundscape only depends on its seed and
+    not on the worker it runs in or on the other items of the batch. The
+    random state is a Generator with the same type of bit generator if the
+    Scaper object uses a Generator, otherwise a RandomState.
+
+    Outputs are written to temporary files that are renamed once complete,
+    the JAMS file last, so an interrupted item never leaves partial files
+    under its final paths. Once all outputs are in place, the item is
+    appended to the manifest.
+
+    If ``writer`` is given, the files are written by the writer's threads,
+    and so are the renaming and the manifest entry, once the files are
+    written. If ``dataset_writer`` is given, the soundscape is also appended
+    to its dataset, with the index of the item as key. If ``shard_writer``
+    is given, the soundscape is also written to its tar shards with
+    ``shard_key`` as key, and the item is only appended to the manifest
+    once its tar shard is finalized.
+
+    Returns
+    -------
+    paths : tuple
+        The (audio_path, jams_path, txt_path) of the soundscape.
+
+    '''
+    sc = copy.copy(sc)
+    sc.random_state = _random_state_from_seed(seed_sequence, sc.random_state)
+    if dataset_writer is not None and dataset_writer.save_stems and \
+            sc.event_audio_format is None:
+        sc.event_audio_format = 'sparse'
+
+    temp_audio_path = audio_path and _temp_path(audio_path)
+    temp_txt_path = txt_path and _temp_path(txt_path)
+    audio, jam, annotation_list, event_audio_list = sc.generate(
+        audio_path=temp_audio_path, txt_path=temp_txt_path, writer=writer,
+        **generate_kwargs)
+
+    # Record the final paths in the annotation, as if the files had been
+    # written there directly
+    ann = jam.annotations.search(namespace='scaper')[0]
+    ann.sandbox.scaper.audio_path = audio_path
+    ann.sandbox.scaper.jams_path = jams_path
+    ann.sandbox.scaper.txt_path = txt_path
+    if 'soundscape_audio_path' in ann.sandbox.scaper:
+        ann.sandbox.scaper.soundscape_audio_path = audio_path
+
+    if dataset_writer is not None:
+        dataset_writer.write(audio, jam, event_audio_list, key=index)
+
+    if shard_writer is not None:
+        record = functools.partial(
+            _record_item, manifest_path, index, seed_sequence, audio_path,
+            jams_path, txt_path, writer=writer)
+        manifest_path = None
+        shard_writer.write(audio, jam, annotation_list, key=shard_key,
+                           on_finalize=record)
+
+    args = (jam, index, seed_sequence, audio_path, temp_audio_path,
+            jams_path, txt_path, temp_txt_path, manifest_path)
+    if writer is None:
+        _finalize_item(*args)
+    else:
+        # The writer runs its calls in order, so the writes this waits for
+        # have all started by the time it runs
+        writer.submit(_finalize_item, *args, wait=writer.pending())
+    return audio_path, jams_path, txt_path
+
+
+def _finalize_item(jam, index, seed_sequence, audio_path, temp_audio_path,
+                   jams_path, txt_path, temp_txt_path, manifest_path,
+                   wait=()):
+    '''
+    Move the files of an item of a batch to their final paths, save its
+    JAMS file and append it to the manifest, see ``_generate_item``.
+
+    Parameters
+    ----------
+    wait : sequence of concurrent.futures.Future
+        Writes to wait for before moving the files.
+
+    '''
+    for future in wait:
+        future.result()
+    ann = jam.annotations.search(namespace='scaper')[0]
+    if temp_audio_path is not None:
+        os.replace(temp_audio_path, audio_path)
+        temp_events_path = '{:s}_events'.format(
+            os.path.splitext(temp_audio_path)[0])
+        if os.path.isdir(temp_events_path):
+            events_path = '{:s}_events'.format(
+                os.path.splitext(audio_path)[0])
+            if os.path.isdir(events_path):
+                shutil.rmtree(events_path)
+            os.replace(temp_events_path, events_path)
+            ann.sandbox.scaper.isolated_events_audio_path = [
+                os.path.join(events_path, os.path.basename(path))
+                for path in ann.sandbox.scaper.isolated_events_audio_path]
+    if temp_txt_path is not None:
+        os.replace(temp_txt_path, txt_path)
+    if jams_path is not None:
+        temp_jams_path = _temp_path(jams_path)
+        save_jams(jam, temp_jams_path)
+        os.replace(temp_jams_path, jams_path)
+
+    if manifest_path is not None:
+        _record_item(manifest_path, index, seed_sequence, audio_path,
+                     jams_path, txt_path)
+
+
+def _record_item(manifest_path, index, seed_sequence, audio_path, jams_path,
+                 txt_path, writer=None):
+    '''
+    Append an item of a batch to the manifest, once the files queued on
+    ``writer`` (if given) are written.
+    '''
+    if writer is not None:
+        writer.flush()
+    entry = {
+        'index': index,
+        'entropy': seed_sequence.entropy,
+        'audio_path': audio_path,
+        'jams_path': jams_path,
+        'txt_path': txt_path,
+    }
+    with open(manifest_path, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _generate_in_memory(sc, seed_sequence, generate_kwargs, ring=None,
+                        slot=None):
+    '''
+    Generate one soundscape of a stream without saving it, with a random
+    state seeded from ``seed_sequence`` as in ``_generate_item``.
+
+    If ``ring`` is given, the audio is written to its slot ``slot`` instead
+    of being returned, and only the number of samples and events is sent
+    back with the annotations.
+
+    Returns
+    -------
+    outputs : tuple
+        The (soundscape_audio, soundscape_jam, annotation_list,
+        event_audio_list) returned by ``Scaper.generate``, or
+        (slot, (n_samples, n_events), soundscape_jam, annotation_list) if
+        ``ring`` is given.
+
+    '''
+    sc = copy.copy(sc)
+    sc.random_state = _random_state_from_seed(seed_sequence, sc.random_state)
+    if ring is None:
+        return sc.generate(**generate_kwargs)
+
+    # sparse events are copied to the slot without building dense stems
+    sc.event_audio_format = 'sparse' if ring.n_stems else None
+    soundscape_audio, jam, annotation_list, event_audio_list = sc.generate(
+        **generate_kwargs)
+    shape = ring.write(slot, soundscape_audio, event_audio_list)
+    return slot, shape, jam, annotation_list
+
+
+def _read_ring(results, ring):
+    '''
+    Replace the slots of the results of ``_generate_in_memory`` with views
+    of the audio stored in ``ring``.
+    '''
+    try:
+        for slot, shape, jam, annotation_list in results:
+            soundscape_audio, event_audio_list = ring.read(slot, *shape)
+            yield soundscape_audio, jam, annotation_list, event_audio_list
+    finally:
+        results.close()
+
+
+def _set_worker_shared(shared):
+    '''
+    Initializer of the worker processes created by ``_iter_jobs``.
+    '''
+    global _WORKER_SHARED
+    _WORKER_SHARED = shared
+
+
+def _call_with_shared(func, *args):
+    '''
+    Call ``func`` in a worker process with the object shared by its jobs as
+    first argument.
+    '''
+    return func(_WORKER_SHARED, *args)
+
+
+def _iter_jobs(func, jobs, n_jobs=None, executor=None, max_pending=None,
+               ring=None, shared=None):
+    '''
+    Call ``func(*job)`` for every job and yield the results in order.
+
+    At most ``max_pending`` jobs are submitted and not consumed yet: new jobs
+    are only submitted as results are consumed, so that a slow consumer
+    holds back the workers. When the generator is closed, e.g. because the
+    consumer stops iterating, the jobs that haven't started are cancelled
+    and a process pool created by this function is shut down.
+
+    If ``ring`` is given, every job is also given a slot of the ring, as
+    ``func(*job, ring, slot)``, and is only submitted once a slot is free.
+    The consumer releases the slots of the results, the slots of failed or
+    cancelled jobs are released here.
+
+    If ``shared`` is given, it is the first argument of every job. Process
+    pools created by this function receive it once per worker process,
+    instead of once per job, and the workers keep their copy (e.g. with its
+    warm audio cache) for all the jobs they run.
+
+    Parameters
+    ----------
+    func : callable
+        Function to call. Must be picklable to run in other processes.
+    jobs : iterable
+        Argument tuples, consumed lazily. May be infinite.
+    n_jobs : int or None
+        Number of worker processes used if ``executor`` is None. If None,
+        the number of CPUs is used. If 1, jobs run in the current process
+        when their result is requested.
+    executor : concurrent.futures.Executor or None
+        Executor used to run the jobs. It is not shut down.
+    max_pending : int or None
+        Maximum number of jobs submitted to the executor and not consumed
+        yet. If None, four times the number of workers.
+    ring : SharedAudioRing or None
+        Ring whose slots are handed to the jobs.
+    shared : object or None
+        Object passed as first argument of every job, sent once to every
+        worker process created by this function.
+
+    Yields
+    ------
+    result
+        The result of each job, in order.
+
+    '''
+    if executor is None and n_jobs == 1:
+        for job in jobs:
+            if ring is None:
+                yield func(*job)
+                continue
+            slot = ring.acquire()
+            try:
+                result = func(*(job + (ring, slot)))
+            except BaseException:
+                ring.release(slot)
+                raise
+            yield result
+        return
+    if max_pending is None:
+        max_pending = 4 * (n_jobs or os.cpu_count() or 1)
+    if executor is None:
+        if shared is not None:
+            func = functools.partial(_call_with_shared, func)
+            jobs = (job[1:] for job in jobs)
+        with ProcessPoolExecutor(max_workers=n_jobs,
+                                 initializer=_set_worker_shared,
+                                 initargs=(shared,)) as pool:
+            yield from _iter_jobs(func, jobs, executor=pool,
+                                  max_pending=max_pending, ring=ring)
+        return
+
+    jobs = iter(jobs)
+    pending = deque()
+    try:
+        while True:
+            n_submit = max_pending - len(pending)
+            if ring is not None:
+                n_submit = min(n_submit, ring.n_free)
+            for job in itertools.islice(jobs, n_submit):
+                slot = None
+                if ring is not None:
+                    slot = ring.acquire()
+                    job = job + (ring, slot)
+                pending.append((executor.submit(func, *job), slot))
+            if not pending:
+                if ring is not None and next(jobs, None) is not None:
+                    # no slot was free: they are all held by the consumer
+                    raise ScaperError(
+                        'All {:d} slots of the ring are in use, release the '
+                        'soundscapes that are no longer needed.'.format(
+                            ring.n_slots))
+                break
+            future, slot = pending.popleft()
+            try:
+                result = future.result()
+            except BaseException:
+                if slot is not None:
+                    ring.release(slot)
+                raise
+            yield result
+    finally:
+        for future, slot in pending:
+            if slot is None:
+                future.cancel()
+            elif future.cancel():
+                ring.release(slot)
+            else:
+                # the slot is released once the job is done
+                future.add_done_callback(
+                    lambda _, slot=slot: ring.release(slot))
+
+
+def _run_jobs(func, jobs, n_jobs=None, executor=None, max_pending=None,
+              shared=None):
+    '''
+    Call ``func(*job)`` for every job and return the results in order, see
+    ``_iter_jobs``.
+
+    Returns
+    -------
+    results : list
+
+    '''
+    return list(_iter_jobs(func, jobs, n_jobs=n_jobs, executor=executor,
+                           max_pending=max_pending, shared=shared))
@@ -0,0 +1,330 @@
+'''
+Source catalog
+==============
+'''
+
+from collections import namedtuple
+import json
+import os
+import soundfile
+from .scaper_exceptions import ScaperError
+from .util import _get_sorted_files
+from .util import _populate_label_list
+
+
+CATALOG_VERSION = 1
+
+# Metadata stored for every source file in the catalog
+SourceInfo = namedtuple(
+    'SourceInfo',
+    ['label', 'duration', 'samplerate', 'channels', 'frames', 'mtime',
+     'size'])
+'''
+Container for the metadata of a single source audio file: its label (name of
+its parent folder), duration in seconds, sample rate, number of channels,
+number of frames, and the modification time and size (in bytes) of the file
+at the time it was indexed.
+'''
+
+
+def _read_source_info(source_file, stat=None):
+    '''
+    Read the metadata of a source audio file from disk.
+
+    Parameters
+    ----------
+    source_file : str
+        Path to the audio file.
+    stat : os.stat_result or None
+        Result of ``os.stat(source_file)`` if already available.
+
+    Returns
+    -------
+    info : SourceInfo
+        The metadata of the source file.
+
+    '''
+    if stat is None:
+        stat = os.stat(source_file)
+    sfinfo = soundfile.info(source_file)
+    return SourceInfo(
+        label=os.path.basename(os.path.dirname(source_file)),
+        duration=sfinfo.duration,
+        samplerate=sfinfo.samplerate,
+        channels=sfinfo.channels,
+        frames=sfinfo.frames,
+        mtime=stat.st_mtime,
+        size=stat.st_size)
+
+
+class SourceCatalog(object):
+    '''
+    Index of the source audio files available to Scaper.
+
+    The catalog keeps, for every folder of source files, the sorted list of
+    files it contains, and for every source file its label, duration, sample
+    rate, number of channels and number of frames. It is shared by
+    ``Scaper.__init__``, event instantiation and audio generation so that
+    the metadata of each file is only read from disk once, and read again
+    only if the file's modification time or size change.
+
+    By default the catalog is populated lazily, the first time a folder or
+    file is requested. Calling ``SourceCatalog.scan`` indexes a whole
+    ``fg_path`` or ``bg_path`` folder up front, after which instantiating
+    soundscapes from that folder only checks the modification time and
+    size of the chosen files. Note that file lists are a snapshot: files
+    added to or removed from the folders after they have been indexed are
+    not picked up.
+
+    Parameters
+    ----------
+    cache_path : str or None
+        Path to a JSON file in which the catalog is persisted by
+        ``SourceCatalog.save``. If the file exists its entries are loaded and
+        reused by ``SourceCatalog.scan`` for every file whose modification
+        time and size have not changed since it was indexed. If None
+        (default), the catalog only lives in memory.
+    '''
+
+    def __init__(self, cache_path=None):
+        '''
+        Create a SourceCatalog object.
+
+        Parameters
+        ----------
+        cache_path : str or None
+            Path to a JSON file in which the catalog is persisted. If None
+            (default), the catalog only lives in memory.
+        '''
+        self.cache_path = cache_path
+
+        # Sorted file lists, keyed by folder path
+        self._folders = {}
+        # Source file metadata, keyed by source file path
+        self._sources = {}
+        # Labels of the folders that have been fully indexed with scan()
+        self._scanned = {}
+        # Entries loaded from the cache file, keyed by absolute path
+        self._cached = {}
+        self._dirty = False
+
+        if cache_path is not None and os.path.isfile(cache_path):
+            self._load(cache_path)
+
+    def _load(self, cache_path):
+        '''
+        Load the entries persisted in a cache file.
+
+        Parameters
+        ----------
+        cache_path : str
+            Path to the JSON cache file.
+
+        Raises
+        ------
+        ScaperError
+            If the file is not a valid source catalog cache.
+
+        '''
+        try:
+            with open(cache_path, 'r') as f:
+                data = json.load(f)
+        except ValueError:
+            raise ScaperError(
+                'Invalid source catalog cache file: {:s}'.format(cache_path))
+
+        if not isinstance(data, dict) or 'sources' not in data:
+            raise ScaperError(
+                'Invalid source catalog cache file: {:s}'.format(cache_path))
+
+        # Silently discard caches written by an incompatible version
+        if data.get('version') != CATALOG_VERSION:
+            return
+
+        for path, values in data['sources'].items():
+            self._cached[path] = SourceInfo(**values)
+
+    def __contains__(self, source_file):
+        return source_file in self._sources
+
+    def scan(self, folder_path):
+        '''
+        Index all the source files found in the label subfolders of
+        ``folder_path`` (i.e. an ``fg_path`` or ``bg_path`` folder).
+
+        Files whose modification time and size match an entry of the cache
+        file are not opened again, all other files are read with
+        ``soundfile.info``. Files that cannot be read as audio are listed as
+        part of their folder but left out of the index.
+
+        Parameters
+        ----------
+        folder_path : str
+            Path to a folder containing one subfolder per label.
+
+        Returns
+        -------
+        labels : list
+            Sorted list of the labels (subfolder names) found in
+            ``folder_path``.
+
+        '''
+        if folder_path in self._scanned:
+            return list(self._scanned[folder_path])
+
+        labels = []
+        _populate_label_list(folder_path, labels)
+
+        for label in labels:
+            label_path = os.path.join(folder_path, label)
+            files = _get_sorted_files(label_path)
+            self._folders[label_path] = files
+
+            for source_file in files:
+                stat = os.stat(source_file)
+                cached = self._cached.get(os.path.abspath(source_file))
+                if (cached is not None and
+                        cached.mtime == stat.st_mtime and
+                        cached.size == stat.st_size):
+                    self._sources[source_file] = cached
+                    continue
+
+                try:
+                    info = _read_source_info(source_file, stat=stat)
+                except RuntimeError:
+                    # Not an audio file, instantiation will fail in the same
+                    # way it would without a catalog if it's ever chosen.
+                    continue
+                self._sources[source_file] = info
+                self._cached[os.path.abspath(source_file)] = info
+                self._dirty = True
+
+        self._scanned[folder_path] = labels
+        return list(labels)
+
+    def files(self, folder_path):
+        '''
+        Return the sorted list of files contained in ``folder_path``.
+
+        Parameters
+        ----------
+        folder_path : str
+            Path to a label folder.
+
+        Returns
+        -------
+        files : list
+            List of paths to all files contained in ``folder_path``, in the
+            same format as returned by ``util._get_sorted_files``.
+
+        '''
+        files = self._folders.get(folder_path)
+        if files is None:
+            files = _get_sorted_files(folder_path)
+            self._folders[folder_path] = files
+        return files
+
+    def info(self, source_file):
+        '''
+        Return the metadata of a source file, reading it from disk if the
+        file hasn't been indexed yet or if its modification time or size
+        have changed since it was indexed.
+
+        Parameters
+        ----------
+        source_file : str
+            Path to the source audio file.
+
+        Returns
+        -------
+        info : SourceInfo
+            The metadata of the source file.
+
+        '''
+        info = self._sources.get(source_file)
+        if info is not None:
+            try:
+                stat = os.stat(source_file)
+            except OSError:
+                # The file was removed, keep its indexed metadata
+                return info
+            if info.mtime == stat.st_mtime and info.size == stat.st_size:
+                return info
+        else:
+            stat = None
+        info = _read_source_info(source_file, stat=stat)
+        self._sources[source_file] = info
+        self._dirty = True
+        return info
+
+    def read(self, source_file, start=0, stop=None, dtype=None):
+        '''
+        Read the audio samples of a source file.
+
+        Parameters
+        ----------
+        source_file : str
+            Path to the source audio file.
+        start : int
+            Index of the first frame to read.
+        stop : int or None
+            Index of the frame at which to stop reading (exclusive). If None
+            (default), reads until the end of the file.
+        dtype : str or None
+            Data type of the returned samples, 'float64' or 'float32'. If
+            None (default), samples are read as float64.
+
+        Returns
+        -------
+        audio : np.ndarray
+            Array of shape (n_frames, n_channels) containing the samples.
+
+        '''
+        audio, _ = soundfile.read(
+            source_file, always_2d=True, start=start, stop=stop,
+            dtype=dtype or 'float64')
+        return audio
+
+    def save(self, cache_path=None):
+        '''
+        Persist the catalog to a JSON cache file.
+
+        Parameters
+        ----------
+        cache_path : str or None
+            Path to the cache file. If None (default), ``self.cache_path``
+            is used, and nothing is written if the catalog hasn't changed
+            since it was loaded.
+
+        Raises
+        ------
+        ScaperError
+            If no cache path is provided and ``self.cache_path`` is None.
+
+        '''
+        if cache_path is None:
+            if self.cache_path is None:
+                raise ScaperError(
+                    'No cache path provided for saving the source catalog.')
+            if not self._dirty:
+                return
+            cache_path = self.cache_path
+
+        for source_file, info in self._sources.items():
+            self._cached[os.path.abspath(source_file)] = info
+
+        data = {
+            'version': CATALOG_VERSION,
+            'sources': {path: info._asdict()
+                        for path, info in self._cached.items()}
+        }
+
+        # Write to a temporary file first so that concurrent readers never
+        # see a partially written cache.
+        tmp_path = '{:s}.{:d}.tmp'.format(cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+
+        if cache_path == self.cache_path:
+            self._dirty = False
@@ -0,0 +1,86 @@
+'''
+Command line interface
+======================
+'''
+
+import argparse
+import sys
+from .corpus import pack_corpus, prepare_corpus, PACK_DTYPES
+from .scaper_exceptions import ScaperError
+
+
+def _pack(args):
+    corpus = pack_corpus(args.fg_path, args.bg_path, args.out_path,
+                         dtype=args.dtype)
+    print('Packed {:d} source files ({:d} foreground labels, {:d} background '
+          'labels) into {:s}'.format(
+              len(corpus._sources), len(corpus.fg_labels),
+              len(corpus.bg_labels), corpus.path))
+
+
+def _prepare(args):
+    prepared_fg_path, prepared_bg_path = prepare_corpus(
+        args.fg_path, args.bg_path, args.out_path, args.sr, args.n_channels,
+        n_jobs=args.n_jobs)
+    print('Prepared sources at {:d} Hz, {:d} channel(s) in {:s} and '
+          '{:s}'.format(args.sr, args.n_channels, prepared_fg_path,
+                        prepared_bg_path))
+
+
+def main(argv=None):
+    '''
+    Entry point of the ``scaper`` command line tool.
+
+    Parameters
+    ----------
+    argv : list or None
+        Command line arguments. If None (default), ``sys.argv[1:]`` is used.
+
+    Returns
+    -------
+    status : int
+        Exit status: 0 on success, 1 on failure.
+
+    '''
+    parser = argparse.ArgumentParser(
+        prog='scaper', description='Scaper command line tools.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    pack = subparsers.add_parser(
+        'pack', help='Pack foreground and background source folders into a '
+                     'memory-mapped corpus.')
+    pack.add_argument('fg_path', help='Path to foreground folder.')
+    pack.add_argument('bg_path', help='Path to background folder.')
+    pack.add_argument('out_path', help='Path to the output pack folder.')
+    pack.add_argument('--dtype', default='float32', choices=PACK_DTYPES,
+                      help='Sample format of the packed audio (default: '
+                           'float32).')
+    pack.set_defaults(func=_pack)
+
+    prepare = subparsers.add_parser(
+        'prepare', help='Convert foreground and background source folders '
+                        'to a sample rate and number of channels.')
+    prepare.add_argument('fg_path', help='Path to foreground folder.')
+    prepare.add_argument('bg_path', help='Path to background folder.')
+    prepare.add_argument('out_path', help='Path to the output folder.')
+    prepare.add_argument('--sr', type=int, default=44100,
+                         help='Target sample rate (default: 44100).')
+    prepare.add_argument('--n-channels', type=int, default=1,
+                         help='Target number of channels (default: 1).')
+    prepare.add_argument('--n-jobs', type=int, default=None,
+                         help='Number of worker processes (default: number '
+                              'of CPUs).')
+    prepare.set_defaults(func=_prepare)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    except ScaperError as e:
+        print('scaper: error: {}'.format(e), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@ try:
 except: # pragma: no cover
     import sox # pragma: no cover
 import soundfile
+import numbers
 import os
 import warnings
 import jams
@@ -10,28 +11,62 @@ from collections import namedtuple
 import logging
 import tempfile
 import numpy as np
+import scipy.stats
 import shutil
-import csv
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from .scaper_exceptions import ScaperError
 from .scaper_warnings import ScaperWarning
 from .util import _close_temp_files
 from .util import _set_temp_logging_level
-from .util import _get_sorted_files
+from .util import _set_temp_thread_logging_level
 from .util import _validate_folder_path
 from .util import _populate_label_list
 from .util import _check_random_state
+from .util import _spawn_random_states
 from .util import _sample_trunc_norm
 from .util import _sample_uniform
 from .util import _sample_choose
 from .util import _sample_choose_weighted
 from .util import _sample_normal
 from .util import _sample_const
+from .util import _sample_trunc_norm_fast
+from .util import _make_sampler
 from .util import max_polyphony
 from .util import polyphony_gini
 from .util import is_real_number, is_real_array
+from .catalog import SourceCatalog
+from .corpus import _as_packed_corpus
+from .corpus import _read_prepared_manifest
 from .audio import get_integrated_lufs
+from .audio import get_integrated_lufs_batch
+from .audio import LoudnessMeter
+from .audio import _PCM_DTYPES
+from .audio import _to_pcm
+from .audio import _check_audio_format
+from .audio import _sox_output_format
 from .audio import peak_normalize
+from .audio import EventAudio
+from .batch import BATCH_MANIFEST
+from .batch import _seed_sequence
+from .batch import _item_seed
+from .batch import _check_filename_template
+from .batch import _item_paths
+from .batch import _read_manifests
+from .batch import _end_manifest_line
+from .batch import _generate_item
+from .batch import _run_jobs
+from .batch import _iter_jobs
+from .batch import _generate_in_memory
+from .batch import _read_ring
+from .writer import _write
+from .writer import _write_txt
+from .jams_io import load_jams
+from .jams_io import save_jams
 from .version import version as scaper_version
 
 
@@ -68,6 +103,18 @@ distribution tuples to specify possible values) or instantiated (i.e. storing
 constants directly).
 '''
 
+# Annotation of an event starting or stopping in a stream of audio blocks
+StreamEvent = namedtuple(
+    'StreamEvent', ['kind', 'time', 'soundscape', 'label', 'value'])
+'''
+Start or end of an event in the audio blocks yielded by
+``Scaper.iter_blocks``: ``kind`` is 'start' or 'stop', ``time`` is the time
+of the event boundary in seconds from the start of the stream,
+``soundscape`` the index of the soundscape of the event in the stream, and
+``value`` the value of the event's observation in the soundscape's JAMS
+annotation.
+'''
+
 
 def generate_from_jams(jams_infile,
                        audio_outfile=None,
@@ -78,7 +125,14 @@ def generate_from_jams(jams_infile,
                        isolated_events_path=None,
                        disable_sox_warnings=True,
                        txt_path=None,
-                       txt_sep='\t'):
+                       txt_sep='\t',
+                       catalog=None,
+                       event_audio_format='dense',
+                       dtype='float64',
+                       validate=False,
+                       audio_format=None,
+                       audio_subtype=None,
+                       writer=None):
     '''
     Generate a soundscape based on an existing scaper JAMS file and return as
     an audio file, a JAMS annotation, a simplified annotation list, and a
@@ -88,22 +142,28 @@ def generate_from_jams(jams_infile,
 
     Parameters
     ----------
-    jams_infile : str
-        Path to JAMS file (must be a file previously generated by Scaper).
+    jams_infile : str or jams.JAMS
+        Path to JAMS file (must be a file previously generated by Scaper), or
+        a JAMS object, e.g. read from a JSON Lines annotation file with
+        ``scaper.jsonl.read_jsonl``. The JAMS object is not modified.
     audio_outfile : str
         Path for saving the generated soundscape audio.
-    fg_path : str or None
+    fg_path : str, PackedCorpus or None
         Specifies a different path for foreground audio than the one stored in
         the input jams file. For the reconstruction to be successful the folder
         and file structure inside this path must be identical the one that was
         used to create the input jams file. If None (default), the fg_path from
-        the input jams file will be used.
-    bg_path : str or None
+        the input jams file will be used. Can also be a packed corpus (see
+        ``scaper.pack_corpus``), in which case source files are read from the
+        pack.
+    bg_path : str, PackedCorpus or None
         Specifies a different path for background audio than the one stored in
         the input jams file. For the reconstruction to be successful the folder
         and file structure inside this path must be identical the one that was
         used to create the input jams file. If None (default), the bg_path from
-        the input jams file will be used.
+        the input jams file will be used. Can also be a packed corpus (see
+        ``scaper.pack_corpus``), in which case source files are read from the
+        pack.
     jams_outfile : str or None
         Path for saving new JAMS file, if None (default) a new JAMS is not
         saved. Useful when either fg_path or bg_path is not None, as it saves
@@ -135,6 +195,36 @@ def generate_from_jams(jams_infile,
         The separator to use when saving a simplified annotation as a text
         file (default is tab for compatibility with Audacity label files).
         Only relevant if txt_path is not None.
+    catalog : SourceCatalog, str or None
+        Source catalog used to look up the metadata of the source files, see
+        ``Scaper``. Passing the same ``SourceCatalog`` object to several
+        calls avoids re-reading the metadata of the same source files.
+    event_audio_format : str or None
+        Format of the returned isolated event audio: 'dense' (default) for
+        full-length np.ndarrays, 'sparse' for ``scaper.audio.EventAudio``
+        objects that only store the samples each event spans, or None to not
+        return the isolated event audio.
+    dtype : str
+        Data type of the audio samples throughout generation, 'float64'
+        (default) or 'float32'. float32 halves the memory used by the source,
+        event and soundscape audio, at the cost of rounding errors of the
+        order of 1e-7 relative to float64.
+    validate : bool
+        Whether to validate the input and output JAMS against the JAMS schema
+        (default False). JAMS files are read and written with
+        ``scaper.jams_io.load_jams`` and ``save_jams``.
+    audio_format : str or None
+        Format of the audio files, e.g. 'WAV' or 'FLAC'. If None (default),
+        the format is given by the extension of ``audio_outfile``.
+    audio_subtype : str or None
+        Sample type of the audio files, e.g. 'PCM_16', 'PCM_24', 'PCM_32' or
+        'FLOAT'. If None (default), 'PCM_32' if the format supports it (e.g.
+        WAV), otherwise the default of the format ('PCM_16' for FLAC).
+    writer : AsyncWriter or None
+        If given, the soundscape and isolated events are encoded and written
+        by the writer's threads in parallel, which speeds up CPU-heavy
+        formats such as FLAC. All files are written when this function
+        returns.
 
     Returns
     -------
@@ -152,6 +242,8 @@ def generate_from_jams(jams_infile,
         in the same order in which they appear in the jams annotations data
         list, and can be matched with:
         `for obs, event_audio in zip(ann.data, event_audio_list): ...`.
+        Contains EventAudio objects if event_audio_format is 'sparse', and
+        is None if event_audio_format is None.
 
     Raises
     ------
@@ -161,7 +253,12 @@ def generate_from_jams(jams_infile,
         namespace.
 
     '''
-    soundscape_jam = jams.load(jams_infile)
+    if isinstance(jams_infile, jams.JAMS):
+        soundscape_jam = deepcopy(jams_infile)
+        if validate:
+            soundscape_jam.validate()
+    else:
+        soundscape_jam = load_jams(jams_infile, validate=validate)
     anns = soundscape_jam.search(namespace='scaper')
 
     if len(anns) == 0:
@@ -171,11 +268,18 @@ def generate_from_jams(jams_infile,
 
     ann = soundscape_jam.annotations.search(namespace='scaper')[0]
 
+    # Packed corpora stand in for the folders they were packed from
+    fg_pack = _as_packed_corpus(fg_path)
+    bg_pack = _as_packed_corpus(bg_path)
+
     # Update paths
     if fg_path is None:
         new_fg_path = ann.sandbox.scaper['fg_path']
     else:
-        new_fg_path = os.path.expanduser(fg_path)
+        if fg_pack is not None:
+            new_fg_path = fg_pack.fg_path
+        else:
+            new_fg_path = os.path.expanduser(fg_path)
         # Update source files
         for obs in ann.data:
             if obs.value['role'] == 'foreground':
@@ -192,7 +296,10 @@ def generate_from_jams(jams_infile,
     if bg_path is None:
         new_bg_path = ann.sandbox.scaper['bg_path']
     else:
-        new_bg_path = os.path.expanduser(bg_path)
+        if bg_pack is not None:
+            new_bg_path = bg_pack.bg_path
+        else:
+            new_bg_path = os.path.expanduser(bg_path)
         # Update source files
         for obs in ann.data:
             if obs.value['role'] == 'background':
@@ -218,7 +325,10 @@ def generate_from_jams(jams_infile,
             ScaperWarning)
     
     protected_labels = ann.sandbox.scaper['protected_labels']
-    sc = Scaper(duration, new_fg_path, new_bg_path, protected_labels)
+    sc = Scaper(duration,
+                new_fg_path if fg_pack is None else fg_pack,
+                new_bg_path if bg_pack is None else bg_pack,
+                protected_labels, catalog=catalog)
 
     # Set synthesis parameters
     if 'sr' in ann.sandbox.scaper: # backwards compatibility
@@ -227,6 +337,8 @@ def generate_from_jams(jams_infile,
     sc.n_channels = ann.sandbox.scaper['n_channels']
     sc.fade_in_len = ann.sandbox.scaper['fade_in_len']
     sc.fade_out_len = ann.sandbox.scaper['fade_out_len']
+    sc.event_audio_format = event_audio_format
+    sc.dtype = dtype
 
     # Pull generation parameters from annotation
     reverb = ann.sandbox.scaper['reverb']
@@ -259,7 +371,12 @@ def generate_from_jams(jams_infile,
                            quick_pitch_time=quick_pitch_time,
                            save_isolated_events=save_isolated_events,
                            isolated_events_path=isolated_events_path,
-                           disable_sox_warnings=disable_sox_warnings)
+                           disable_sox_warnings=disable_sox_warnings,
+                           writer=writer,
+                           audio_format=audio_format,
+                           audio_subtype=audio_subtype)
+    if writer is not None:
+        writer.flush()
     
     # TODO: Stick to heavy handed overwriting for now, in the future we
     #  should consolidate this with what happens inside _instantiate().
@@ -283,19 +400,23 @@ def generate_from_jams(jams_infile,
             audio_files = [audio_outfile] + ann.sandbox.scaper.isolated_events_audio_path
             with _close_temp_files(tmpfiles):
                 for audio_file in audio_files:
-                    # Create tmp file
-                    tmpfiles.append(
-                        tempfile.NamedTemporaryFile(suffix='.wav', delete=False))
+                    # Create tmp file, with the same format as the audio file
+                    tmpfiles.append(tempfile.NamedTemporaryFile(
+                        suffix=os.path.splitext(audio_file)[1], delete=False))
                     # Save trimmed result to temp file
                     tfm = sox.Transformer()
                     tfm.trim(sliceop['slice_start'], sliceop['slice_end'])
+                    if audio_format is not None or audio_subtype is not None:
+                        tfm.set_output_format(**_sox_output_format(
+                            *_check_audio_format(
+                                audio_outfile, audio_format, audio_subtype)))
                     tfm.build(audio_file, tmpfiles[-1].name)
                     # Copy result back to original file
                     shutil.copyfile(tmpfiles[-1].name, audio_file)
 
     # Optionally save new jams file
     if jams_outfile is not None:
-        soundscape_jam.save(jams_outfile)
+        save_jams(soundscape_jam, jams_outfile, validate=validate)
 
     # Create annotation list
     annotation_list = []
@@ -305,15 +426,14 @@ def generate_from_jams(jams_infile,
                 [obs.time, obs.time + obs.duration, obs.value['label']])
 
     if txt_path is not None:
-        with open(txt_path, 'w') as csv_file:
-            writer = csv.writer(csv_file, delimiter=txt_sep)
-            writer.writerows(annotation_list)
+        _write_txt(txt_path, annotation_list, txt_sep)
 
     return soundscape_audio, soundscape_jam, annotation_list, event_audio_list
 
 
 def trim(audio_infile, jams_infile, audio_outfile, jams_outfile, start_time,
-         end_time, no_audio=False):
+         end_time, no_audio=False, validate=False, audio_format=None,
+         audio_subtype=None):
     '''
     Trim an audio file and corresponding Scaper JAMS file and save to disk.
 
@@ -328,12 +448,14 @@ def trim(audio_infile, jams_infile, audio_outfile, jams_outfile, start_time,
     ----------
     audio_infile : str
         Path to input audio file
-    jams_infile : str
-        Path to input jams file
+    jams_infile : str or jams.JAMS
+        Path to input jams file, or a JAMS object, e.g. read from a JSON
+        Lines annotation file with ``scaper.jsonl.read_jsonl``.
     audio_outfile : str
         Path to output trimmed audio file
-    jams_outfile : str
-        Path to output trimmed jams file
+    jams_outfile : str or None
+        Path to output trimmed jams file. If None, the trimmed JAMS is only
+        returned.
     start_time : float
         Start time for trimmed audio/jams
     end_time : float
@@ -341,10 +463,38 @@ def trim(audio_infile, jams_infile, audio_outfile, jams_outfile, start_time,
     no_audio : bool
         If true, operates on the jams only. Audio input and output paths
         don't have to point to valid files.
+    validate : bool
+        Whether to validate the input and output JAMS against the JAMS schema
+        (default False).
+    audio_format : str or None
+        Format of the output audio file, e.g. 'WAV' or 'FLAC'. If None
+        (default), the format is given by the extension of ``audio_outfile``.
+    audio_subtype : str or None
+        Sample type of the output audio file, e.g. 'PCM_16', 'PCM_24' or
+        'FLOAT'. If both ``audio_format`` and ``audio_subtype`` are None
+        (default), the sample type of the input file is kept. Otherwise, if
+        None, 'PCM_32' if the format supports it, else the default of the
+        format ('PCM_16' for FLAC).
+
+    Returns
+    -------
+    jam_sliced : jams.JAMS
+        The trimmed JAMS object.
 
     '''
+    output_format = None
+    if not no_audio and (audio_format is not None or
+                         audio_subtype is not None):
+        output_format = _sox_output_format(*_check_audio_format(
+            audio_outfile, audio_format, audio_subtype))
+
     # First trim jams (might raise an error)
-    jam = jams.load(jams_infile)
+    if isinstance(jams_infile, jams.JAMS):
+        jam = jams_infile
+        if validate:
+            jam.validate()
+    else:
+        jam = load_jams(jams_infile, validate=validate)
     jam_sliced = jam.slice(start_time, end_time, strict=False)
 
     # Special work for annotations of the scaper 'scaper' namespace
@@ -371,12 +521,15 @@ def trim(audio_infile, jams_infile, audio_outfile, jams_outfile, start_time,
             ann.sandbox.scaper['duration'] = ann.duration
 
     # Save result to output jams file
-    jam_sliced.save(jams_outfile)
+    if jams_outfile is not None:
+        save_jams(jam_sliced, jams_outfile, validate=validate)
 
     # Next, trim audio
     if not no_audio:
         tfm = sox.Transformer()
         tfm.trim(start_time, end_time)
+        if output_format is not None:
+            tfm.set_output_format(**output_format)
         if audio_outfile != audio_infile:
             tfm.build(audio_infile, audio_outfile)
         else:
@@ -386,12 +539,15 @@ def trim(audio_infile, jams_infile, audio_outfile, jams_outfile, start_time,
                 # Create tmp file
                 tmpfiles.append(
                     tempfile.NamedTemporaryFile(
-                        suffix='.wav', delete=False))
+                        suffix=os.path.splitext(audio_outfile)[1],
+                        delete=False))
                 # Save trimmed result to temp file
                 tfm.build(audio_infile, tmpfiles[-1].name)
                 # Copy result back to original file
                 shutil.copyfile(tmpfiles[-1].name, audio_outfile)
 
+    return jam_sliced
+
 
 def _get_value_from_dist(dist_tuple, random_state):
     '''
@@ -424,6 +580,82 @@ def _get_value_from_dist(dist_tuple, random_state):
     return SUPPORTED_DIST[dist_tuple[0]](*dist_tuple[1:], random_state=random_state)
 
 
+def _compile_distribution(dist_tuple, legacy_truncnorm=False):
+    '''
+    Validate a distribution tuple and compile it into a sampler object.
+
+    The sampler draws the same values as ``_get_value_from_dist`` given the
+    same random state, without validating the tuple again on every draw.
+    "truncnorm" tuples are an exception unless ``legacy_truncnorm`` is True:
+    they are sampled with a faster method, see
+    ``util._sample_trunc_norm_fast``.
+
+    Parameters
+    ----------
+    dist_tuple : tuple
+        Distribution tuple to be validated. See ``Scaper.add_event`` for
+        details about the expected format for the distribution tuple.
+    legacy_truncnorm : bool
+        If True, "truncnorm" tuples are sampled with
+        ``scipy.stats.truncnorm`` as in ``_get_value_from_dist``.
+
+    Returns
+    -------
+    sampler : scaper.util._Sampler
+        Sampler with ``sample(random_state)`` and
+        ``sample_n(random_state, n)`` methods.
+
+    Raises
+    ------
+    ScaperError
+        If the tuple does not have a valid format.
+
+    '''
+    _validate_distribution(dist_tuple)
+    return _make_sampler(dist_tuple, legacy_truncnorm=legacy_truncnorm)
+
+
+def _compile_event(event, legacy_truncnorm=False):
+    '''
+    Compile the distribution tuples of an event specification into sampler
+    objects.
+
+    Parameters
+    ----------
+    event : EventSpec
+        Event specification containing distribution tuples.
+    legacy_truncnorm : bool
+        See ``_compile_distribution``.
+
+    Returns
+    -------
+    samplers : EventSpec
+        Event specification containing the sampler of each distribution
+        tuple. Fields that are None, and "choose" tuples with an empty list
+        (whose options depend on the instantiation) are None. role is
+        unchanged.
+
+    Raises
+    ------
+    ScaperError
+        If a distribution tuple does not have a valid format.
+
+    '''
+    samplers = {}
+    for field in EventSpec._fields:
+        dist_tuple = getattr(event, field)
+        if field == 'role' or dist_tuple is None:
+            samplers[field] = dist_tuple
+        elif field in ('label', 'source_file') and \
+                dist_tuple[0] == 'choose' and not dist_tuple[1]:
+            _validate_distribution(dist_tuple)
+            samplers[field] = None
+        else:
+            samplers[field] = _compile_distribution(
+                dist_tuple, legacy_truncnorm=legacy_truncnorm)
+    return EventSpec(**samplers)
+
+
 def _validate_distribution(dist_tuple):
     '''
     Check whether a tuple specifying a parameter distribution has a valid
@@ -613,6 +845,132 @@ def _ensure_satisfiable_source_time_tuple(source_time, source_duration, event_du
     return tuple(source_time), warn
 
 
+def _sample_source_time_array(source_time, source_duration, event_duration,
+                              random_state, legacy_truncnorm=False):
+    '''
+    Sample the source times of a batch of events, vectorized counterpart of
+    ``_ensure_satisfiable_source_time_tuple`` followed by the sampling loop
+    of ``Scaper._instantiate_event``: the distribution tuple of every event
+    is modified so that it stays within the bounds of its source file, and
+    source times that are still out of bounds are moved to
+    ``max(0, source_duration - event_duration)``.
+
+    Parameters
+    ----------
+    source_time : tuple
+        Source time distribution tuple.
+    source_duration : np.ndarray
+        Duration of the source file of each event.
+    event_duration : np.ndarray
+        Duration of each event.
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample source times.
+    legacy_truncnorm : bool
+        If True, "truncnorm" tuples are sampled with
+        ``scipy.stats.truncnorm``, see ``Scaper.legacy_truncnorm``.
+
+    Returns
+    -------
+    values : np.ndarray
+        Source time of each event.
+    modified : np.ndarray
+        Boolean array, True for the events whose distribution tuple had to
+        be modified or whose source time was still out of bounds.
+
+    '''
+    _validate_distribution(source_time)
+    n = len(source_duration)
+    limit = np.maximum(0, source_duration - event_duration)
+
+    def _clamp(value):
+        value = np.full(n, value, dtype=float)
+        out_of_bounds = value + event_duration > source_duration
+        value[out_of_bounds] = limit[out_of_bounds]
+        return value
+
+    name = source_time[0]
+    modified = np.zeros(n, dtype=bool)
+    if name == 'const':
+        const = _clamp(source_time[1])
+        modified |= const != source_time[1]
+        draw = lambda index: const[index]
+    elif name == 'uniform':
+        minimum = _clamp(source_time[1])
+        maximum = _clamp(source_time[2])
+        # an interval reduced to a point switches to a const distribution
+        modified |= ((minimum != source_time[1]) |
+                     (maximum != source_time[2]) | (minimum == maximum))
+        draw = lambda index: random_state.uniform(
+            minimum[index], maximum[index])
+    elif name == 'normal':
+        mu = _clamp(source_time[1])
+        modified |= mu != source_time[1]
+        draw = lambda index: random_state.normal(mu[index], source_time[2])
+    elif name == 'truncnorm':
+        mu = _clamp(source_time[1])
+        sigma = float(source_time[2])
+        trunc_min = _clamp(source_time[3])
+        trunc_max = _clamp(source_time[4])
+        const = trunc_min == trunc_max
+        modified |= ((mu != source_time[1]) |
+                     (trunc_min != source_time[3]) |
+                     (trunc_max != source_time[4]) | const)
+
+        def draw(index):
+            value = mu[index].copy()
+            sample = ~const[index]
+            if np.any(sample):
+                index = index[sample]
+                if legacy_truncnorm:
+                    value[sample] = scipy.stats.truncnorm.rvs(
+                        (trunc_min[index] - mu[index]) / sigma,
+                        (trunc_max[index] - mu[index]) / sigma,
+                        mu[index], sigma, size=len(index),
+                        random_state=random_state)
+                else:
+                    value[sample] = _sample_trunc_norm_fast(
+                        mu[index], sigma, trunc_min[index],
+                        trunc_max[index], random_state)
+            return value
+    else:
+        # The options of choose tuples depend on each event: modify the
+        # tuple of every event with the scalar function, compile every
+        # distinct tuple once and sample the events of each tuple together.
+        samplers = {}
+        sampler_keys = []
+        for i in range(n):
+            modified_source_time, modified[i] = \
+                _ensure_satisfiable_source_time_tuple(
+                    deepcopy(source_time), source_duration[i],
+                    event_duration[i])
+            key = repr(modified_source_time)
+            if key not in samplers:
+                samplers[key] = _make_sampler(modified_source_time)
+            sampler_keys.append(key)
+        sampler_keys = np.array(sampler_keys, dtype=object)
+
+        def draw(index):
+            value = np.empty(len(index))
+            keys = sampler_keys[index]
+            # in insertion order, so that draws don't depend on hashing
+            for key, sampler in samplers.items():
+                selected = keys == key
+                if np.any(selected):
+                    value[selected] = sampler.sample_n(
+                        random_state, int(np.sum(selected)))
+            return value
+
+    values = np.full(n, -np.inf)
+    invalid = np.arange(n)
+    while len(invalid) > 0:
+        values[invalid] = draw(invalid)
+        out_of_bounds = values + event_duration > source_duration
+        values[out_of_bounds] = limit[out_of_bounds]
+        modified |= out_of_bounds
+        invalid = np.flatnonzero(values < 0)
+    return values, modified
+
+
 def _validate_label(label, allowed_labels):
     '''
     Validate that a label tuple is in the right format and that it's values
@@ -652,7 +1010,7 @@ def _validate_label(label, allowed_labels):
             'Label must be specified using a "const" or "choose" tuple.')
 
 
-def _validate_source_file(source_file_tuple, label_tuple):
+def _validate_source_file(source_file_tuple, label_tuple, catalog=None):
     '''
     Validate that a source_file tuple is in the right format a that it's values
     are valid.
@@ -663,6 +1021,9 @@ def _validate_source_file(source_file_tuple, label_tuple):
         Source file tuple (see ```Scaper.add_event``` for required format).
     label : str
         Label tuple (see ```Scaper.add_event``` for required format).
+    catalog : SourceCatalog or None
+        If provided, source files indexed by the catalog are considered valid
+        even if they don't exist on disk (e.g. files of a packed corpus).
 
     Raises
     ------
@@ -674,10 +1035,15 @@ def _validate_source_file(source_file_tuple, label_tuple):
     _validate_distribution(source_file_tuple)
     _validate_distribution(label_tuple)
 
+    def _exists(source_file):
+        if catalog is not None and source_file in catalog:
+            return True
+        return os.path.isfile(source_file)
+
     # If source file is specified explicitly
     if source_file_tuple[0] == "const":
         # 1. the filepath must point to an existing file
-        if not os.path.isfile(source_file_tuple[1]):
+        if not _exists(source_file_tuple[1]):
             raise ScaperError(
                 "Source file not found: {:s}".format(source_file_tuple[1]))
         # 2. the label must match the file's parent folder name
@@ -688,7 +1054,7 @@ def _validate_source_file(source_file_tuple, label_tuple):
     # Otherwise it must be specified using one of "choose" or "choose_weighted"
     elif source_file_tuple[0] == "choose" or source_file_tuple[0] == "choose_weighted":
         if source_file_tuple[1]:  # list is not empty
-            if not all(os.path.isfile(x) for x in source_file_tuple[1]):
+            if not all(_exists(x) for x in source_file_tuple[1]):
                 raise ScaperError(
                     'Source file list must either be empty or all paths in '
                     'the list must point to valid files.')
@@ -930,7 +1296,7 @@ def _validate_time_stretch(time_stretch_tuple):
 
 def _validate_event(label, source_file, source_time, event_time,
                     event_duration, snr, allowed_labels, pitch_shift,
-                    time_stretch):
+                    time_stretch, catalog=None):
     '''
     Check that event parameter values are valid.
 
@@ -946,6 +1312,8 @@ def _validate_event(label, source_file, source_time, event_time,
         List of allowed labels for the event.
     pitch_shift : tuple or None
     time_stretch: tuple or None
+    catalog : SourceCatalog or None
+        Source catalog used to check that source files exist.
 
     Raises
     ------
@@ -963,7 +1331,7 @@ def _validate_event(label, source_file, source_time, event_time,
         raise ScaperError('allowed_labels must be of type list.')
 
     # SOURCE FILE
-    _validate_source_file(source_file, label)
+    _validate_source_file(source_file, label, catalog=catalog)
 
     # LABEL
     _validate_label(label, allowed_labels)
@@ -987,6 +1355,51 @@ def _validate_event(label, source_file, source_time, event_time,
     _validate_time_stretch(time_stretch)
 
 
+def _final_spans(spans):
+    '''
+    Parts of the spans of the events of a soundscape in which every event is
+    the last one added, i.e. the samples whose value in the mix is final once
+    the event is added.
+
+    Parameters
+    ----------
+    spans : list
+        (start, stop) samples spanned by every event, in the order in which
+        events are added to the mix.
+
+    Returns
+    -------
+    final_spans : list
+        For every event, a list of disjoint (start, stop) ranges.
+
+    '''
+    final_spans = []
+    # Disjoint ranges covered by the events added later, sorted
+    covered = []
+    for start, stop in reversed(spans):
+        final = []
+        position = start
+        for covered_start, covered_stop in covered:
+            if covered_start >= stop:
+                break
+            if covered_start > position:
+                final.append((position, covered_start))
+            position = max(position, covered_stop)
+        if position < stop:
+            final.append((position, stop))
+        final_spans.append(final)
+        if start < stop:
+            merged = []
+            for covered_start, covered_stop in covered:
+                if covered_stop < start or covered_start > stop:
+                    merged.append((covered_start, covered_stop))
+                else:
+                    start = min(start, covered_start)
+                    stop = max(stop, covered_stop)
+            covered = sorted(merged + [(start, stop)])
+    return final_spans[::-1]
+
+
 class Scaper(object):
     '''
     Create a Scaper object.
@@ -995,10 +1408,13 @@ class Scaper(object):
     ----------
     duration : float
         Duration of the soundscape, in seconds.
-    fg_path : str
-        Path to foreground folder.
-    bg_path : str
-        Path to background folder.
+    fg_path : str or PackedCorpus
+        Path to foreground folder. Can also be a packed corpus created with
+        ``scaper.pack_corpus`` (or the path to its folder), in which case
+        labels and source files are those of the foreground folder the pack
+        was created from, and source audio is read from the pack.
+    bg_path : str or PackedCorpus
+        Path to background folder, or a packed corpus (see ``fg_path``).
     protected_labels : list 
         Provide a list of protected foreground labels. When a foreground
         label is in the protected list it means that when a sound event
@@ -1009,17 +1425,32 @@ class Scaper(object):
         whose semantic validity would be lost if the sound were trimmed
         before the sound event ends, for example an animal vocalization
         such as a dog bark.
-    random_state : int, RandomState instance or None, optional (default=None)
+    random_state : int, RandomState or Generator instance or None, optional (default=None)
         If int, random_state is the seed used by the random number 
-        generator; If RandomState instance, random_state is the random number 
-        generator; If None, the random number generator is the RandomState 
+        generator; If RandomState or Generator instance, random_state is the
+        random number generator; If a np.random.BitGenerator (e.g. PCG64 or
+        Philox) or SeedSequence, a Generator is created from it;
+        If None, the random number generator is the RandomState 
         instance used by np.random. Note that if the random state is passed as a 
         RandomState instance, it is passed by reference, not value. This will lead to
         the Scaper object advancing the state of the random state object if you use
         it elsewhere.
+    catalog : SourceCatalog, str or None, optional (default=None)
+        Index of the source files used to look up their durations, sample
+        rates and the files available for each label. If a SourceCatalog
+        instance, it is used as is (and can be shared between several Scaper
+        objects). If a str, it is the path to a cache file: ``fg_path`` and
+        ``bg_path`` are indexed up front (reusing the entries of the cache
+        file for files that haven't changed) and the updated catalog is
+        saved back to the cache file. If None, an in-memory catalog is
+        populated lazily as source files are used. In all cases the catalog
+        is a snapshot of the source folders: files added to them after they
+        have been indexed are not picked up. Must be None when ``fg_path`` or
+        ``bg_path`` is a packed corpus.
     '''
 
-    def __init__(self, duration, fg_path, bg_path, protected_labels=[], random_state=None):
+    def __init__(self, duration, fg_path, bg_path, protected_labels=[],
+                 random_state=None, catalog=None):
         '''
         Create a Scaper object.
 
@@ -1027,10 +1458,10 @@ class Scaper(object):
         ----------
         duration : float
             Duration of the soundscape, in seconds.
-        fg_path : str
-            Path to foreground folder.
-        bg_path : str
-            Path to background folder.
+        fg_path : str or PackedCorpus
+            Path to foreground folder, or a packed corpus.
+        bg_path : str or PackedCorpus
+            Path to background folder, or a packed corpus.
         protected_labels : list 
             Provide a list of protected foreground labels. When a foreground
             label is in the protected list it means that when a sound event
@@ -1041,14 +1472,21 @@ class Scaper(object):
             whose semantic validity would be lost if the sound were trimmed
             before the sound event ends, for example an animal vocalization
             such as a dog bark.
-        random_state : int, RandomState instance or None, optional (default=None)
+        random_state : int, RandomState or Generator instance or None, optional (default=None)
             If int, random_state is the seed used by the random number 
-            generator; If RandomState instance, random_state is the random number 
-            generator; If None, the random number generator is the RandomState 
+            generator; If RandomState or Generator instance, random_state is the
+            random number generator; If a np.random.BitGenerator (e.g. PCG64 or
+            Philox) or SeedSequence, a Generator is created from it;
+            If None, the random number generator is the RandomState 
             instance used by np.random. Note that if the random state is passed as a 
             RandomState instance, it is passed by reference, not value. This will lead to
             the Scaper object advancing the state of the random state object if you use
             it elsewhere.
+        catalog : SourceCatalog, str or None, optional (default=None)
+            Index of the source files. If a SourceCatalog instance, it is used
+            as is. If a str, it is the path to a cache file: ``fg_path`` and
+            ``bg_path`` are indexed up front and the catalog is saved back to
+            the cache file. If None, an in-memory catalog is populated lazily.
         '''
         # Duration must be a positive real number
         if np.isrealobj(duration) and duration > 0:
@@ -1063,27 +1501,92 @@ class Scaper(object):
         self.fade_in_len = 0.01  # 10 ms
         self.fade_out_len = 0.01  # 10 ms
 
+        # Optional cache of converted source audio (see SourceAudioCache)
+        self.audio_cache = None
+
+        # Format of the isolated event audio returned by generate: 'dense'
+        # for full-length arrays, 'sparse' for EventAudio objects, None to
+        # only return the mixture
+        self.event_audio_format = 'dense'
+
+        # Data type of the audio samples throughout generation, 'float64'
+        # or 'float32'
+        self.dtype = 'float64'
+
+        # Sample "truncnorm" distribution tuples with scipy.stats.truncnorm
+        # instead of the inverse CDF, to instantiate the same soundscapes as
+        # scaper < 1.7 for a given random state
+        self.legacy_truncnorm = False
+
+        # Draw the background and foreground events of each soundscape from
+        # independent child streams of the random state, spawned with
+        # np.random.SeedSequence, so that they don't depend on each other
+        self.independent_streams = False
+
         # Start with empty specifications
         self.fg_spec = []
         self.bg_spec = []
+        # Compiled samplers of the event specifications and choose lists,
+        # see _event_samplers
+        self._samplers = {}
+
+        # Packed corpora can be used in place of the folder paths, in which
+        # case paths and labels are those of the folders they were packed
+        # from and the pack serves as the source catalog.
+        fg_pack = _as_packed_corpus(fg_path)
+        bg_pack = _as_packed_corpus(bg_path)
+        pack = fg_pack or bg_pack
+        if pack is not None:
+            if fg_pack is not None and bg_pack is not None and \
+                    fg_pack.path != bg_pack.path:
+                raise ScaperError(
+                    'fg_path and bg_path must point to the same packed '
+                    'corpus.')
+            if catalog is not None:
+                raise ScaperError(
+                    'A catalog cannot be provided when using a packed '
+                    'corpus, the pack serves as the source catalog.')
+            catalog = pack
 
         # Validate paths and set
-        expanded_fg_path = os.path.expanduser(fg_path)
-        expanded_bg_path = os.path.expanduser(bg_path)
-        _validate_folder_path(expanded_fg_path)
-        _validate_folder_path(expanded_bg_path)
-        self.fg_path = expanded_fg_path
-        self.bg_path = expanded_bg_path
-
-        # Populate label lists from folder paths
-        self.fg_labels = []
-        self.bg_labels = []
-        _populate_label_list(self.fg_path, self.fg_labels)
-        _populate_label_list(self.bg_path, self.bg_labels)
+        if fg_pack is not None:
+            self.fg_path = fg_pack.fg_path
+            self.fg_labels = list(fg_pack.fg_labels)
+        else:
+            self.fg_path = os.path.expanduser(fg_path)
+            _validate_folder_path(self.fg_path)
+            # Populate label list from folder path
+            self.fg_labels = []
+            _populate_label_list(self.fg_path, self.fg_labels)
+
+        if bg_pack is not None:
+            self.bg_path = bg_pack.bg_path
+            self.bg_labels = list(bg_pack.bg_labels)
+        else:
+            self.bg_path = os.path.expanduser(bg_path)
+            _validate_folder_path(self.bg_path)
+            # Populate label list from folder path
+            self.bg_labels = []
+            _populate_label_list(self.bg_path, self.bg_labels)
 
         # Copy list of protected labels
         self.protected_labels = protected_labels[:]
 
+        # Manifests of folders prepared with prepare_corpus
+        self._prepared = {
+            'foreground': _read_prepared_manifest(self.fg_path),
+            'background': _read_prepared_manifest(self.bg_path),
+        }
+
+        # Index of the source files, shared by instantiation and generation
+        if not isinstance(catalog, SourceCatalog):
+            catalog = SourceCatalog(cache_path=catalog)
+        if catalog.cache_path is not None:
+            catalog.scan(self.fg_path)
+            catalog.scan(self.bg_path)
+            catalog.save()
+        self.catalog = catalog
+
         # Get random number generator
         self.random_state = _check_random_state(random_state)
 
@@ -1100,6 +1603,7 @@ class Scaper(object):
         event specification instead of the foreground specification.
         '''
         self.fg_spec = []
+        self._samplers = {}
 
     def reset_bg_event_spec(self):
         '''
@@ -1114,6 +1618,7 @@ class Scaper(object):
         event specification instead of the foreground specification.
         '''
         self.bg_spec = []
+        self._samplers = {}
 
     def set_random_state(self, random_state):
         '''
@@ -1121,10 +1626,12 @@ class Scaper(object):
 
         Parameters
         ----------
-        random_state : int, RandomState instance or None, optional (default=None)
+        random_state : int, RandomState or Generator instance or None, optional (default=None)
             If int, random_state is the seed used by the random number 
-            generator; If RandomState instance, random_state is the random number 
-            generator; If None, the random number generator is the RandomState 
+            generator; If RandomState or Generator instance, random_state is the
+            random number generator; If a np.random.BitGenerator (e.g. PCG64 or
+            Philox) or SeedSequence, a Generator is created from it;
+            If None, the random number generator is the RandomState 
             instance used by np.random.
         '''
         self.random_state = _check_random_state(random_state)
@@ -1211,7 +1718,8 @@ class Scaper(object):
 
         # Validate parameter format and values
         _validate_event(label, source_file, source_time, event_time,
-                        event_duration, snr, self.bg_labels, None, None)
+                        event_duration, snr, self.bg_labels, None, None,
+                        catalog=self.catalog)
 
         # Create background sound event
         bg_event = EventSpec(label=label,
@@ -1226,6 +1734,7 @@ class Scaper(object):
 
         # Add event to background spec
         self.bg_spec.append(bg_event)
+        self._event_samplers(bg_event)
 
     def add_event(self, label, source_file, source_time, event_time,
                   event_duration, snr, pitch_shift, time_stretch):
@@ -1332,7 +1841,7 @@ class Scaper(object):
         # SAFETY CHECKS
         _validate_event(label, source_file, source_time, event_time,
                         event_duration, snr, self.fg_labels, pitch_shift,
-                        time_stretch)
+                        time_stretch, catalog=self.catalog)
 
         # Create event
         event = EventSpec(label=label,
@@ -1347,13 +1856,58 @@ class Scaper(object):
 
         # Add event to foreground specification
         self.fg_spec.append(event)
+        self._event_samplers(event)
+
+    def _event_samplers(self, event):
+        '''
+        Compiled samplers of an event specification, see ``_compile_event``.
+
+        Events added with ``add_event`` and ``add_background`` are compiled
+        when added, and compiled again if ``legacy_truncnorm`` changes. Other
+        events are compiled on every call, unless they are part of the
+        current specification.
+
+        Parameters
+        ----------
+        event : EventSpec
+            Event specification containing distribution tuples.
+
+        Returns
+        -------
+        samplers : EventSpec
+            Event specification containing samplers.
+
+        '''
+        entry = self._samplers.get(id(event))
+        if entry is not None and entry[0] is event and \
+                entry[1] == self.legacy_truncnorm:
+            return entry[2]
+        samplers = _compile_event(
+            event, legacy_truncnorm=self.legacy_truncnorm)
+        if any(event is spec for spec in self.fg_spec + self.bg_spec):
+            self._samplers[id(event)] = (
+                event, self.legacy_truncnorm, samplers)
+        return samplers
+
+    def _choose_sampler(self, list_of_options):
+        '''
+        Sampler of the "choose" distribution over a list of labels or source
+        files, compiled once per list.
+        '''
+        entry = self._samplers.get(id(list_of_options))
+        if entry is None or entry[0] is not list_of_options:
+            entry = (list_of_options,
+                     _make_sampler(("choose", list_of_options)))
+            self._samplers[id(list_of_options)] = entry
+        return entry[1]
 
     def _instantiate_event(self, event, isbackground=False,
                            allow_repeated_label=True,
                            allow_repeated_source=True,
                            used_labels=[],
                            used_source_files=[],
-                           disable_instantiation_warnings=False):
+                           disable_instantiation_warnings=False,
+                           random_state=None):
         '''
         Instantiate an event specification.
 
@@ -1392,6 +1946,9 @@ class Scaper(object):
             When True (default is False), warnings stemming from event
             instantiation (primarily about automatic duration adjustments) are
             disabled. Not recommended other than for testing purposes.
+        random_state : RandomState or Generator instance or None
+            Random state used to sample the event's values. If None
+            (default), ``self.random_state`` is used.
 
         Returns
         -------
@@ -1415,27 +1972,31 @@ class Scaper(object):
             file_path = self.fg_path
             allowed_labels = self.fg_labels
 
+        if random_state is None:
+            random_state = self.random_state
+
+        # distribution tuples compiled into samplers, validated only once
+        samplers = self._event_samplers(event)
+
         # determine label
         # special case: choose tuple with empty list
-        if event.label[0] == "choose" and not event.label[1]:
-            label_tuple = list(event.label)
-            label_tuple[1] = allowed_labels
-            label_tuple = tuple(label_tuple)
+        if samplers.label is None:
+            label_sampler = self._choose_sampler(allowed_labels)
         else:
-            label_tuple = event.label
-        label = _get_value_from_dist(label_tuple, self.random_state)
+            label_sampler = samplers.label
+        label = label_sampler.sample(random_state)
 
         # Make sure we can use this label
         if (not allow_repeated_label) and (label in used_labels):
             if (len(allowed_labels) == len(used_labels) or
-                    label_tuple[0] == "const"):
+                    event.label[0] == "const"):
                 raise ScaperError(
                     "Cannot instantiate event {:s}: all available labels "
                     "have already been used and "
                     "allow_repeated_label=False.".format(label))
             else:
                 while label in used_labels:
-                    label = _get_value_from_dist(label_tuple, self.random_state)
+                    label = label_sampler.sample(random_state)
 
         # Update the used labels list
         if label not in used_labels:
@@ -1443,35 +2004,33 @@ class Scaper(object):
 
         # determine source file
         # special case: choose tuple with empty list
-        if event.source_file[0] == "choose" and not event.source_file[1]:
-            source_files = _get_sorted_files(os.path.join(file_path, label))
-            source_file_tuple = list(event.source_file)
-            source_file_tuple[1] = source_files
-            source_file_tuple = tuple(source_file_tuple)
+        if samplers.source_file is None:
+            source_file_sampler = self._choose_sampler(
+                self.catalog.files(os.path.join(file_path, label)))
         else:
-            source_file_tuple = event.source_file
+            source_file_sampler = samplers.source_file
 
-        source_file = _get_value_from_dist(source_file_tuple, self.random_state)
+        source_file = source_file_sampler.sample(random_state)
 
         # Make sure we can use this source file
         if (not allow_repeated_source) and (source_file in used_source_files):
-            source_files = _get_sorted_files(os.path.join(file_path, label))
+            source_files = self.catalog.files(os.path.join(file_path, label))
             if (len(source_files) == len(used_source_files) or
-                    source_file_tuple[0] == "const"):
+                    event.source_file[0] == "const"):
                 raise ScaperError(
                     "Cannot instantiate event {:s}: all available source "
                     "files have already been used and "
                     "allow_repeated_source=False.".format(label))
             else:
                 while source_file in used_source_files:
-                    source_file = _get_value_from_dist(source_file_tuple, self.random_state)
+                    source_file = source_file_sampler.sample(random_state)
 
         # Update the used source files list
         if source_file not in used_source_files:
             used_source_files.append(source_file)
 
         # Get the duration of the source audio file
-        source_duration = soundfile.info(source_file).duration
+        source_duration = self.catalog.info(source_file).duration
 
         # If this is a background event, the event duration is the 
         # duration of the soundscape.
@@ -1488,9 +2047,7 @@ class Scaper(object):
             # potentially be non-positive, hence the loop.
             event_duration = -np.Inf
             while event_duration <= 0:
-                event_duration = _get_value_from_dist(
-                    event.event_duration, self.random_state
-                )
+                event_duration = samplers.event_duration.sample(random_state)
 
             # Check if chosen event duration is longer than the duration of the
             # selected source file, if so adjust the event duration.
@@ -1511,9 +2068,7 @@ class Scaper(object):
         else:
             time_stretch = -np.Inf
             while time_stretch <= 0:
-                time_stretch = _get_value_from_dist(
-                    event.time_stretch, self.random_state
-                )
+                time_stretch = samplers.time_stretch.sample(random_state)
             # compute duration after stretching
             event_duration_stretched = event_duration * time_stretch
 
@@ -1556,13 +2111,20 @@ class Scaper(object):
             modified_source_time, warn = _ensure_satisfiable_source_time_tuple(
                 event.source_time, source_duration, event_duration
             )
+            # the compiled sampler can be used if the tuple is unchanged
+            # (choose lists may have been modified in place)
+            if warn or modified_source_time[0] in ('choose', 'choose_weighted'):
+                source_time_sampler = _make_sampler(
+                    modified_source_time,
+                    legacy_truncnorm=self.legacy_truncnorm)
+            else:
+                source_time_sampler = samplers.source_time
             
             # determine source time and also check again just in case (for normal dist).
             # if it happens again, just use the old method.
             source_time = -np.Inf
             while source_time < 0:
-                source_time = _get_value_from_dist(
-                    modified_source_time, self.random_state)
+                source_time = source_time_sampler.sample(random_state)
                 if source_time + event_duration > source_duration:
                     source_time = max(0, source_duration - event_duration)
                     warn = True
@@ -1597,9 +2159,7 @@ class Scaper(object):
         # foreground events it's not.
         event_time = -np.Inf
         while event_time < 0:
-            event_time = _get_value_from_dist(
-                event.event_time, self.random_state
-            )
+            event_time = samplers.event_time.sample(random_state)
 
         # Make sure the selected event time + event duration are is not greater
         # than the total duration of the soundscape, if it is adjust the event
@@ -1631,7 +2191,7 @@ class Scaper(object):
                         ScaperWarning)
 
         # determine snr
-        snr = _get_value_from_dist(event.snr, self.random_state)
+        snr = samplers.snr.sample(random_state)
 
         # get role (which can only take "foreground" or "background" and
         # is set internally, not by the user).
@@ -1639,7 +2199,7 @@ class Scaper(object):
 
         # determine pitch_shift
         if event.pitch_shift is not None:
-            pitch_shift = _get_value_from_dist(event.pitch_shift, self.random_state)
+            pitch_shift = samplers.pitch_shift.sample(random_state)
         else:
             pitch_shift = None
 
@@ -1656,6 +2216,321 @@ class Scaper(object):
         # Return
         return instantiated_event
 
+    def _instantiate_event_batch(self, event, n, isbackground=False,
+                                 disable_instantiation_warnings=False,
+                                 random_state=None):
+        '''
+        Instantiate an event specification for ``n`` soundscapes at once.
+
+        Vectorized counterpart of ``_instantiate_event`` with repeated labels
+        and source files allowed: the values of each field are sampled for
+        all soundscapes with a single call to the random state, and the
+        event duration, source time and event time are adjusted with the
+        same rules. Instead of one warning per adjusted value, a single
+        warning reports the number of adjusted values of each kind.
+
+        Parameters
+        ----------
+        event : EventSpec
+            Event specification containing distribution tuples.
+        n : int
+            Number of soundscapes.
+        isbackground : bool
+            Flag indicating whether the event to instantiate is a background
+            event or not (False implies it is a foreground event).
+        disable_instantiation_warnings : bool
+            When True (default is False), warnings stemming from event
+            instantiation (primarily about automatic duration adjustments) are
+            disabled.
+        random_state : RandomState or Generator instance or None
+            Random state used to sample the values. If None (default),
+            ``self.random_state`` is used.
+
+        Returns
+        -------
+        values : dict
+            Instantiated value of every field of EventSpec for each
+            soundscape, as arrays of length n. pitch_shift and time_stretch
+            are None if they are not specified. role is a str.
+
+        '''
+        if random_state is None:
+            random_state = self.random_state
+        samplers = self._event_samplers(event)
+
+        def _sample(sampler, invalid=None):
+            # sample, then sample again the values for which invalid(values)
+            # is True
+            values = sampler.sample_n(random_state, n)
+            if invalid is not None:
+                values = values.astype(float)
+                redraw = np.flatnonzero(invalid(values))
+                while len(redraw) > 0:
+                    values[redraw] = sampler.sample_n(
+                        random_state, len(redraw))
+                    redraw = redraw[invalid(values[redraw])]
+            return values
+
+        def _warn(adjusted, message):
+            count = np.count_nonzero(adjusted)
+            if count and not disable_instantiation_warnings:
+                warnings.warn(
+                    '{:d} of {:d} {:s} events: {:s}'.format(
+                        count, n, event.role, message),
+                    ScaperWarning)
+
+        # set paths and labels depending on whether its a foreground/background
+        # event
+        if isbackground:
+            file_path = self.bg_path
+            allowed_labels = self.bg_labels
+        else:
+            file_path = self.fg_path
+            allowed_labels = self.fg_labels
+
+        # determine labels
+        # special case: choose tuple with empty list
+        if samplers.label is None:
+            label = _sample(self._choose_sampler(allowed_labels))
+        else:
+            label = _sample(samplers.label)
+
+        # determine source files
+        # special case: choose tuple with empty list, sampled for each label
+        if samplers.source_file is None:
+            source_file = np.empty(n, dtype=object)
+            for unique_label in sorted(set(label)):
+                selected = (label == unique_label)
+                source_file_sampler = self._choose_sampler(self.catalog.files(
+                    os.path.join(file_path, unique_label)))
+                source_file[selected] = source_file_sampler.sample_n(
+                    random_state, np.count_nonzero(selected))
+        else:
+            source_file = _sample(samplers.source_file)
+
+        # Get the duration of the source audio files
+        unique_files, inverse = np.unique(source_file, return_inverse=True)
+        source_duration = np.array(
+            [self.catalog.info(f).duration for f in unique_files])[inverse]
+
+        protected = np.array(
+            [x in self.protected_labels for x in label], dtype=bool)
+
+        if isbackground:
+            # the event duration is the duration of the soundscape
+            event_duration = np.full(n, float(self.duration))
+        else:
+            # protected labels use the source file's duration without
+            # modification
+            event_duration = _sample(
+                samplers.event_duration, invalid=lambda values: values <= 0)
+            event_duration[protected] = source_duration[protected]
+            adjusted = event_duration > source_duration
+            _warn(adjusted, 'event duration greater than source duration, '
+                            'changed to source duration')
+            event_duration[adjusted] = source_duration[adjusted]
+
+        # Get time stretch values
+        if event.time_stretch is None:
+            time_stretch = None
+        else:
+            time_stretch = _sample(
+                samplers.time_stretch, invalid=lambda values: values <= 0)
+
+        # If the event duration is longer than the soundscape we can trim it
+        # without losing validity.
+        if time_stretch is None:
+            adjusted = event_duration > self.duration
+            event_duration[adjusted] = self.duration
+            event_duration_stretched = event_duration
+        else:
+            event_duration_stretched = event_duration * time_stretch
+            adjusted = event_duration_stretched > self.duration
+            event_duration[adjusted] = \
+                self.duration / time_stretch[adjusted]
+            event_duration_stretched[adjusted] = self.duration
+        _warn(adjusted, 'event duration (after time stretching) greater than '
+                        'the soundscape duration, changed to the soundscape '
+                        'duration')
+
+        # Determine source times within the bounds of the source files,
+        # except for protected labels
+        source_time = np.zeros(n)
+        sampled = np.flatnonzero(~protected)
+        if len(sampled) > 0:
+            source_time[sampled], adjusted = _sample_source_time_array(
+                event.source_time, source_duration[sampled],
+                event_duration[sampled], random_state,
+                legacy_truncnorm=self.legacy_truncnorm)
+            _warn(adjusted, 'source time tuple could not be satisfied given '
+                            'source duration and event duration, changed to '
+                            'stay within the source file')
+
+        # determine event times, making sure events end before the end of
+        # the soundscape
+        event_time = _sample(
+            samplers.event_time, invalid=lambda values: values < 0)
+        adjusted = event_time + event_duration_stretched > self.duration
+        event_time[adjusted] = \
+            self.duration - event_duration_stretched[adjusted]
+        _warn(adjusted, 'event time too great given event duration and '
+                        'soundscape duration, changed to end with the '
+                        'soundscape')
+
+        # determine snr and pitch shift
+        snr = _sample(samplers.snr)
+        if event.pitch_shift is not None:
+            pitch_shift = _sample(samplers.pitch_shift)
+        else:
+            pitch_shift = None
+
+        return dict(label=label,
+                    source_file=source_file,
+                    source_time=source_time,
+                    event_time=event_time,
+                    event_duration=event_duration,
+                    snr=snr,
+                    role=event.role,
+                    pitch_shift=pitch_shift,
+                    time_stretch=time_stretch)
+
+    def instantiate_batch(self, n, allow_repeated_label=True,
+                          allow_repeated_source=True, reverb=None,
+                          disable_instantiation_warnings=False,
+                          as_jams=True):
+        '''
+        Instantiate ``n`` soundscapes based on the current specification.
+
+        All the labels, source files, times, durations, SNRs, pitch shifts
+        and time stretch factors of the ``n`` soundscapes are sampled at
+        once, one array per event specification and field, and adjusted with
+        the same rules as ``Scaper.generate`` (e.g. event durations are
+        limited to the duration of their source file and of the soundscape).
+        This is much faster than calling ``generate(no_audio=True)`` ``n``
+        times. The soundscapes follow the same distributions, but are not the
+        same soundscapes as ``n`` successive calls with the same random
+        state.
+
+        Each soundscape can be synthesized later with ``generate_from_jams``
+        after saving its JAMS object to disk.
+
+        Parameters
+        ----------
+        n : int
+            Number of soundscapes to instantiate.
+        allow_repeated_label : bool
+            When True (default) the same label can be used more than once
+            in a soundscape instantiation. When False every label can
+            only be used once. Labels can't be drawn independently for
+            every soundscape in that case: soundscapes are instantiated one
+            by one, as with ``Scaper.generate``.
+        allow_repeated_source : bool
+            When True (default) the same source file can be used more than once
+            in a soundscape instantiation. When False every source file can
+            only be used once, and soundscapes are instantiated one by one.
+        reverb : float or None
+            Has no effect on this function other than being documented in the
+            instantiated annotations' sandbox.
+        disable_instantiation_warnings : bool
+            When True (default is False), warnings stemming from event
+            instantiation (primarily about automatic duration adjustments) are
+            disabled.
+        as_jams : bool
+            When True (default), soundscapes are yielded as JAMS objects like
+            the ones saved by ``Scaper.generate``. When False, they are
+            yielded in a compact format: a list of EventSpec objects with the
+            instantiated values of the background events followed by the
+            foreground events.
+
+        Yields
+        ------
+        soundscape : JAMS object or list
+            The instantiated soundscapes, one at a time.
+
+        Raises
+        ------
+        ScaperError
+            If ``n`` is not a non-negative integer.
+
+        See Also
+        --------
+        Scaper.generate
+
+        generate_from_jams
+
+        '''
+        if not isinstance(n, numbers.Integral) or n < 0:
+            raise ScaperError('n must be a non-negative integer.')
+        n = int(n)
+
+        if not allow_repeated_label or not allow_repeated_source:
+            for _ in range(n):
+                jam = self._instantiate(
+                    allow_repeated_label=allow_repeated_label,
+                    allow_repeated_source=allow_repeated_source,
+                    reverb=reverb,
+                    disable_instantiation_warnings=disable_instantiation_warnings)
+                if as_jams:
+                    yield jam
+                else:
+                    ann = jam.annotations.search(namespace='scaper')[0]
+                    yield [EventSpec(**obs.value) for obs in ann.data]
+            return
+
+        # Sample all the values first, converted to Python objects
+        random_states = self._context_random_states()
+        specs = []
+        for event, isbackground in (
+                [(event, True) for event in self.bg_spec] +
+                [(event, False) for event in self.fg_spec]):
+            values = self._instantiate_event_batch(
+                event, n, isbackground=isbackground,
+                disable_instantiation_warnings=disable_instantiation_warnings,
+                random_state=random_states[isbackground])
+            for key in EventSpec._fields:
+                if isinstance(values[key], np.ndarray):
+                    values[key] = values[key].tolist()
+                else:
+                    values[key] = [values[key]] * n
+            specs.append((values, isbackground))
+
+        for i in range(n):
+            bg_values, fg_values = [], []
+            for values, isbackground in specs:
+                value = EventSpec(**{key: values[key][i]
+                                     for key in EventSpec._fields})
+                (bg_values if isbackground else fg_values).append(value)
+            if as_jams:
+                yield self._instantiated_jam(
+                    bg_values, fg_values,
+                    allow_repeated_label=allow_repeated_label,
+                    allow_repeated_source=allow_repeated_source,
+                    reverb=reverb)
+            else:
+                yield bg_values + fg_values
+
+    def _context_random_states(self):
+        '''
+        Random states used to instantiate the events of a soundscape (or a
+        batch of soundscapes with ``instantiate_batch``).
+
+        Returns
+        -------
+        random_states : dict
+            The random state of the background events (key True) and of the
+            foreground events (key False). Both are ``self.random_state``,
+            unless ``self.independent_streams`` is True, in which case they
+            are independent child streams spawned from ``self.random_state``
+            for each soundscape, see ``util._spawn_random_states``.
+
+        '''
+        if self.independent_streams:
+            bg_random_state, fg_random_state = _spawn_random_states(
+                self.random_state, 2)
+        else:
+            bg_random_state = fg_random_state = self.random_state
+        return {True: bg_random_state, False: fg_random_state}
+
     def _instantiate(self, allow_repeated_label=True,
                      allow_repeated_source=True, reverb=None,
                      disable_instantiation_warnings=False):
@@ -1696,49 +2571,90 @@ class Scaper(object):
         Scaper.generate
 
         '''
-        jam = jams.JAMS()
-        ann = jams.Annotation(namespace='scaper')
-
-        # Set annotation duration (might be changed later due to cropping)
-        ann.duration = self.duration
-
-        # INSTANTIATE BACKGROUND AND FOREGROUND EVENTS AND ADD TO ANNOTATION
+        # INSTANTIATE BACKGROUND AND FOREGROUND EVENTS
         # NOTE: logic for instantiating bg and fg events is NOT the same.
 
-        # Add background sounds
+        random_states = self._context_random_states()
+
+        # Instantiate background sounds
         bg_labels = []
         bg_source_files = []
+        bg_values = []
         for event in self.bg_spec:
-            value = self._instantiate_event(
+            bg_values.append(self._instantiate_event(
                 event,
                 isbackground=True,
                 allow_repeated_label=allow_repeated_label,
                 allow_repeated_source=allow_repeated_source,
                 used_labels=bg_labels,
                 used_source_files=bg_source_files,
-                disable_instantiation_warnings=disable_instantiation_warnings)
-
-            # Note: add_background doesn't allow to set a time_stretch, i.e.
-            # it's hardcoded to time_stretch=None, so we don't need to check
-            # if value.time_stretch is not None, since it always will be.
-            ann.append(time=value.event_time,
-                       duration=value.event_duration,
-                       value=value._asdict(),
-                       confidence=1.0)
+                disable_instantiation_warnings=disable_instantiation_warnings,
+                random_state=random_states[True]))
 
-        # Add foreground events
+        # Instantiate foreground events
         fg_labels = []
         fg_source_files = []
+        fg_values = []
         for event in self.fg_spec:
-            value = self._instantiate_event(
+            fg_values.append(self._instantiate_event(
                 event,
                 isbackground=False,
                 allow_repeated_label=allow_repeated_label,
                 allow_repeated_source=allow_repeated_source,
                 used_labels=fg_labels,
                 used_source_files=fg_source_files,
-                disable_instantiation_warnings=disable_instantiation_warnings)
+                disable_instantiation_warnings=disable_instantiation_warnings,
+                random_state=random_states[False]))
+
+        return self._instantiated_jam(
+            bg_values, fg_values,
+            allow_repeated_label=allow_repeated_label,
+            allow_repeated_source=allow_repeated_source,
+            reverb=reverb)
+
+    def _instantiated_jam(self, bg_values, fg_values,
+                          allow_repeated_label=True,
+                          allow_repeated_source=True, reverb=None):
+        '''
+        Create the JAMS object of an instantiated soundscape.
+
+        Parameters
+        ----------
+        bg_values : list
+            Instantiated background events, as EventSpec objects.
+        fg_values : list
+            Instantiated foreground events, as EventSpec objects.
+        allow_repeated_label : bool
+            Documented in the annotation's sandbox.
+        allow_repeated_source : bool
+            Documented in the annotation's sandbox.
+        reverb : float or None
+            Documented in the annotation's sandbox.
+
+        Returns
+        -------
+        jam : JAMS object
+            A JAMS object containing a scaper annotation representing the
+            instantiated soundscape.
+
+        '''
+        jam = jams.JAMS()
+        ann = jams.Annotation(namespace='scaper')
+
+        # Set annotation duration (might be changed later due to cropping)
+        ann.duration = self.duration
+
+        # ADD BACKGROUND AND FOREGROUND EVENTS TO ANNOTATION
+        for value in bg_values:
+            # Note: add_background doesn't allow to set a time_stretch, i.e.
+            # it's hardcoded to time_stretch=None, so we don't need to check
+            # if value.time_stretch is not None, since it always will be.
+            ann.append(time=value.event_time,
+                       duration=value.event_duration,
+                       value=value._asdict(),
+                       confidence=1.0)
 
+        for value in fg_values:
             if value.time_stretch is not None:
                 event_duration_stretched = (
                     value.event_duration * value.time_stretch)
@@ -1809,16 +2725,331 @@ class Scaper(object):
         # Return
         return jam
 
-    def _generate_audio(self,
-                        audio_path,
-                        ann,
-                        reverb=None,
-                        fix_clipping=False,
-                        peak_normalization=False,
-                        quick_pitch_time=False,
-                        save_isolated_events=False,
-                        isolated_events_path=None,
-                        disable_sox_warnings=True):
+    def _is_prepared(self, source_file, role):
+        '''
+        Whether a source file comes from a folder prepared with
+        ``prepare_corpus`` for the current sample rate and number of channels,
+        in which case it doesn't need to be converted.
+
+        Parameters
+        ----------
+        source_file : str
+            Path to the source audio file.
+        role : str
+            Role of the event, 'foreground' or 'background'.
+
+        Returns
+        -------
+        prepared : bool
+            True if the source file doesn't need to be converted.
+
+        '''
+        manifest = self._prepared.get(role)
+        if manifest is None:
+            return False
+        if manifest['sr'] != self.sr or \
+                manifest['n_channels'] != self.n_channels:
+            return False
+        source_info = self.catalog.info(source_file)
+        return (source_info.samplerate == self.sr and
+                source_info.channels == self.n_channels)
+
+    def _convert_source_audio(self, source_file, role, start=0, stop=None):
+        '''
+        Read the audio of a source file and convert it to the sample rate
+        and number of channels of the soundscape.
+
+        Parameters
+        ----------
+        source_file : str
+            Path to the source audio file.
+        role : str
+            Role of the event, 'foreground' or 'background'.
+        start : int
+            Index of the first frame to read, in the source sample rate.
+        stop : int or None
+            Index of the frame at which to stop reading (exclusive), in the
+            source sample rate. If None (default), reads until the end of the
+            file.
+
+        Returns
+        -------
+        source_audio : np.ndarray
+            Array of shape (n_samples, n_channels) containing the converted
+            audio.
+
+        '''
+        source_audio = self.catalog.read(source_file, start=start, stop=stop,
+                                         dtype=self.dtype)
+        if self._is_prepared(source_file, role):
+            return source_audio
+        source_sr = self.catalog.info(source_file).samplerate
+        tfm = sox.Transformer()
+        tfm.convert(
+            samplerate=self.sr,
+            n_channels=self.n_channels,
+            bitdepth=None
+        )
+        tfm.set_output_format(
+            rate=self.sr,
+            channels=self.n_channels
+        )
+        source_audio = tfm.build_array(
+            input_array=source_audio,
+            sample_rate_in=source_sr
+        )
+        source_audio = source_audio.astype(self.dtype, copy=False)
+        return source_audio.reshape(-1, self.n_channels)
+
+    def _read_source_audio(self, source_file, role):
+        '''
+        Return the full audio of a source file converted to the sample rate
+        and number of channels of the soundscape, going through
+        ``self.audio_cache``.
+
+        Parameters
+        ----------
+        source_file : str
+            Path to the source audio file.
+        role : str
+            Role of the event, 'foreground' or 'background'.
+
+        Returns
+        -------
+        source_audio : np.ndarray
+            Read-only array of shape (n_samples, n_channels) containing the
+            converted audio.
+
+        '''
+        def _load():
+            return self._convert_source_audio(source_file, role)
+
+        # The catalog reads the metadata of modified files again, so cached
+        # audio of modified files isn't reused
+        mtime = self.catalog.info(source_file).mtime
+        key = (source_file, self.sr, self.n_channels, self.dtype, mtime)
+        return self.audio_cache.get(key, _load)
+
+    def _read_event_audio(self, value, quick_pitch_time=False):
+        '''
+        Read the audio of an instantiated event from its source file, trimmed
+        to the event's source time and duration and converted to the sample
+        rate and number of channels of the soundscape. Background audio is
+        concatenated to itself if the source file is shorter than the
+        soundscape, and foreground audio is pitch shifted and time
+        stretched. Loudness normalization and fades are not applied.
+
+        Parameters
+        ----------
+        value : dict
+            The value of the event's observation in a scaper annotation.
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will
+            be applied with `quick=True`.
+
+        Returns
+        -------
+        event_audio : np.ndarray
+            Array of shape (n_samples, n_channels) containing the event audio.
+
+        '''
+        source_info = self.catalog.info(value['source_file'])
+        isbackground = (value['role'] == 'background')
+        pitch_shift = None if isbackground else value['pitch_shift']
+        time_stretch = None if isbackground else value['time_stretch']
+        prepared = self._is_prepared(value['source_file'], value['role'])
+
+        # Create transformer
+        tfm = sox.Transformer()
+        # Ensure consistent sampling rate and channels
+        # Need both a convert operation (to do the conversion),
+        # and set_output_format (to have sox interpret the output
+        # correctly). Cached and prepared sources are already converted.
+        if self.audio_cache is None and not prepared:
+            tfm.convert(
+                samplerate=self.sr,
+                n_channels=self.n_channels,
+                bitdepth=None
+            )
+        tfm.set_output_format(
+            rate=self.sr,
+            channels=self.n_channels
+        )
+
+        # Pitch shift
+        if pitch_shift is not None:
+            tfm.pitch(pitch_shift, quick=quick_pitch_time)
+
+        # Time stretch
+        if time_stretch is not None:
+            factor = 1.0 / float(time_stretch)
+            tfm.tempo(factor, audio_type='s', quick=quick_pitch_time)
+
+        if self.audio_cache is None:
+            event_sr = source_info.samplerate
+            event_audio = None
+        else:
+            # Trimming the cached source returns a view of the cached array
+            event_sr = self.sr
+            event_audio = self._read_source_audio(
+                value['source_file'], value['role'])
+        # Once the source is converted, sox is only needed for pitch
+        # shifting and time stretching
+        transform = (
+            (self.audio_cache is None and not prepared) or
+            pitch_shift is not None or time_stretch is not None)
+
+        # trim on read (or by slicing), reading only the necessary audio
+        start = int(value['source_time'] * event_sr)
+        stop = int((value['source_time'] + value['event_duration']) * event_sr)
+        if event_audio is None:
+            event_audio = self.catalog.read(
+                value['source_file'], start=start, stop=stop,
+                dtype=self.dtype)
+        else:
+            event_audio = event_audio[start:stop]
+
+        if isbackground:
+            # Concatenate background if necessary.
+            ntiles = int(
+                max(self.duration // source_info.duration + 1, 1))
+            # tile the background along the appropriate dimensions
+            if ntiles > 1:
+                event_audio = np.tile(event_audio, (ntiles, 1))
+            event_audio = event_audio[:stop]
+
+        if transform:
+            event_audio = tfm.build_array(
+                input_array=event_audio,
+                sample_rate_in=event_sr
+            )
+            event_audio = event_audio.astype(self.dtype, copy=False)
+            event_audio = event_audio.reshape(-1, self.n_channels)
+
+        return event_audio
+
+    def _scale_foreground(self, event_audio, snr, lufs):
+        '''
+        Normalize the audio of a foreground event to its SNR with respect to
+        the background and apply short fades in and out.
+
+        Parameters
+        ----------
+        event_audio : np.ndarray
+            Audio of the event, as returned by ``Scaper._read_event_audio``.
+        snr : float
+            SNR of the event in dB.
+        lufs : float
+            Integrated loudness of ``event_audio`` in LUFS.
+
+        Returns
+        -------
+        event_audio : np.ndarray
+            The scaled audio, a new array.
+
+        '''
+        # Normalize to specified SNR with respect to background
+        gain = self.ref_db + snr - lufs
+        event_audio = np.multiply(
+            np.exp(gain * np.log(10) / 20), event_audio, dtype=self.dtype)
+
+        # Apply short fade in and out
+        # (avoid unnatural sound onsets/offsets)
+        if self.fade_in_len > 0:
+            fade_in_samples =  int(self.fade_in_len * self.sr)
+            fade_in_window = np.sin(np.linspace(0, np.pi / 2, fade_in_samples))[..., None]
+            event_audio[:fade_in_samples] *= fade_in_window
+
+        if self.fade_out_len > 0:
+            fade_out_samples = int(self.fade_out_len * self.sr)
+            fade_out_window = np.sin(np.linspace(np.pi / 2, 0, fade_out_samples))[..., None]
+            event_audio[-fade_out_samples:] *= fade_out_window
+
+        return event_audio
+
+    def _background_reader(self, value):
+        '''
+        Reader of the audio of an instantiated background, for rendering it
+        block by block: the audio ``Scaper._read_event_audio`` returns for
+        the background is read in ranges, without building the tiled array.
+
+        Parameters
+        ----------
+        value : dict
+            The value of the background's observation in a scaper
+            annotation.
+
+        Returns
+        -------
+        length : int
+            Number of samples of the background audio.
+        read : callable
+            Function ``read(start, stop)`` returning samples ``start`` to
+            ``stop`` of the background audio, as an array of shape
+            (stop - start, n_channels).
+
+        '''
+        source_file = value['source_file']
+        role = value['role']
+        source_info = self.catalog.info(source_file)
+        source_time = value['source_time']
+        end_time = value['source_time'] + value['event_duration']
+        start = int(source_time * self.sr)
+        stop = int(end_time * self.sr)
+
+        # Sources in the format of the soundscape are read in ranges, block
+        # by block. Other sources are converted once, trimmed to the samples
+        # the background uses as in _read_event_audio, unless they are
+        # already converted in the audio cache.
+        source_audio = None
+        offset = start
+        n_frames = source_info.frames
+        if self.audio_cache is not None:
+            source_audio = self._read_source_audio(source_file, role)
+            n_frames = source_audio.shape[0]
+        elif not self._is_prepared(source_file, role) and (
+                source_info.samplerate != self.sr or
+                source_info.channels != self.n_channels):
+            source_sr = source_info.samplerate
+            source_audio = self._convert_source_audio(
+                source_file, role, start=int(source_time * source_sr),
+                stop=int(end_time * source_sr))
+            offset = 0
+            n_frames = start + source_audio.shape[0]
+
+        segment_length = max(min(stop, n_frames) - start, 0)
+        ntiles = int(max(self.duration // source_info.duration + 1, 1))
+        length = min(ntiles * segment_length, stop)
+
+        def read(read_start, read_stop):
+            pieces = [np.zeros((0, self.n_channels), dtype=self.dtype)]
+            while read_start < read_stop:
+                i = offset + read_start % segment_length
+                n = min(read_stop - read_start,
+                        segment_length - read_start % segment_length)
+                if source_audio is None:
+                    pieces.append(self.catalog.read(
+                        source_file, start=i, stop=i + n, dtype=self.dtype))
+                else:
+                    pieces.append(source_audio[i:i + n])
+                read_start += n
+            return pieces[-1] if len(pieces) == 2 else np.concatenate(pieces)
+
+        return length, read
+
+    def _generate_audio(self,
+                        audio_path,
+                        ann,
+                        reverb=None,
+                        fix_clipping=False,
+                        peak_normalization=False,
+                        quick_pitch_time=False,
+                        save_isolated_events=False,
+                        isolated_events_path=None,
+                        disable_sox_warnings=True,
+                        writer=None,
+                        audio_format=None,
+                        audio_subtype=None):
         '''
         Generate audio based on a scaper annotation and save to disk.
 
@@ -1869,6 +3100,17 @@ class Scaper(object):
         disable_sox_warnings : bool
             When True (default), warnings from the pysox module are suppressed
             unless their level is ``'CRITICAL'``.
+        writer : AsyncWriter or None
+            Writer of the audio files, see ``Scaper.generate``.
+        audio_format : str or None
+            Format of the audio files, e.g. 'WAV' or 'FLAC'. If None
+            (default), the format is given by the extension of
+            ``audio_path``.
+        audio_subtype : str or None
+            Sample type of the audio files, e.g. 'PCM_16', 'PCM_24',
+            'PCM_32' or 'FLOAT'. If None (default), 'PCM_32' if the format
+            supports it (e.g. WAV), otherwise the default of the format
+            ('PCM_16' for FLAC).
 
         Returns
         -------
@@ -1880,6 +3122,9 @@ class Scaper(object):
             in the same order in which they appear in the jams annotations data
             list, and can be matched with:
             `for obs, event_audio in zip(ann.data, event_audio_list): ...`.
+            If ``self.event_audio_format`` is 'sparse', the list contains
+            ``scaper.audio.EventAudio`` objects instead, and if it is None,
+            None is returned.
         scale_factor : float
             If peak_normalization is True, or fix_clipping is True and the
             soundscape audio needs to be scaled to avoid clipping, scale_factor
@@ -1911,9 +3156,22 @@ class Scaper(object):
         else:
             temp_logging_level = logging.getLogger().level
 
-        # List for storing all generated audio (one array for every event)
+        if self.event_audio_format not in ('dense', 'sparse', None):
+            raise ScaperError(
+                'Invalid event_audio_format: {}. Must be \'dense\', '
+                '\'sparse\' or None.'.format(self.event_audio_format))
+        if self.dtype not in ('float32', 'float64'):
+            raise ScaperError(
+                'Invalid dtype: {}. Must be \'float32\' or '
+                '\'float64\'.'.format(self.dtype))
+        if audio_path is not None:
+            audio_format, audio_subtype = _check_audio_format(
+                audio_path, audio_format, audio_subtype)
+
+        # Processed audio of every event and its offset in the soundscape
         soundscape_audio = None
-        event_audio_list = []
+        event_audio_list = [] if self.event_audio_format is not None else None
+        events = []
         scale_factor = 1.0
         ref_db_change = 0
 
@@ -1922,156 +3180,80 @@ class Scaper(object):
             isolated_events_audio_path = []
             duration_in_samples = int(self.duration * self.sr)
 
-            for i, e in enumerate(ann.data):
-                if e.value['role'] == 'background':
-                    # Concatenate background if necessary.
-                    source_duration = soundfile.info(e.value['source_file']).duration
-                    ntiles = int(
-                        max(self.duration // source_duration + 1, 1))
-
-                    # Create transformer
-                    tfm = sox.Transformer()
-                    # Ensure consistent sampling rate and channels
-                    # Need both a convert operation (to do the conversion),
-                    # and set_output_format (to have sox interpret the output
-                    # correctly).
-                    tfm.convert(
-                        samplerate=self.sr,
-                        n_channels=self.n_channels,
-                        bitdepth=None
-                    )
-                    tfm.set_output_format(
-                        rate=self.sr,
-                        channels=self.n_channels
-                    )
-
-                    # PROCESS BEFORE COMPUTING LUFS
-                    tmpfiles_internal = []
-                    with _close_temp_files(tmpfiles_internal):
-                        # create internal tmpfile
-                        tmpfiles_internal.append(
-                            tempfile.NamedTemporaryFile(
-                                suffix='.wav', delete=False))
-                        # read in background off disk, using start and stop 
-                        # to only read the necessary audio
-                        event_sr = soundfile.info(e.value['source_file']).samplerate
-                        start = int(e.value['source_time'] * event_sr)
-                        stop = int((e.value['source_time'] + e.value['event_duration']) * event_sr)
-                        event_audio, event_sr = soundfile.read(
-                            e.value['source_file'], always_2d=True,
-                            start=start, stop=stop)
-                        # tile the background along the appropriate dimensions
-                        event_audio = np.tile(event_audio, (ntiles, 1))
-                        event_audio = event_audio[:stop]
-                        event_audio = tfm.build_array(
-                            input_array=event_audio,
-                            sample_rate_in=event_sr
-                        )
-                        event_audio = event_audio.reshape(-1, self.n_channels)
-                        # NOW compute LUFS
-                        bg_lufs = get_integrated_lufs(event_audio, self.sr)
+            # Read the audio of all events first, so that the loudness of
+            # all of them can be computed in a single batch
+            source_audio_list = []
+            for e in ann.data:
+                if e.value['role'] not in ('background', 'foreground'):
+                    raise ScaperError(
+                        'Unsupported event role: {:s}'.format(
+                            e.value['role']))
+                source_audio_list.append(self._read_event_audio(
+                    e.value, quick_pitch_time=quick_pitch_time))
+
+            # NOW compute LUFS
+            lufs_list = get_integrated_lufs_batch(source_audio_list, self.sr)
+
+            # Samples spanned by every event. The peak of the mix is tracked
+            # as events are added, over the samples that no later event
+            # changes, instead of in a separate pass over the mix.
+            offsets = [
+                0 if e.value['role'] == 'background'
+                else int(self.sr * e.value['event_time']) for e in ann.data]
+            final_spans = _final_spans([
+                (offset, min(offset + event_audio.shape[0],
+                             duration_in_samples))
+                for offset, event_audio in zip(offsets, source_audio_list)])
+            max_sample = 0.0
+
+            # The mix buffer is allocated once and every event is added
+            # into the slice it occupies
+            if source_audio_list:
+                soundscape_audio = np.zeros(
+                    (duration_in_samples, self.n_channels), dtype=self.dtype)
 
-                        # Normalize background to reference DB.
-                        gain = self.ref_db - bg_lufs
-                        event_audio = np.exp(gain * np.log(10) / 20) * event_audio
+            for i, e in enumerate(ann.data):
+                event_audio = source_audio_list[i]
+                # Release the unscaled audio as soon as it's been used
+                source_audio_list[i] = None
 
-                        event_audio_list.append(event_audio[:duration_in_samples])
+                if e.value['role'] == 'background':
+                    # Normalize background to reference DB.
+                    gain = self.ref_db - lufs_list[i]
+                    event_audio = np.multiply(
+                        np.exp(gain * np.log(10) / 20), event_audio,
+                        dtype=self.dtype)
 
                 elif e.value['role'] == 'foreground':
-                    # Create transformer
-                    tfm = sox.Transformer()
-                    # Ensure consistent sampling rate and channels
-                    # Need both a convert operation (to do the conversion),
-                    # and set_output_format (to have sox interpret the output
-                    # correctly).
-                    tfm.convert(
-                        samplerate=self.sr,
-                        n_channels=self.n_channels,
-                        bitdepth=None
-                    )
-                    tfm.set_output_format(
-                        rate=self.sr,
-                        channels=self.n_channels
-                    )
-
-                    # Pitch shift
-                    if e.value['pitch_shift'] is not None:
-                        tfm.pitch(e.value['pitch_shift'], quick=quick_pitch_time)
-
-                    # Time stretch
-                    if e.value['time_stretch'] is not None:
-                        factor = 1.0 / float(e.value['time_stretch'])
-                        tfm.tempo(factor, audio_type='s', quick=quick_pitch_time)
-
-                    # PROCESS BEFORE COMPUTING LUFS
-                    tmpfiles_internal = []
-                    with _close_temp_files(tmpfiles_internal):
-                        # create internal tmpfile
-                        tmpfiles_internal.append(
-                            tempfile.NamedTemporaryFile(
-                                suffix='.wav', delete=False))
-                        
-                        # synthesize edited foreground sound event, 
-                        # doing the trim via soundfile
-                        event_sr = soundfile.info(e.value['source_file']).samplerate
-                        start = int(e.value['source_time'] * event_sr)
-                        stop = int((e.value['source_time'] + e.value['event_duration']) * event_sr)
-                        event_audio, event_sr = soundfile.read(
-                            e.value['source_file'], always_2d=True,
-                            start=start, stop=stop)
-                        event_audio = tfm.build_array(
-                            input_array=event_audio,
-                            sample_rate_in=event_sr
-                        )
-                        event_audio = event_audio.reshape(-1, self.n_channels)
-                        
-                        # NOW compute LUFS
-                        fg_lufs = get_integrated_lufs(event_audio, self.sr)
-
-                        # Normalize to specified SNR with respect to
-                        # background
-                        gain = self.ref_db + e.value['snr'] - fg_lufs
-                        event_audio = np.exp(gain * np.log(10) / 20) * event_audio
-
-                        # Apply short fade in and out
-                        # (avoid unnatural sound onsets/offsets)
-                        if self.fade_in_len > 0:
-                            fade_in_samples =  int(self.fade_in_len * self.sr)
-                            fade_in_window = np.sin(np.linspace(0, np.pi / 2, fade_in_samples))[..., None]
-                            event_audio[:fade_in_samples] *= fade_in_window
-
-                        if self.fade_out_len > 0:
-                            fade_out_samples = int(self.fade_out_len * self.sr)
-                            fade_out_window = np.sin(np.linspace(np.pi / 2, 0, fade_out_samples))[..., None]
-                            event_audio[-fade_out_samples:] *= fade_out_window
-
-                        # Pad with silence before/after event to match the
-                        # soundscape duration
-                        prepad = int(self.sr * e.value['event_time'])
-                        postpad = max(0, duration_in_samples - (event_audio.shape[0] + prepad))
-                        event_audio = np.pad(event_audio, ((prepad, postpad), (0, 0)), 
-                            mode='constant', constant_values=(0, 0))
-                        event_audio = event_audio[:duration_in_samples]
-
-                        event_audio_list.append(event_audio[:duration_in_samples])
+                    event_audio = self._scale_foreground(
+                        event_audio, e.value['snr'], lufs_list[i])
+
+                # Silence before the event
+                offset = offsets[i]
+
+                # Add the part of the event that falls within the soundscape
+                # to the mix
+                end = min(offset + event_audio.shape[0], duration_in_samples)
+                if end > offset:
+                    event_audio = event_audio[:end - offset]
+                    soundscape_audio[offset:end] += event_audio
                 else:
-                    raise ScaperError(
-                        'Unsupported event role: {:s}'.format(
-                            e.value['role']))
-
-            # Finally combine all the files and optionally apply reverb.
+                    offset, event_audio = 0, event_audio[:0]
+                events.append(
+                    EventAudio(event_audio, offset, duration_in_samples))
+                for start, stop in final_spans[i]:
+                    max_sample = max(max_sample, np.max(
+                        np.abs(soundscape_audio[start:stop])))
+
+            # Finally optionally apply reverb.
             # If there are no events, throw a warning.
-            if len(event_audio_list) == 0:
+            if len(events) == 0:
                 warnings.warn(
                     "No events to synthesize (silent soundscape), no audio "
                     "generated.", ScaperWarning)
             else:                        
 
-                # Sum all events to get soundscape audio
-                soundscape_audio = sum(event_audio_list)
-
                 # Check for clipping and fix [optional]
-                max_sample = np.max(np.abs(soundscape_audio))
                 clipping = max_sample > 1
                 if clipping:
                     warnings.warn('Soundscape audio is clipping!',
@@ -2080,8 +3262,8 @@ class Scaper(object):
                 if peak_normalization or (clipping and fix_clipping):
 
                     # normalize soundscape audio and scale event audio
-                    soundscape_audio, event_audio_list, scale_factor = \
-                        peak_normalize(soundscape_audio, event_audio_list)
+                    soundscape_audio, events, scale_factor = \
+                        peak_normalize(soundscape_audio, events)
 
                     ref_db_change = 20 * np.log10(scale_factor)
 
@@ -2103,6 +3285,13 @@ class Scaper(object):
                             ScaperWarning
                         )
 
+                # Isolated event audio, only built in full when it is
+                # returned as dense arrays
+                if self.event_audio_format == 'dense':
+                    event_audio_list = [e.to_dense() for e in events]
+                elif self.event_audio_format == 'sparse':
+                    event_audio_list = events
+
                 # Optionally apply reverb
                 # NOTE: must apply AFTER peak normalization: applying reverb
                 # to a clipping signal with sox and then normalizing doesn't
@@ -2113,15 +3302,16 @@ class Scaper(object):
                     soundscape_audio = tfm.build_array(
                         input_array=soundscape_audio,
                         sample_rate_in=self.sr,
-                    )
+                    ).astype(self.dtype, copy=False)
 
                 # Reshape to ensure data are 2d
                 soundscape_audio = soundscape_audio.reshape(-1, self.n_channels)
 
                 # Optionally save soundscape audio to disk
                 if audio_path is not None:
-                    soundfile.write(audio_path, soundscape_audio, self.sr,
-                                    subtype='PCM_32')
+                    _write(writer, soundfile.write, audio_path,
+                           soundscape_audio, self.sr, subtype=audio_subtype,
+                           format=audio_format)
 
                 # Optionally save isolated events to disk
                 if save_isolated_events:
@@ -2143,7 +3333,13 @@ class Scaper(object):
                                 e.value['role'], _role_count, e.value['label'], ext))
                         role_counter[e.value['role']] += 1
 
-                        soundfile.write(event_audio_path, event_audio_list[iso_idx], self.sr, subtype='PCM_32')
+                        if self.event_audio_format == 'dense':
+                            event_audio = event_audio_list[iso_idx]
+                        else:
+                            event_audio = events[iso_idx].to_dense()
+                        _write(writer, soundfile.write, event_audio_path,
+                               event_audio, self.sr, subtype=audio_subtype,
+                               format=audio_format)
                         isolated_events_audio_path.append(event_audio_path)
                         iso_idx += 1
 
@@ -2168,6 +3364,271 @@ class Scaper(object):
         # Return audio for in-memory processing
         return soundscape_audio, event_audio_list, scale_factor, ref_db_change
 
+    def _load_foreground(self, value, n_samples, quick_pitch_time=False):
+        '''
+        Read the audio of an instantiated foreground event, scale it and
+        truncate it to the soundscape.
+
+        Parameters
+        ----------
+        value : dict
+            The value of the event's observation in a scaper annotation.
+        n_samples : int
+            Number of samples of the soundscape.
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will
+            be applied with `quick=True`.
+
+        Returns
+        -------
+        offset : int
+            Onset of the event in the soundscape, in samples.
+        event_audio : np.ndarray
+            The scaled audio of the event.
+
+        '''
+        event_audio = self._read_event_audio(
+            value, quick_pitch_time=quick_pitch_time)
+        event_audio = self._scale_foreground(
+            event_audio, value['snr'], get_integrated_lufs(event_audio, self.sr))
+        offset = int(self.sr * value['event_time'])
+        return offset, event_audio[:max(n_samples - offset, 0)]
+
+    def _prepare_streamed(self, ann, block_samples, quick_pitch_time=False,
+                          preload=False):
+        '''
+        Prepare the rendering of a scaper annotation block by block:
+        backgrounds are measured with a ``LoudnessMeter`` in a pass over
+        their audio, and foreground events are either read now
+        (``preload``) or when rendering reaches them.
+
+        Parameters
+        ----------
+        ann : jams.Annotation
+            Annotation of the scaper namespace.
+        block_samples : int
+            Number of samples of the blocks used to measure backgrounds.
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will
+            be applied with `quick=True`.
+        preload : bool
+            If True, the foreground events are read, pitch shifted, time
+            stretched and scaled now, so that rendering doesn't need sox.
+
+        Returns
+        -------
+        backgrounds : dict
+            (read, length, scale) of every background, by index in
+            ``ann.data``, see ``Scaper._background_reader``.
+        onsets : list
+            (offset, index) of the foreground events starting within the
+            soundscape, by decreasing offset.
+        foregrounds : dict
+            (offset, audio) of the preloaded foreground events, by index in
+            ``ann.data``.
+
+        Raises
+        ------
+        ScaperError
+            If annotation is not of the scaper namespace, or if an event
+            has an unsupported role.
+
+        '''
+        if ann.namespace != 'scaper':
+            raise ScaperError(
+                'Annotation namespace must be scaper, found: {:s}'.format(
+                    ann.namespace))
+
+        duration_in_samples = int(self.duration * self.sr)
+        backgrounds = {}
+        onsets = []
+        foregrounds = {}
+        for i, e in enumerate(ann.data):
+            if e.value['role'] == 'background':
+                length, read = self._background_reader(e.value)
+                meter = LoudnessMeter(self.sr)
+                for start in range(0, length, block_samples):
+                    meter.update(
+                        read(start, min(start + block_samples, length)))
+                gain = self.ref_db - meter.integrated_lufs()
+                backgrounds[i] = (
+                    read, min(length, duration_in_samples),
+                    np.exp(gain * np.log(10) / 20))
+            elif e.value['role'] == 'foreground':
+                offset = int(self.sr * e.value['event_time'])
+                if offset < duration_in_samples:
+                    onsets.append((offset, i))
+                    if preload:
+                        foregrounds[i] = self._load_foreground(
+                            e.value, duration_in_samples,
+                            quick_pitch_time=quick_pitch_time)
+            else:
+                raise ScaperError(
+                    'Unsupported event role: {:s}'.format(e.value['role']))
+        onsets.sort(reverse=True)
+        return backgrounds, onsets, foregrounds
+
+    def _iter_streamed_blocks(self, ann, block_samples, prepared,
+                              quick_pitch_time=False):
+        '''
+        Render a scaper annotation block by block, holding in memory only
+        the current block and the foreground events that overlap it.
+
+        Parameters
+        ----------
+        ann : jams.Annotation
+            Annotation of the scaper namespace.
+        block_samples : int
+            Number of samples of the blocks. The last block is shorter if
+            the soundscape is not a whole number of blocks long.
+        prepared : tuple
+            Output of ``Scaper._prepare_streamed``, consumed by rendering.
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will
+            be applied with `quick=True` to the events that are not preloaded.
+
+        Yields
+        ------
+        block : np.ndarray
+            Array of shape (n_samples, n_channels) of the next block of the
+            soundscape.
+
+        '''
+        backgrounds, onsets, foregrounds = prepared
+        duration_in_samples = int(self.duration * self.sr)
+        # Foreground events overlapping the current block
+        active = {}
+        for start in range(0, duration_in_samples, block_samples):
+            stop = min(start + block_samples, duration_in_samples)
+            while onsets and onsets[-1][0] < stop:
+                _, i = onsets.pop()
+                if i in foregrounds:
+                    active[i] = foregrounds.pop(i)
+                else:
+                    active[i] = self._load_foreground(
+                        ann.data[i].value, duration_in_samples,
+                        quick_pitch_time=quick_pitch_time)
+
+            # Events are added in the same order as in
+            # Scaper._generate_audio
+            block = np.zeros((stop - start, self.n_channels),
+                             dtype=self.dtype)
+            for i in range(len(ann.data)):
+                if i in backgrounds:
+                    read, length, scale = backgrounds[i]
+                    end = min(stop, length)
+                    if end > start:
+                        block[:end - start] += np.multiply(
+                            scale, read(start, end), dtype=self.dtype)
+                elif i in active:
+                    offset, event_audio = active[i]
+                    event_end = offset + event_audio.shape[0]
+                    begin, end = max(start, offset), min(stop, event_end)
+                    if end > begin:
+                        block[begin - start:end - start] += \
+                            event_audio[begin - offset:end - offset]
+                    if event_end <= stop:
+                        del active[i]
+            yield block
+
+    def _generate_audio_streamed(self,
+                                 audio_path,
+                                 ann,
+                                 block_duration=10.0,
+                                 quick_pitch_time=False,
+                                 disable_sox_warnings=True,
+                                 audio_format=None,
+                                 audio_subtype=None):
+        '''
+        Generate audio based on a scaper annotation and write it to disk
+        block by block, holding in memory only the current block and the
+        foreground events that overlap it.
+
+        The loudness of backgrounds is measured with a ``LoudnessMeter`` in a
+        first pass over their audio, and they are then read again block by
+        block while mixing. Foreground events are read when the block in
+        which they start is rendered, and released once they end.
+
+        Parameters
+        ----------
+        audio_path : str
+            Path for saving soundscape audio file.
+        ann : jams.Annotation
+            Annotation of the scaper namespace.
+        block_duration : float
+            Duration of the rendered blocks in seconds (default 10).
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will
+            be applied with `quick=True`.
+        disable_sox_warnings : bool
+            When True (default), warnings from the pysox module are suppressed
+            unless their level is ``'CRITICAL'``.
+        audio_format : str or None
+            Format of the audio files, e.g. 'WAV' or 'FLAC'. If None
+            (default), the format is given by the extension of
+            ``audio_path``.
+        audio_subtype : str or None
+            Sample type of the audio files, e.g. 'PCM_16', 'PCM_24',
+            'PCM_32' or 'FLOAT'. If None (default), 'PCM_32' if the format
+            supports it (e.g. WAV), otherwise the default of the format
+            ('PCM_16' for FLAC).
+
+        Raises
+        ------
+        ScaperError
+            If annotation is not of the scaper namespace, or if
+            ``block_duration`` is shorter than one sample.
+
+        See Also
+        --------
+        Scaper.generate_streamed
+
+        '''
+        if self.dtype not in ('float32', 'float64'):
+            raise ScaperError(
+                'Invalid dtype: {}. Must be \'float32\' or '
+                '\'float64\'.'.format(self.dtype))
+        block_samples = int(block_duration * self.sr)
+        if block_samples < 1:
+            raise ScaperError(
+                'Invalid block_duration: {}. Must be at least one '
+                'sample long.'.format(block_duration))
+        audio_format, audio_subtype = _check_audio_format(
+            audio_path, audio_format, audio_subtype)
+
+        # disable sox warnings
+        if disable_sox_warnings:
+            temp_logging_level = 'CRITICAL'  # only critical messages please
+        else:
+            temp_logging_level = logging.getLogger().level
+
+        with _set_temp_logging_level(temp_logging_level):
+            prepared = self._prepare_streamed(
+                ann, block_samples, quick_pitch_time=quick_pitch_time)
+
+            if len(ann.data) == 0:
+                warnings.warn(
+                    "No events to synthesize (silent soundscape), no audio "
+                    "generated.", ScaperWarning)
+            else:
+                max_sample = 0
+                with soundfile.SoundFile(
+                        audio_path, 'w', samplerate=self.sr,
+                        channels=self.n_channels, subtype=audio_subtype,
+                        format=audio_format) as f:
+                    for block in self._iter_streamed_blocks(
+                            ann, block_samples, prepared,
+                            quick_pitch_time=quick_pitch_time):
+                        max_sample = max(max_sample, np.max(np.abs(block)))
+                        f.write(block)
+
+                if max_sample > 1:
+                    warnings.warn('Soundscape audio is clipping!',
+                                  ScaperWarning)
+
+        ann.sandbox.scaper.soundscape_audio_path = audio_path
+        ann.sandbox.scaper.isolated_events_audio_path = []
+
     def generate(self,
                  audio_path=None,
                  jams_path=None,
@@ -2183,7 +3644,13 @@ class Scaper(object):
                  no_audio=False,
                  txt_path=None,
                  txt_sep='\t',
-                 disable_instantiation_warnings=False):
+                 disable_instantiation_warnings=False,
+                 writer=None,
+                 annotation_writer=None,
+                 audio_format=None,
+                 audio_subtype=None,
+                 dataset_writer=None,
+                 shard_writer=None):
         """
         Generate a soundscape based on the current specification and return as
         an audio file, a JAMS annotation, a simplified annotation list, and a
@@ -2272,6 +3739,36 @@ class Scaper(object):
             When True (default is False), warnings stemming from event
             instantiation (primarily about automatic duration adjustments) are
             disabled. Not recommended other than for testing purposes.
+        writer : AsyncWriter or None
+            If given, the audio, isolated events, JAMS and txt files are
+            written in the background by the writer's threads, and may not
+            be written yet when this function returns: call
+            ``writer.flush()`` to wait for them. The returned audio, JAMS and
+            annotation list must not be modified until then. If None
+            (default), files are written before returning.
+        annotation_writer : JsonlWriter or None
+            If given, the JAMS annotation is also appended to the writer's
+            JSON Lines file, e.g. instead of saving one JAMS file per
+            soundscape with ``jams_path``.
+        audio_format : str or None
+            Format of the audio files, e.g. 'WAV' or 'FLAC'. If None
+            (default), the format is given by the extension of
+            ``audio_path``.
+        audio_subtype : str or None
+            Sample type of the audio files, e.g. 'PCM_16', 'PCM_24',
+            'PCM_32' or 'FLOAT'. If None (default), 'PCM_32' if the format
+            supports it (e.g. WAV), otherwise the default of the format
+            ('PCM_16' for FLAC). Encoding is CPU-heavy for some formats such
+            as FLAC: with a ``writer`` with several threads, the soundscape
+            and the isolated events are encoded in parallel.
+        dataset_writer : DatasetWriter or None
+            If given, the soundscape audio, isolated events and JAMS
+            annotation are appended to the writer's dataset. If the dataset
+            stores isolated events, ``event_audio_format`` must not be None.
+        shard_writer : ShardWriter or None
+            If given, the soundscape audio, JAMS annotation and simplified
+            annotation list are written to the writer's current tar shard,
+            e.g. instead of saving them as individual files.
 
         Returns
         -------
@@ -2289,11 +3786,16 @@ class Scaper(object):
             in the same order in which they appear in the jams annotations data
             list, and can be matched with:
             `for obs, event_audio in zip(ann.data, event_audio_list): ...`.
+            If ``self.event_audio_format`` is 'sparse', the list contains
+            ``scaper.audio.EventAudio`` objects instead, and if it is None,
+            None is returned.
 
         Raises
         ------
         ScaperError
-            If the reverb parameter is passed an invalid value.
+            If the reverb parameter is passed an invalid value, or if a
+            ``dataset_writer`` or ``shard_writer`` is given with
+            no_audio=True.
 
         See Also
         --------
@@ -2310,6 +3812,12 @@ class Scaper(object):
                 raise ScaperError(
                     'Invalid value for reverb: must be in range [0, 1] or '
                     'None.')
+        for name, value in [('dataset_writer', dataset_writer),
+                            ('shard_writer', shard_writer)]:
+            if value is not None and no_audio:
+                raise ScaperError(
+                    'A {:s} stores audio, it cannot be used with '
+                    'no_audio=True.'.format(name))
 
         # Create specific instance of a soundscape based on the spec
         soundscape_jam = self._instantiate(
@@ -2333,7 +3841,10 @@ class Scaper(object):
                                      disable_sox_warnings=disable_sox_warnings,
                                      fix_clipping=fix_clipping,
                                      peak_normalization=peak_normalization,
-                                     quick_pitch_time=quick_pitch_time)
+                                     quick_pitch_time=quick_pitch_time,
+                                     writer=writer,
+                                     audio_format=audio_format,
+                                     audio_subtype=audio_subtype)
 
         # TODO: Stick to heavy handed overwriting for now, in the future we
         #  should consolidate this with what happens inside _instantiate().
@@ -2358,7 +3869,7 @@ class Scaper(object):
         
         # Save JAMS to disk too
         if jams_path is not None:
-            soundscape_jam.save(jams_path)
+            _write(writer, save_jams, soundscape_jam, jams_path)
 
         # Create annotation list
         annotation_list = []
@@ -2368,9 +3879,732 @@ class Scaper(object):
                     [obs.time, obs.time + obs.duration, obs.value['label']])
 
         if txt_path is not None:
-            with open(txt_path, 'w') as csv_file:
-                writer = csv.writer(csv_file, delimiter=txt_sep)
-                writer.writerows(annotation_list)
+            _write(writer, _write_txt, txt_path, annotation_list, txt_sep)
+
+        if annotation_writer is not None:
+            annotation_writer.write(soundscape_jam)
+
+        if dataset_writer is not None:
+            dataset_writer.write(soundscape_audio, soundscape_jam,
+                                 event_audio_list)
+
+        if shard_writer is not None:
+            shard_writer.write(soundscape_audio, soundscape_jam,
+                               annotation_list)
 
         # Return
         return soundscape_audio, soundscape_jam, annotation_list, event_audio_list
+
+    def generate_streamed(self,
+                          audio_path,
+                          jams_path=None,
+                          allow_repeated_label=True,
+                          allow_repeated_source=True,
+                          quick_pitch_time=False,
+                          disable_sox_warnings=True,
+                          txt_path=None,
+                          txt_sep='\t',
+                          disable_instantiation_warnings=False,
+                          block_duration=10.0,
+                          annotation_writer=None,
+                          audio_format=None,
+                          audio_subtype=None):
+        """
+        Generate a soundscape based on the current specification and write
+        its audio to disk block by block, for soundscapes too long to be
+        rendered in memory by ``Scaper.generate``.
+
+        The soundscape is rendered in blocks of ``block_duration`` seconds,
+        each block mixing only the events active in it, and is written to
+        ``audio_path`` as it is rendered. The loudness of backgrounds is
+        measured with a streaming estimator, ``scaper.audio.LoudnessMeter``.
+        Memory use is proportional to the block duration and to the
+        duration of the foreground events overlapping a block, rather than
+        to the duration of the soundscape. Backgrounds are read block by
+        block if their source files have the sample rate and number of
+        channels of the soundscape (e.g. prepared with
+        ``scaper.prepare_corpus``), otherwise the part of the source file
+        they use is converted at once, as in ``Scaper.generate``. The audio
+        is the same as the one
+        generated by ``Scaper.generate`` up to rounding errors.
+
+        Reverb, peak normalization (including ``fix_clipping``) and isolated
+        events need the whole soundscape and are not supported, and the
+        audio is not returned.
+
+        Parameters
+        ----------
+        audio_path : str
+            Path for saving soundscape audio to disk.
+        jams_path : str
+            Path for saving soundscape jams annotation to disk. If None, does
+            not save JAMS to disk.
+        allow_repeated_label : bool
+            When True (default) the same label can be used more than once
+            in a soundscape instantiation. When False every label can
+            only be used once.
+        allow_repeated_source : bool
+            When True (default) the same source file can be used more than once
+            in a soundscape instantiation. When False every source file can
+            only be used once.
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will be
+            applied with `quick=True`.
+        disable_sox_warnings : bool
+            When True (default), warnings from the pysox module are suppressed
+            unless their level is ``'CRITICAL'``.
+        txt_path: str or None
+            Path for saving a simplified annotation in a space separated format
+            [onset  offset  label] where onset and offset are in seconds. If
+            None, does not save txt annotation to disk.
+        txt_sep: str
+            The separator to use when saving a simplified annotation as a text
+            file (default is tab for compatibility with Audacity label files).
+            Only relevant if txt_path is not None.
+        disable_instantiation_warnings : bool
+            When True (default is False), warnings stemming from event
+            instantiation (primarily about automatic duration adjustments) are
+            disabled. Not recommended other than for testing purposes.
+        block_duration : float
+            Duration of the rendered blocks in seconds (default 10).
+        annotation_writer : JsonlWriter or None
+            If given, the JAMS annotation is also appended to the writer's
+            JSON Lines file.
+        audio_format : str or None
+            Format of the audio file, e.g. 'WAV' or 'FLAC'. If None
+            (default), the format is given by the extension of
+            ``audio_path``.
+        audio_subtype : str or None
+            Sample type of the audio file, e.g. 'PCM_16', 'PCM_24', 'PCM_32'
+            or 'FLOAT'. If None (default), 'PCM_32' if the format supports it
+            (e.g. WAV), otherwise the default of the format ('PCM_16' for
+            FLAC).
+
+        Returns
+        -------
+        soundscape_jam: jams.JAMS
+            The JAMS object containing the full soundscape annotation.
+        annotation_list : list
+            A simplified annotation in a space-separated format
+            [onset  offset  label] where onset and offset are in seconds.
+
+        Raises
+        ------
+        ScaperError
+            If ``block_duration`` is shorter than one sample.
+
+        See Also
+        --------
+        Scaper.generate
+
+        """
+        soundscape_jam = self._instantiate(
+            allow_repeated_label=allow_repeated_label,
+            allow_repeated_source=allow_repeated_source,
+            reverb=None,
+            disable_instantiation_warnings=disable_instantiation_warnings)
+        ann = soundscape_jam.annotations.search(namespace='scaper')[0]
+
+        self._generate_audio_streamed(
+            audio_path, ann, block_duration=block_duration,
+            quick_pitch_time=quick_pitch_time,
+            disable_sox_warnings=disable_sox_warnings,
+            audio_format=audio_format, audio_subtype=audio_subtype)
+
+        ann.sandbox.scaper.audio_path = audio_path
+        ann.sandbox.scaper.jams_path = jams_path
+        ann.sandbox.scaper.allow_repeated_label = allow_repeated_label
+        ann.sandbox.scaper.allow_repeated_source = allow_repeated_source
+        ann.sandbox.scaper.reverb = None
+        ann.sandbox.scaper.fix_clipping = False
+        ann.sandbox.scaper.peak_normalization = False
+        ann.sandbox.scaper.quick_pitch_time = quick_pitch_time
+        ann.sandbox.scaper.save_isolated_events = False
+        ann.sandbox.scaper.isolated_events_path = None
+        ann.sandbox.scaper.disable_sox_warnings = disable_sox_warnings
+        ann.sandbox.scaper.no_audio = False
+        ann.sandbox.scaper.txt_path = txt_path
+        ann.sandbox.scaper.txt_sep = txt_sep
+        ann.sandbox.scaper.disable_instantiation_warnings = disable_instantiation_warnings
+        ann.sandbox.scaper.peak_normalization_scale_factor = 1.0
+        ann.sandbox.scaper.ref_db_change = 0
+        ann.sandbox.scaper.ref_db_generated = self.ref_db
+
+        if jams_path is not None:
+            save_jams(soundscape_jam, jams_path)
+
+        annotation_list = []
+        for obs in ann.data:
+            if obs.value['role'] == 'foreground':
+                annotation_list.append(
+                    [obs.time, obs.time + obs.duration, obs.value['label']])
+
+        if txt_path is not None:
+            _write_txt(txt_path, annotation_list, txt_sep)
+
+        if annotation_writer is not None:
+            annotation_writer.write(soundscape_jam)
+
+        return soundscape_jam, annotation_list
+
+    def iter_blocks(self, block_duration=0.1, n=None, output=None,
+                    subtype='PCM_16', prefetch=1, realtime=False,
+                    allow_repeated_label=True, allow_repeated_source=True,
+                    quick_pitch_time=False, disable_sox_warnings=True,
+                    disable_instantiation_warnings=False):
+        '''
+        Generate a continuous stream of audio blocks of fixed size, e.g. to
+        feed a live pipeline, with the annotations of the events starting and
+        stopping in every block.
+
+        The stream is made of soundscapes generated one after the other from
+        the current specification and concatenated. The next ``prefetch``
+        soundscapes are instantiated and their events read, pitch shifted,
+        time stretched and measured by a background thread ahead of the
+        playhead, so that rendering a block only mixes audio that is ready
+        and never waits for sox. Blocks can be generated faster than real
+        time, or paced to real time with ``realtime=True``.
+
+        Blocks are optionally written as raw interleaved PCM (in native byte
+        order) to ``output``, e.g. a pipe to a live detector, before being
+        yielded. Reverb, peak normalization and isolated events are not
+        supported.
+
+        Parameters
+        ----------
+        block_duration : float
+            Duration of the blocks in seconds (default 0.1). The last block of
+            a finite stream is padded with silence.
+        n : int or None
+            Number of soundscapes in the stream. If None (default), the stream
+            is infinite.
+        output : int, file-like or None
+            File descriptor (e.g. of a pipe) or binary file-like object to
+            which the blocks are written as raw PCM. If None (default), blocks
+            are only yielded.
+        subtype : str
+            Sample type of the raw PCM written to ``output``: 'PCM_16'
+            (default), 'PCM_32' or 'FLOAT'. Integer samples are clipped.
+        prefetch : int
+            Number of soundscapes prepared ahead of the one being rendered
+            (default 1).
+        realtime : bool
+            If True, every block is yielded once the duration of the stream
+            up to the end of the block has elapsed since the stream started,
+            as if it were recorded live. Default False.
+        allow_repeated_label : bool
+            When True (default) the same label can be used more than once
+            in a soundscape instantiation. When False every label can
+            only be used once.
+        allow_repeated_source : bool
+            When True (default) the same source file can be used more than once
+            in a soundscape instantiation. When False every source file can
+            only be used once.
+        quick_pitch_time : bool
+            When True (default=False), time stretching and pitch shifting will be
+            applied with `quick=True`.
+        disable_sox_warnings : bool
+            When True (default), warnings from the pysox module are suppressed
+            unless their level is ``'CRITICAL'``. Only the messages of the
+            background thread are suppressed, the logging levels are not
+            changed.
+        disable_instantiation_warnings : bool
+            When True (default is False), warnings stemming from event
+            instantiation (primarily about automatic duration adjustments) are
+            disabled. Not recommended other than for testing purposes.
+
+        Returns
+        -------
+        blocks : iterator
+            Iterator over (block, events) tuples, where ``block`` is an array
+            of shape (n_samples, n_channels) and ``events`` the list of
+            ``StreamEvent`` of the events starting within the block, or
+            stopping within it or at its end, in order of time.
+
+        Raises
+        ------
+        ScaperError
+            If ``block_duration`` is shorter than one sample, if ``n`` is not
+            None or a non-negative integer, if ``prefetch`` is not a positive
+            integer or if ``subtype`` is not supported.
+
+        See Also
+        --------
+        Scaper.generate_streamed
+
+        StreamEvent
+
+        '''
+        block_samples = int(block_duration * self.sr)
+        if block_samples < 1:
+            raise ScaperError(
+                'Invalid block_duration: {}. Must be at least one '
+                'sample long.'.format(block_duration))
+        if n is not None and (not isinstance(n, numbers.Integral) or n < 0):
+            raise ScaperError('n must be None or a non-negative integer.')
+        if not isinstance(prefetch, numbers.Integral) or prefetch < 1:
+            raise ScaperError('prefetch must be a positive integer.')
+        if n is not None:
+            n = int(n)
+        prefetch = int(prefetch)
+        if subtype not in _PCM_DTYPES:
+            raise ScaperError(
+                'Invalid subtype: {}. Must be one of {}.'.format(
+                    subtype, sorted(_PCM_DTYPES)))
+        if self.dtype not in ('float32', 'float64'):
+            raise ScaperError(
+                'Invalid dtype: {}. Must be \'float32\' or '
+                '\'float64\'.'.format(self.dtype))
+
+        kwargs = dict(
+            allow_repeated_label=allow_repeated_label,
+            allow_repeated_source=allow_repeated_source,
+            quick_pitch_time=quick_pitch_time,
+            disable_sox_warnings=disable_sox_warnings,
+            disable_instantiation_warnings=disable_instantiation_warnings)
+        return self._stream_blocks(block_samples, n, output, subtype,
+                                   prefetch, realtime, kwargs)
+
+    def _prepare_stream_item(self, block_samples, allow_repeated_label=True,
+                             allow_repeated_source=True,
+                             quick_pitch_time=False, disable_sox_warnings=True,
+                             disable_instantiation_warnings=False):
+        '''
+        Instantiate a soundscape of a block stream and prepare its rendering,
+        with its foreground events preloaded.
+        '''
+        soundscape_jam = self._instantiate(
+            allow_repeated_label=allow_repeated_label,
+            allow_repeated_source=allow_repeated_source,
+            reverb=None,
+            disable_instantiation_warnings=disable_instantiation_warnings)
+        ann = soundscape_jam.annotations.search(namespace='scaper')[0]
+
+        # This runs in the prefetch thread: only ignore the sox messages of
+        # this thread, changing the level of the root logger would also
+        # affect the consumer
+        if disable_sox_warnings:
+            temp_logging_level = 'CRITICAL'  # only critical messages please
+        else:
+            temp_logging_level = logging.NOTSET
+        with _set_temp_thread_logging_level(temp_logging_level):
+            prepared = self._prepare_streamed(
+                ann, block_samples, quick_pitch_time=quick_pitch_time,
+                preload=True)
+        return ann, prepared
+
+    def _stream_marks(self, ann, prepared, soundscape, stream_offset):
+        '''
+        Start and stop marks of the events of a soundscape of a block
+        stream, as (sample, order, StreamEvent) tuples sorted by sample.
+        '''
+        backgrounds, onsets, foregrounds = prepared
+        extents = [(0, length, i)
+                   for i, (_, length, _) in backgrounds.items()]
+        extents += [(offset, offset + audio.shape[0], i)
+                    for i, (offset, audio) in foregrounds.items()]
+        marks = []
+        for onset, end, i in extents:
+            if end <= onset:
+                continue
+            value = ann.data[i].value
+            for kind, sample, order in [('start', onset, 1),
+                                        ('stop', end, 0)]:
+                sample += stream_offset
+                event = StreamEvent(kind, sample / float(self.sr),
+                                    soundscape, value['label'], value)
+                marks.append((sample, order, i, event))
+        marks.sort(key=lambda mark: mark[:3])
+        return [(sample, order, event) for sample, order, _, event in marks]
+
+    def _stream_blocks(self, block_samples, n, output, subtype, prefetch,
+                       realtime, kwargs):
+        '''
+        Generator of the blocks of ``Scaper.iter_blocks``.
+        '''
+        duration_in_samples = int(self.duration * self.sr)
+        indices = itertools.count() if n is None else iter(range(n))
+        # A single thread prepares soundscapes in order, so that they are
+        # drawn from the random state in order
+        executor = ThreadPoolExecutor(max_workers=1)
+        pending = deque()
+
+        def _submit():
+            if next(indices, None) is not None:
+                pending.append(executor.submit(
+                    self._prepare_stream_item, block_samples, **kwargs))
+
+        block = np.zeros((block_samples, self.n_channels), dtype=self.dtype)
+        filled = 0
+        block_start = 0
+        marks = deque()
+        start_time = time.monotonic()
+
+        def _emit(last=False):
+            block_end = block_start + block_samples
+            events = []
+            # starts within the block, stops within it or at its end
+            while marks and (last or marks[0][0] < block_end or
+                             (marks[0][0] == block_end and marks[0][1] == 0)):
+                events.append(marks.popleft()[2])
+            if output is not None:
+                pcm = _to_pcm(block, subtype)
+                if isinstance(output, int):
+                    view = memoryview(pcm)
+                    while view:
+                        view = view[os.write(output, view):]
+                else:
+                    output.write(pcm)
+                    if hasattr(output, 'flush'):
+                        output.flush()
+            if realtime:
+                delay = (start_time + block_end / float(self.sr) -
+                         time.monotonic())
+                if delay > 0:
+                    time.sleep(delay)
+            return block, events
+
+        try:
+            for _ in range(prefetch + 1):
+                _submit()
+            soundscape = 0
+            while pending:
+                ann, prepared = pending.popleft().result()
+                _submit()
+                marks.extend(self._stream_marks(
+                    ann, prepared, soundscape,
+                    soundscape * duration_in_samples))
+                for audio in self._iter_streamed_blocks(
+                        ann, block_samples, prepared):
+                    position = 0
+                    while position < audio.shape[0]:
+                        n_copy = min(block_samples - filled,
+                                     audio.shape[0] - position)
+                        block[filled:filled + n_copy] = \
+                            audio[position:position + n_copy]
+                        filled += n_copy
+                        position += n_copy
+                        if filled == block_samples:
+                            yield _emit()
+                            block = np.zeros_like(block)
+                            filled = 0
+                            block_start += block_samples
+                soundscape += 1
+            if filled or marks:
+                yield _emit(last=True)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def generate_batch(self, n, out_dir, n_jobs=None, executor=None,
+                       seed=None, filename_template='soundscape{index:d}',
+                       save_jams=True, save_txt=True, shard_index=0,
+                       num_shards=1, writer=None, save_audio=True,
+                       dataset_writer=None, shard_writer=None, **kwargs):
+        '''
+        Generate a batch of soundscapes based on the current specification
+        and save them to disk, in parallel.
+
+        Every soundscape is instantiated and rendered with its own random
+        state, seeded from a seed sequence spawned from ``seed``
+        (see ``np.random.SeedSequence``), so the generated soundscapes only
+        depend on ``seed`` and not on the number of workers or on the order
+        in which they run. Soundscape ``i`` is saved to
+        ``<out_dir>/<filename_template.format(index=i)>.wav``, with its JAMS
+        annotation and simplified txt annotation next to it (``.jams`` and
+        ``.txt`` extensions). If ``audio_format`` is passed on to
+        ``Scaper.generate``, the audio files have its extension instead,
+        e.g. ``.flac``.
+
+        A batch can be split into ``num_shards`` shards generated by
+        separate processes, possibly on different machines sharing
+        ``out_dir``: the shard ``shard_index`` generates the soundscapes
+        whose index ``i`` satisfies ``i % num_shards == shard_index``. Files
+        are written to temporary files and renamed once complete, and every
+        generated soundscape is then appended to a manifest of the shard in
+        ``out_dir``. Soundscapes recorded in the manifests of any shard are
+        skipped, so an interrupted batch is resumed by running it again with
+        the same ``seed``.
+
+        Parameters
+        ----------
+        n : int
+            Number of soundscapes in the batch.
+        out_dir : str
+            Folder in which to save the soundscapes. Created if it doesn't
+            exist.
+        n_jobs : int or None
+            Number of worker processes used if ``executor`` is None. If None
+            (default), the number of CPUs is used. If 1, soundscapes are
+            generated in the current process.
+        executor : concurrent.futures.Executor or None
+            Executor used to generate the soundscapes, e.g. a
+            ``ThreadPoolExecutor`` or an existing process pool. The executor
+            is not shut down. If None (default), a process pool is created,
+            and the Scaper object (with its catalog and audio cache) is sent
+            once to every worker process. With an existing process pool, it
+            is sent with every soundscape.
+        seed : int, sequence of ints, np.random.SeedSequence or None
+            Seed of the batch. If None (default), the seed is drawn from the
+            Scaper object's random state, so that a Scaper object created with
+            a fixed ``random_state`` generates reproducible batches. Shards of
+            the same batch must use the same seed.
+        filename_template : str
+            Template of the file names of each soundscape, without extension,
+            formatted with the index of the soundscape in the batch. Defaults
+            to ``'soundscape{index:d}'``.
+        save_jams : bool
+            Whether to save the JAMS annotation of each soundscape (default
+            True).
+        save_txt : bool
+            Whether to save the simplified txt annotation of each soundscape
+            (default True).
+        shard_index : int
+            Index of the shard to generate, between 0 and ``num_shards - 1``
+            (default 0).
+        num_shards : int
+            Number of shards the batch is split into (default 1).
+        writer : AsyncWriter or None
+            If given, files are written in the background by the writer's
+            threads while the next soundscapes are rendered, and renamed and
+            recorded in the manifest once written. All files are written
+            when this function returns. Only supported when soundscapes are
+            generated in the current process, i.e. with ``n_jobs=1`` or a
+            ``ThreadPoolExecutor``. If None (default), every soundscape is
+            written as soon as it is rendered.
+        save_audio : bool
+            Whether to save the audio of each soundscape (default True),
+            e.g. False to only store it with ``dataset_writer`` or
+            ``shard_writer``.
+        dataset_writer : DatasetWriter or None
+            If given, every soundscape is appended to the writer's dataset
+            with its index in the batch as key, in the order in which
+            soundscapes are generated. Only supported when soundscapes are
+            generated in the current process, i.e. with ``n_jobs=1`` or a
+            ``ThreadPoolExecutor``. Soundscapes of an interrupted batch that
+            are generated again when resuming it are appended again.
+        shard_writer : ShardWriter or None
+            If given, every soundscape is also written to the writer's tar
+            shards, with its file name (given by ``filename_template``) as
+            key. Set ``save_audio``, ``save_jams`` and ``save_txt`` to False
+            to only write tar shards. Soundscapes are only recorded as
+            generated once their tar shard is finalized, so resuming an
+            interrupted batch generates again the soundscapes of the tar
+            shard that was being written. The current tar shard is
+            finalized at the end of the batch. Only supported when
+            soundscapes are generated in the current process, as
+            ``dataset_writer``.
+        **kwargs
+            Other arguments passed on to ``Scaper.generate``, e.g.
+            ``reverb`` or ``save_isolated_events``.
+
+        Returns
+        -------
+        paths : list
+            List of (audio_path, jams_path, txt_path) tuples of the
+            soundscapes of the shard generated by this call, in order. Paths
+            of files that are not saved are None.
+
+        Raises
+        ------
+        ScaperError
+            If ``n`` is not a non-negative integer, if the shard is invalid,
+            if output paths are passed in ``kwargs``, if
+            ``filename_template`` doesn't give a different name to every
+            soundscape, if ``out_dir`` contains soundscapes of a batch
+            with a different seed, or if ``writer``, ``dataset_writer`` or
+            ``shard_writer`` is given and soundscapes are generated in other
+            processes.
+
+        See Also
+        --------
+        Scaper.generate
+
+        '''
+        if not isinstance(n, numbers.Integral) or n < 0:
+            raise ScaperError('n must be a non-negative integer.')
+        n = int(n)
+        if not isinstance(num_shards, numbers.Integral) or num_shards < 1:
+            raise ScaperError('num_shards must be a positive integer.')
+        if not isinstance(shard_index, numbers.Integral) or \
+                not 0 <= shard_index < num_shards:
+            raise ScaperError(
+                'shard_index must be an integer between 0 and '
+                'num_shards - 1.')
+        num_shards, shard_index = int(num_shards), int(shard_index)
+        for key in ['audio_path', 'jams_path', 'txt_path',
+                    'isolated_events_path']:
+            if key in kwargs:
+                raise ScaperError(
+                    '{:s} cannot be set when generating a batch, paths are '
+                    'given by out_dir and filename_template.'.format(key))
+        _check_filename_template(filename_template)
+        for name, value in [('writer', writer),
+                            ('dataset_writer', dataset_writer),
+                            ('shard_writer', shard_writer)]:
+            if value is not None and (
+                    (executor is None and n_jobs != 1) or
+                    isinstance(executor, ProcessPoolExecutor)):
+                raise ScaperError(
+                    'A {:s} can only be used when soundscapes are generated '
+                    'in the current process, with n_jobs=1 or a '
+                    'ThreadPoolExecutor.'.format(name))
+
+        audio_extension = '.wav'
+        if kwargs.get('audio_format') is not None:
+            audio_extension = '.' + kwargs['audio_format'].lower()
+
+        seed_sequence = _seed_sequence(seed, self.random_state)
+        os.makedirs(out_dir, exist_ok=True)
+        done = _read_manifests(out_dir, seed_sequence.entropy)
+        manifest_path = os.path.join(
+            out_dir, BATCH_MANIFEST.format(shard_index, num_shards))
+        _end_manifest_line(manifest_path)
+
+        jobs = (
+            (self, index, _item_seed(seed_sequence, index)) +
+            _item_paths(out_dir, filename_template, index,
+                        save_audio=save_audio and not kwargs.get(
+                            'no_audio', False),
+                        save_jams=save_jams, save_txt=save_txt,
+                        audio_extension=audio_extension) +
+            (kwargs, manifest_path, writer, dataset_writer, shard_writer,
+             filename_template.format(index=index))
+            for index in range(shard_index, n, num_shards)
+            if index not in done)
+        paths = _run_jobs(_generate_item, jobs, n_jobs=n_jobs,
+                          executor=executor, shared=self)
+        if writer is not None:
+            writer.flush()
+        if dataset_writer is not None:
+            dataset_writer.flush()
+        if shard_writer is not None:
+            shard_writer.flush()
+        return paths
+
+    def iter_soundscapes(self, n=None, prefetch=None, n_workers=None,
+                         executor=None, seed=None, ring=None, **kwargs):
+        '''
+        Generate a stream of soundscapes based on the current specification,
+        rendered in the background while the previous ones are consumed.
+
+        Soundscapes are generated by worker processes (or the workers of
+        ``executor``) and yielded in order. At most ``prefetch`` soundscapes
+        are generated ahead of the consumer: workers wait for the consumer
+        to catch up instead of filling memory with soundscapes. When the
+        consumer stops iterating (or the iterator is closed), pending
+        soundscapes are cancelled and the worker processes are shut down.
+
+        As with ``Scaper.generate_batch``, every soundscape is generated with
+        its own random state spawned from ``seed``, so the stream only
+        depends on ``seed`` and not on the number of workers. Nothing is
+        saved to disk.
+
+        By default the audio of every soundscape is pickled and sent back by
+        the worker that generated it. With a ``ring``, workers write the
+        audio to a slot of the shared memory ring instead, and the consumer
+        receives views of the slot: only the annotations are pickled. The
+        consumer must release every soundscape with ``ring.release(audio)``
+        once done with its audio (and isolated events), so that the slot can
+        be reused. Generation waits for free slots, and fails if all the
+        slots are held by the consumer.
+
+        Parameters
+        ----------
+        n : int or None
+            Number of soundscapes to generate. If None (default), the stream
+            is infinite.
+        prefetch : int or None
+            Maximum number of soundscapes generated ahead of the consumer.
+            If None (default), twice the number of workers.
+        n_workers : int or None
+            Number of worker processes used if ``executor`` is None. If None
+            (default), the number of CPUs is used. If 1, soundscapes are
+            generated in the current process when requested, without
+            prefetching.
+        executor : concurrent.futures.Executor or None
+            Executor used to generate the soundscapes, e.g. a
+            ``ThreadPoolExecutor`` or an existing process pool. The executor
+            is not shut down. If None (default), a process pool is created,
+            and the Scaper object (with its catalog and audio cache) is sent
+            once to every worker process. With an existing process pool, it
+            is sent with every soundscape.
+        seed : int, sequence of ints, np.random.SeedSequence or None
+            Seed of the stream. If None (default), the seed is drawn from the
+            Scaper object's random state.
+        ring : SharedAudioRing or None
+            Shared memory ring through which the audio is sent back by the
+            workers, created by the current process with slots of at least
+            ``int(duration * sr)`` samples and with the same number of
+            channels and dtype as the Scaper object. Isolated events are
+            only returned if the ring stores stems (as dense arrays, however
+            ``event_audio_format`` is set), and generation fails if a
+            soundscape has more events than the ring stores. If None
+            (default), the audio is pickled.
+        **kwargs
+            Other arguments passed on to ``Scaper.generate``, e.g.
+            ``reverb`` or ``fix_clipping``. Output paths can't be set.
+
+        Returns
+        -------
+        soundscapes : iterator
+            Iterator over the (soundscape_audio, soundscape_jam,
+            annotation_list, event_audio_list) tuples returned by
+            ``Scaper.generate`` for each soundscape.
+
+        Raises
+        ------
+        ScaperError
+            If ``n`` is not None or a non-negative integer, if ``prefetch``
+            is not None or a positive integer, if output paths are passed
+            in ``kwargs``, or if the slots of ``ring`` don't fit the
+            soundscapes.
+
+        See Also
+        --------
+        Scaper.generate
+
+        Scaper.generate_batch
+
+        SharedAudioRing
+
+        '''
+        if n is not None and (not isinstance(n, numbers.Integral) or n < 0):
+            raise ScaperError('n must be None or a non-negative integer.')
+        if prefetch is not None and (
+                not isinstance(prefetch, numbers.Integral) or prefetch < 1):
+            raise ScaperError('prefetch must be None or a positive integer.')
+        if n is not None:
+            n = int(n)
+        if prefetch is not None:
+            prefetch = int(prefetch)
+        for key in ['audio_path', 'jams_path', 'txt_path',
+                    'isolated_events_path', 'save_isolated_events']:
+            if kwargs.get(key):
+                raise ScaperError(
+                    '{:s} cannot be set when iterating over soundscapes, '
+                    'use generate_batch to save soundscapes.'.format(key))
+        if ring is not None and (
+                ring.n_samples < int(self.duration * self.sr) or
+                ring.n_channels != self.n_channels or
+                ring.dtype != self.dtype):
+            raise ScaperError(
+                'The slots of {!r} do not fit soundscapes of {:d} samples, '
+                '{:d} channel(s) and dtype {}.'.format(
+                    ring, int(self.duration * self.sr), self.n_channels,
+                    self.dtype))
+
+        if prefetch is None:
+            prefetch = 2 * (n_workers or os.cpu_count() or 1)
+        seed_sequence = _seed_sequence(seed, self.random_state)
+        indices = itertools.count() if n is None else range(n)
+        jobs = ((self, _item_seed(seed_sequence, index), kwargs)
+                for index in indices)
+        # the soundscape being consumed is not counted in prefetch
+        soundscapes = _iter_jobs(_generate_in_memory, jobs, n_jobs=n_workers,
+                                 executor=executor, max_pending=prefetch + 1,
+                                 ring=ring, shared=self)
+        if ring is not None:
+            soundscapes = _read_ring(soundscapes, ring)
+        return soundscapes
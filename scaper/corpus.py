@@ -0,0 +1,545 @@
+'''
+Corpus tools
+============
+'''
+
+try:
+    import soxbindings as sox
+except: # pragma: no cover
+    import sox # pragma: no cover
+from concurrent.futures import ProcessPoolExecutor
+import json
+import numbers
+import os
+import shutil
+import numpy as np
+import soundfile
+from .catalog import SourceCatalog, SourceInfo
+from .scaper_exceptions import ScaperError
+from .util import _get_sorted_files
+from .util import _populate_label_list
+from .util import _validate_folder_path
+
+
+PACK_VERSION = 1
+PACK_INDEX = 'index.json'
+PACK_DATA = 'audio.dat'
+PACK_DTYPES = ['float32', 'int16']
+
+PREPARED_VERSION = 1
+PREPARED_MANIFEST = '.scaper_prepared.json'
+
+
+def pack_corpus(fg_path, bg_path, out_path, dtype='float32'):
+    '''
+    Pack the source files of a foreground and a background folder into a
+    single data file plus an index, which can be passed to ``Scaper`` in
+    place of ``fg_path`` and ``bg_path``.
+
+    The pack is a folder containing ``audio.dat``, the samples of all source
+    files stored back to back (frames x channels, interleaved), and
+    ``index.json``, which stores the labels, the sorted file list of every
+    label folder and, for every source file, its offset in the data file and
+    its metadata. Source files are identified by the same paths that Scaper
+    would use when reading the original folders, so JAMS files generated
+    from a pack and from the original folders are identical.
+
+    Parameters
+    ----------
+    fg_path : str
+        Path to foreground folder.
+    bg_path : str
+        Path to background folder.
+    out_path : str
+        Path to the folder in which to create the pack.
+    dtype : str
+        Sample format of the data file: 'float32' (default) or 'int16'.
+        Reading from a float32 pack returns views of the memory-mapped data
+        file without copying, reading from an int16 pack (half the size)
+        converts the samples read to float32.
+
+    Returns
+    -------
+    corpus : PackedCorpus
+        The newly created pack.
+
+    Raises
+    ------
+    ScaperError
+        If ``dtype`` is not supported or if ``fg_path`` or ``bg_path`` do not
+        point to valid folders.
+
+    '''
+    if dtype not in PACK_DTYPES:
+        raise ScaperError(
+            'Unsupported pack dtype {}, must be one of {}'.format(
+                dtype, PACK_DTYPES))
+
+    fg_path = os.path.expanduser(fg_path)
+    bg_path = os.path.expanduser(bg_path)
+    _validate_folder_path(fg_path)
+    _validate_folder_path(bg_path)
+
+    if not os.path.isdir(out_path):
+        os.makedirs(out_path)
+
+    index = {
+        'version': PACK_VERSION,
+        'dtype': dtype,
+        'fg_path': fg_path,
+        'bg_path': bg_path,
+        'fg_labels': [],
+        'bg_labels': [],
+        'folders': {},
+        'sources': {},
+    }
+    _populate_label_list(fg_path, index['fg_labels'])
+    _populate_label_list(bg_path, index['bg_labels'])
+
+    offset = 0
+    with open(os.path.join(out_path, PACK_DATA), 'wb') as f:
+        for root, labels in [(fg_path, index['fg_labels']),
+                             (bg_path, index['bg_labels'])]:
+            for label in labels:
+                label_path = os.path.join(root, label)
+                files = _get_sorted_files(label_path)
+                index['folders'][label_path] = files
+
+                for source_file in files:
+                    try:
+                        audio, sr = soundfile.read(
+                            source_file, dtype=dtype, always_2d=True)
+                    except RuntimeError:
+                        # Not an audio file, keep it listed so that the
+                        # choice of source files is unchanged.
+                        continue
+                    stat = os.stat(source_file)
+                    f.write(np.ascontiguousarray(audio).tobytes())
+                    index['sources'][source_file] = {
+                        'label': label,
+                        'duration': audio.shape[0] / float(sr),
+                        'samplerate': sr,
+                        'channels': audio.shape[1],
+                        'frames': audio.shape[0],
+                        'mtime': stat.st_mtime,
+                        'size': stat.st_size,
+                        'offset': offset,
+                    }
+                    offset += audio.size
+
+    with open(os.path.join(out_path, PACK_INDEX), 'w') as f:
+        json.dump(index, f)
+
+    return PackedCorpus(out_path)
+
+
+def _prepare_source(source_file, out_file, sr, n_channels):
+    '''
+    Convert a single source file to ``sr`` and ``n_channels`` and save it to
+    ``out_file``. Files that cannot be read as audio are copied as is.
+    '''
+    try:
+        sfinfo = soundfile.info(source_file)
+    except RuntimeError:
+        shutil.copy2(source_file, out_file)
+        return
+
+    audio, source_sr = soundfile.read(source_file, always_2d=True)
+    # Same conversion as applied to every event when generating from
+    # unprepared sources.
+    tfm = sox.Transformer()
+    tfm.convert(
+        samplerate=sr,
+        n_channels=n_channels,
+        bitdepth=None
+    )
+    tfm.set_output_format(
+        rate=sr,
+        channels=n_channels
+    )
+    audio = tfm.build_array(
+        input_array=audio,
+        sample_rate_in=source_sr
+    )
+    audio = audio.reshape(-1, n_channels)
+
+    # Keep the container format of the source file, storing float samples
+    # whenever the format supports them.
+    if soundfile.check_format(sfinfo.format, 'FLOAT'):
+        subtype = 'FLOAT'
+    else:
+        subtype = sfinfo.subtype
+    soundfile.write(out_file, audio, sr, format=sfinfo.format,
+                    subtype=subtype)
+
+
+def _remove_stale_labels(prepared_path, labels):
+    '''
+    Remove the label folders of ``prepared_path`` that are not in
+    ``labels``.
+    '''
+    stale_labels = []
+    _populate_label_list(prepared_path, stale_labels)
+    for label in stale_labels:
+        if label not in labels:
+            shutil.rmtree(os.path.join(prepared_path, label))
+
+
+def _remove_stale_files(label_path, names):
+    '''
+    Remove the files of ``label_path`` whose name is not in ``names``.
+    '''
+    for out_file in _get_sorted_files(label_path):
+        if os.path.basename(out_file) not in names:
+            os.remove(out_file)
+
+
+def _is_prepared_file(source_file, out_file, sr, n_channels):
+    '''
+    Whether ``out_file`` is an up to date conversion of ``source_file``.
+    '''
+    if not os.path.isfile(out_file) or \
+            os.path.getmtime(out_file) < os.path.getmtime(source_file):
+        return False
+    try:
+        sfinfo = soundfile.info(out_file)
+    except RuntimeError:
+        # Copied non-audio file
+        return True
+    return sfinfo.samplerate == sr and sfinfo.channels == n_channels
+
+
+def _load_prepared_manifest(folder_path):
+    '''
+    Return the manifest written to ``folder_path`` by ``prepare_corpus``,
+    complete or not, or None if there is no valid manifest.
+    '''
+    manifest_path = os.path.join(folder_path, PREPARED_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except ValueError:
+        return None
+    if not isinstance(manifest, dict) or \
+            manifest.get('version') != PREPARED_VERSION:
+        return None
+    return manifest
+
+
+def _read_prepared_manifest(folder_path):
+    '''
+    Return the manifest of a folder prepared with ``prepare_corpus``, or None
+    if ``folder_path`` is not a prepared folder or its preparation is not
+    complete.
+    '''
+    manifest = _load_prepared_manifest(folder_path)
+    if manifest is None or not manifest.get('complete'):
+        return None
+    return manifest
+
+
+def _write_prepared_manifest(prepared_path, role, source_path, sr,
+                             n_channels, complete):
+    '''
+    Write the manifest of a prepared folder.
+    '''
+    manifest = {
+        'version': PREPARED_VERSION,
+        'role': role,
+        'source_path': source_path,
+        'sr': sr,
+        'n_channels': n_channels,
+        'complete': complete,
+    }
+    with open(os.path.join(prepared_path, PREPARED_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+
+def _check_prepared_path(prepared_path, role, source_path, source_paths):
+    '''
+    Check that ``prepared_path`` can be written by ``prepare_corpus``: it
+    must not be one of the source folders or inside one of them, and if it
+    exists and isn't empty, it must have been prepared from
+    ``source_path``.
+    '''
+    real_path = os.path.realpath(prepared_path)
+    for path in source_paths:
+        real_source_path = os.path.realpath(path)
+        if real_path == real_source_path or \
+                real_path.startswith(real_source_path + os.sep):
+            raise ScaperError(
+                'The prepared folder {:s} is inside the source folder {:s}, '
+                'whose files would be overwritten.'.format(
+                    prepared_path, path))
+    if not os.path.isdir(prepared_path) or not os.listdir(prepared_path):
+        return
+    manifest = _load_prepared_manifest(prepared_path)
+    if manifest is None or manifest.get('role') != role or \
+            not isinstance(manifest.get('source_path'), str) or \
+            os.path.realpath(manifest['source_path']) != \
+            os.path.realpath(source_path):
+        raise ScaperError(
+            'The folder {:s} exists and was not prepared from {:s}: remove '
+            'it or use another out_path.'.format(prepared_path, source_path))
+
+
+def prepare_corpus(fg_path, bg_path, out_path, sr, n_channels, n_jobs=None):
+    '''
+    Convert all the source files of a foreground and a background folder to
+    a given sample rate and number of channels, so that Scaper doesn't have
+    to convert them every time they are used.
+
+    The converted files are saved to ``out_path/foreground`` and
+    ``out_path/background`` using the same label folders and file names as
+    the original folders, and the same audio format (with float samples if
+    the format supports them). Files that cannot be read as audio are copied
+    as is, so the files available for each label are unchanged. Each
+    prepared folder contains a manifest recording ``sr`` and
+    ``n_channels``: when a Scaper object whose ``sr`` and ``n_channels``
+    match the manifest generates audio from a prepared folder, the sample
+    rate and channel conversion of every event is skipped, and sox is only
+    run for pitch shifting and time stretching.
+
+    Files that already exist in ``out_path`` with the right sample rate and
+    number of channels and are more recent than their source file are not
+    converted again, so an interrupted preparation can
+    be resumed by calling ``prepare_corpus`` again. Label folders and files
+    in ``out_path`` whose source no longer exists are removed. Existing
+    folders in ``out_path`` that were not prepared from ``fg_path`` or
+    ``bg_path`` are never modified.
+
+    Parameters
+    ----------
+    fg_path : str
+        Path to foreground folder.
+    bg_path : str
+        Path to background folder.
+    out_path : str
+        Path to the folder in which to save the prepared folders.
+    sr : int
+        Target sample rate.
+    n_channels : int
+        Target number of channels.
+    n_jobs : int or None
+        Number of worker processes used for converting files. If None
+        (default), the number of CPUs is used. If 1, files are converted in
+        the current process.
+
+    Returns
+    -------
+    prepared_fg_path : str
+        Path to the prepared foreground folder.
+    prepared_bg_path : str
+        Path to the prepared background folder.
+
+    Raises
+    ------
+    ScaperError
+        If ``fg_path`` or ``bg_path`` do not point to valid folders, if
+        ``sr`` or ``n_channels`` are not positive integers, if a prepared
+        folder would be inside ``fg_path`` or ``bg_path``, or if
+        ``out_path/foreground`` or ``out_path/background`` is an existing
+        folder that was not prepared from ``fg_path`` or ``bg_path``.
+
+    '''
+    if not isinstance(sr, numbers.Integral) or sr <= 0:
+        raise ScaperError('sr must be a positive integer.')
+    if not isinstance(n_channels, numbers.Integral) or n_channels <= 0:
+        raise ScaperError('n_channels must be a positive integer.')
+    sr, n_channels = int(sr), int(n_channels)
+
+    fg_path = os.path.abspath(os.path.expanduser(fg_path))
+    bg_path = os.path.abspath(os.path.expanduser(bg_path))
+    _validate_folder_path(fg_path)
+    _validate_folder_path(bg_path)
+
+    roles = [('foreground', fg_path), ('background', bg_path)]
+    prepared_paths = [os.path.join(out_path, role) for role, _ in roles]
+    for (role, root), prepared_path in zip(roles, prepared_paths):
+        _check_prepared_path(prepared_path, role, root, [fg_path, bg_path])
+
+    jobs = []
+    for (role, root), prepared_path in zip(roles, prepared_paths):
+        # The manifest is marked as incomplete until all files are converted
+        if not os.path.isdir(prepared_path):
+            os.makedirs(prepared_path)
+        _write_prepared_manifest(prepared_path, role, root, sr, n_channels,
+                                 False)
+
+        labels = []
+        _populate_label_list(root, labels)
+        _remove_stale_labels(prepared_path, labels)
+        for label in labels:
+            label_path = os.path.join(prepared_path, label)
+            if not os.path.isdir(label_path):
+                os.makedirs(label_path)
+            source_files = _get_sorted_files(os.path.join(root, label))
+            _remove_stale_files(
+                label_path, [os.path.basename(x) for x in source_files])
+            for source_file in source_files:
+                out_file = os.path.join(
+                    label_path, os.path.basename(source_file))
+                if _is_prepared_file(source_file, out_file, sr, n_channels):
+                    continue
+                jobs.append((source_file, out_file, sr, n_channels))
+
+    if n_jobs == 1:
+        for job in jobs:
+            _prepare_source(*job)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_prepare_source, *job)
+                       for job in jobs]
+            for future in futures:
+                future.result()
+
+    for (role, root), prepared_path in zip(roles, prepared_paths):
+        _write_prepared_manifest(prepared_path, role, root, sr, n_channels,
+                                 True)
+
+    return prepared_paths[0], prepared_paths[1]
+
+
+def _as_packed_corpus(path):
+    '''
+    Return ``path`` as a PackedCorpus if it is one or if it points to a pack
+    folder, otherwise return None.
+    '''
+    if isinstance(path, PackedCorpus):
+        return path
+    if isinstance(path, str):
+        index_path = os.path.join(os.path.expanduser(path), PACK_INDEX)
+        if os.path.isfile(index_path):
+            return PackedCorpus(path)
+    return None
+
+
+class PackedCorpus(SourceCatalog):
+    '''
+    A corpus of source files packed with ``pack_corpus``.
+
+    A PackedCorpus (or the path to its folder) can be passed to ``Scaper``
+    and ``generate_from_jams`` in place of ``fg_path`` and/or ``bg_path``.
+    It then serves as the Scaper object's source catalog: labels, file lists
+    and metadata come from the pack's index, and source audio is read as
+    views of the memory-mapped data file instead of opening each source
+    file. Source files that are not part of the pack are read from disk.
+
+    Parameters
+    ----------
+    path : str
+        Path to the pack folder.
+
+    Attributes
+    ----------
+    fg_path : str
+        Path of the foreground folder the pack was created from.
+    bg_path : str
+        Path of the background folder the pack was created from.
+    fg_labels : list
+        Foreground labels in the pack.
+    bg_labels : list
+        Background labels in the pack.
+    '''
+
+    def __init__(self, path):
+        SourceCatalog.__init__(self)
+        self.path = os.path.expanduser(path)
+
+        index_path = os.path.join(self.path, PACK_INDEX)
+        if not os.path.isfile(index_path):
+            raise ScaperError(
+                'Path "{:s}" does not point to a valid pack'.format(path))
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if index.get('version') != PACK_VERSION:
+            raise ScaperError(
+                'Unsupported pack version: {}'.format(index.get('version')))
+
+        self.dtype = index['dtype']
+        self.fg_path = index['fg_path']
+        self.bg_path = index['bg_path']
+        self.fg_labels = index['fg_labels']
+        self.bg_labels = index['bg_labels']
+        self._folders.update(index['folders'])
+        self._scanned[self.fg_path] = self.fg_labels
+        self._scanned[self.bg_path] = self.bg_labels
+
+        self._offsets = {}
+        for source_file, values in index['sources'].items():
+            self._offsets[source_file] = values.pop('offset')
+            self._sources[source_file] = SourceInfo(**values)
+
+        self._open()
+
+    def _open(self):
+        data_path = os.path.join(self.path, PACK_DATA)
+        if os.path.getsize(data_path) > 0:
+            self._data = np.memmap(data_path, dtype=self.dtype, mode='r')
+        else:
+            self._data = np.zeros(0, dtype=self.dtype)
+
+    def __getstate__(self):
+        # Don't copy the memory-mapped data when pickling, reopen it instead
+        state = self.__dict__.copy()
+        del state['_data']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def info(self, source_file):
+        '''
+        Return the metadata of a source file. The metadata of packed files
+        is the one recorded in the pack, whether or not the original file
+        has changed since, see ``SourceCatalog.info``.
+        '''
+        if source_file in self._offsets:
+            return self._sources[source_file]
+        return SourceCatalog.info(self, source_file)
+
+    def read(self, source_file, start=0, stop=None, dtype=None):
+        '''
+        Read the audio samples of a source file.
+
+        For float32 packs the returned array is a read-only view of the
+        memory-mapped data file (unless another ``dtype`` is requested), for
+        int16 packs the samples are converted to float32. Source files that
+        are not part of the pack are read from disk.
+
+        Parameters
+        ----------
+        source_file : str
+            Path to the source audio file, as stored in the pack.
+        start : int
+            Index of the first frame to read.
+        stop : int or None
+            Index of the frame at which to stop reading (exclusive). If None
+            (default), reads until the end of the file.
+        dtype : str or None
+            Data type of the returned samples, 'float64' or 'float32'. If
+            None (default), packed samples are returned as float32.
+
+        Returns
+        -------
+        audio : np.ndarray
+            Array of shape (n_frames, n_channels) containing the samples.
+
+        '''
+        offset = self._offsets.get(source_file)
+        if offset is None:
+            return SourceCatalog.read(self, source_file, start, stop,
+                                      dtype=dtype)
+
+        info = self._sources[source_file]
+        audio = np.asarray(
+            self._data[offset:offset + info.frames * info.channels])
+        audio = audio.reshape(info.frames, info.channels)[start:stop]
+        if self.dtype == 'int16':
+            audio = audio.astype(np.float32) / 32768
+        if dtype is not None:
+            audio = audio.astype(dtype, copy=False)
+        return audio
@@ -0,0 +1,659 @@
+'''
+Dataset files
+=============
+'''
+
+import json
+import os
+import threading
+import numpy as np
+from .audio import EventAudio
+from .jams_io import _jam_from_json
+from .jams_io import _loads
+from .jsonl import jam_to_record
+from .scaper_exceptions import ScaperError
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+# Version of the layout of dataset files
+_DATASET_VERSION = 1
+
+# Data types of the stored audio, int16 is scaled PCM
+_DATASET_DTYPES = ('float32', 'float64', 'int16')
+
+# Number of rows per chunk of the index tables and annotations
+_TABLE_CHUNK_ROWS = 4096
+
+
+class _H5Column(object):
+    '''
+    Appendable, chunked and compressed array of an HDF5 file.
+    '''
+    def __init__(self, h5file, name, tail_shape, dtype, chunk_rows, compress):
+        if name not in h5file:
+            h5file.create_dataset(
+                name, shape=(0,) + tail_shape, maxshape=(None,) + tail_shape,
+                dtype=dtype, chunks=(chunk_rows,) + tail_shape,
+                compression='gzip' if compress else None,
+                shuffle=bool(compress))
+        self._dataset = h5file[name]
+
+    def __len__(self):
+        return self._dataset.shape[0]
+
+    def append(self, rows):
+        n = len(self)
+        self._dataset.resize(n + len(rows), axis=0)
+        self._dataset[n:] = rows
+
+    def read(self, start, stop):
+        return self._dataset[start:stop]
+
+    def flush(self):
+        pass
+
+
+class _NpyColumn(object):
+    '''
+    Appendable array stored as a folder of chunk files, one .npy file (or
+    compressed .npz file) per ``chunk_rows`` rows. The last chunk is held in
+    memory until it is full or flushed.
+    '''
+    def __init__(self, folder, tail_shape, dtype, chunk_rows, compress,
+                 length=0):
+        self.folder = folder
+        self.chunk_rows = chunk_rows
+        self.compress = compress
+        self.length = length
+        os.makedirs(folder, exist_ok=True)
+        self._buffer = np.zeros((0,) + tail_shape, dtype=dtype)
+        if length % chunk_rows:
+            # the chunk file may hold rows appended after the last flush
+            self._buffer = self._load(
+                length // chunk_rows)[:length % chunk_rows]
+        self._cache = (None, None)
+
+    def __len__(self):
+        return self.length
+
+    def _chunk_path(self, k):
+        return os.path.join(self.folder, '{:08d}{:s}'.format(
+            k, '.npz' if self.compress else '.npy'))
+
+    def _load(self, k):
+        if self.compress:
+            with np.load(self._chunk_path(k)) as chunk:
+                return chunk['data']
+        return np.load(self._chunk_path(k))
+
+    def _save(self, k, rows):
+        path = self._chunk_path(k)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            if self.compress:
+                np.savez_compressed(f, data=rows)
+            else:
+                np.save(f, rows)
+        os.replace(temp_path, path)
+
+    def append(self, rows):
+        first = (self.length - len(self._buffer)) // self.chunk_rows
+        self._buffer = np.concatenate([self._buffer, rows])
+        self.length += len(rows)
+        n_full = len(self._buffer) // self.chunk_rows
+        for k in range(n_full):
+            self._save(first + k, self._buffer[
+                k * self.chunk_rows:(k + 1) * self.chunk_rows])
+        self._buffer = self._buffer[n_full * self.chunk_rows:].copy()
+        self._cache = (None, None)
+
+    def read(self, start, stop):
+        pieces = [self._buffer[:0]]
+        first_buffered = self.length - len(self._buffer)
+        for k in range(start // self.chunk_rows,
+                       -(-stop // self.chunk_rows)):
+            chunk_start = k * self.chunk_rows
+            if chunk_start >= first_buffered:
+                chunk = self._buffer
+            elif self._cache[0] == k:
+                chunk = self._cache[1]
+            else:
+                chunk = self._load(k)
+                self._cache = (k, chunk)
+            pieces.append(chunk[max(start - chunk_start, 0):
+                                stop - chunk_start])
+        return np.concatenate(pieces)
+
+    def flush(self):
+        if len(self._buffer):
+            self._save(self.length // self.chunk_rows, self._buffer)
+
+
+class _H5Store(object):
+    '''
+    Columns, annotations and attributes of a dataset stored in an HDF5 file.
+    '''
+    def __init__(self, path, mode):
+        if h5py is None:
+            raise ScaperError(
+                'h5py is required to use HDF5 dataset files, use a folder '
+                'instead (backend=\'npy\').')
+        self._file = h5py.File(path, mode)
+        self.attrs = {key: (value.item() if isinstance(value, np.generic)
+                            else value)
+                      for key, value in self._file.attrs.items()}
+
+    def column(self, name, tail_shape, dtype, chunk_rows, compress):
+        return _H5Column(self._file, name, tail_shape, dtype, chunk_rows,
+                         compress)
+
+    def init_annotations(self):
+        if 'annotations' not in self._file:
+            self._file.create_dataset(
+                'annotations', shape=(0,), maxshape=(None,),
+                dtype=h5py.string_dtype(), chunks=(_TABLE_CHUNK_ROWS,))
+        self._annotations = self._file['annotations']
+
+    def append_annotation(self, text):
+        n = self._annotations.shape[0]
+        self._annotations.resize(n + 1, axis=0)
+        self._annotations[n] = text
+
+    def read_annotation(self, index):
+        text = self._annotations[index]
+        return text.decode() if isinstance(text, bytes) else text
+
+    def flush(self, columns):
+        for key, value in self.attrs.items():
+            self._file.attrs[key] = value
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _NpyStore(object):
+    '''
+    Columns, annotations and attributes of a dataset stored in a folder: a
+    folder of chunk files per column, a JSON Lines file of annotations and a
+    JSON file of attributes.
+    '''
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        attrs_path = os.path.join(path, 'attrs.json')
+        self.attrs = {}
+        if os.path.isfile(attrs_path):
+            with open(attrs_path) as f:
+                self.attrs = json.load(f)
+        elif mode == 'r':
+            raise ScaperError('{} is not a dataset folder.'.format(path))
+        else:
+            os.makedirs(path, exist_ok=True)
+        self._lengths = self.attrs.get('lengths', {})
+        self._annotations = None
+
+    def column(self, name, tail_shape, dtype, chunk_rows, compress):
+        return _NpyColumn(os.path.join(self.path, name), tail_shape, dtype,
+                          chunk_rows, compress,
+                          length=self._lengths.get(name, 0))
+
+    def init_annotations(self):
+        self._annotations_path = os.path.join(self.path, 'annotations.jsonl')
+        self._annotations = open(
+            self._annotations_path, 'r' if self.mode == 'r' else 'a+')
+        # Offset of every line, to read annotations by index
+        self._offsets = []
+        self._annotations.seek(0)
+        offset = 0
+        for line in iter(self._annotations.readline, ''):
+            self._offsets.append(offset)
+            offset += len(line.encode())
+        n_annotations = self._lengths.get('annotations', 0)
+        if len(self._offsets) > n_annotations:
+            # drop the annotations appended after the last flush
+            if self.mode != 'r':
+                self._annotations.truncate(self._offsets[n_annotations])
+            del self._offsets[n_annotations:]
+
+    def append_annotation(self, text):
+        self._annotations.seek(0, os.SEEK_END)
+        self._offsets.append(self._annotations.tell())
+        self._annotations.write(text + '\n')
+
+    def read_annotation(self, index):
+        self._annotations.seek(self._offsets[index])
+        return self._annotations.readline()
+
+    def flush(self, columns):
+        for name, column in columns.items():
+            column.flush()
+            self._lengths[name] = len(column)
+        self._annotations.flush()
+        self._lengths['annotations'] = len(self._offsets)
+        self.attrs['lengths'] = self._lengths
+        attrs_path = os.path.join(self.path, 'attrs.json')
+        with open(attrs_path + '.tmp', 'w') as f:
+            json.dump(self.attrs, f)
+        os.replace(attrs_path + '.tmp', attrs_path)
+
+    def close(self):
+        if self._annotations is not None:
+            self._annotations.close()
+
+
+def _open_store(path, mode, backend=None):
+    '''
+    Open the store of a dataset, a folder for the 'npy' backend or an HDF5
+    file for the 'hdf5' backend. If ``backend`` is None, existing folders
+    are opened with the 'npy' backend and other paths with the 'hdf5'
+    backend if h5py is installed.
+    '''
+    if backend is None:
+        if os.path.isdir(path) or (h5py is None and mode != 'r'):
+            backend = 'npy'
+        else:
+            backend = 'hdf5'
+    if backend == 'hdf5':
+        return _H5Store(path, mode)
+    if backend == 'npy':
+        return _NpyStore(path, mode)
+    raise ScaperError(
+        'Invalid backend: {}. Must be \'hdf5\', \'npy\' or None.'.format(
+            backend))
+
+
+def _open_columns(store):
+    '''
+    Columns of a dataset: the soundscape audio and the samples spanned by
+    the isolated events, concatenated, and the index tables locating every
+    soundscape and event in them.
+    '''
+    n_channels = store.attrs['n_channels']
+    dtype = store.attrs['dtype']
+    chunk_samples = store.attrs['chunk_samples']
+    compress = store.attrs['compress']
+    store.init_annotations()
+    return {
+        'audio': store.column('audio', (n_channels,), dtype, chunk_samples,
+                              compress),
+        'stems': store.column('stems', (n_channels,), dtype, chunk_samples,
+                              compress),
+        # audio start, number of samples, first event, number of events
+        'soundscapes': store.column('soundscapes', (4,), 'int64',
+                                    _TABLE_CHUNK_ROWS, compress),
+        # stems start, number of samples, onset in the soundscape
+        'events': store.column('events', (3,), 'int64', _TABLE_CHUNK_ROWS,
+                               compress),
+    }
+
+
+class DatasetWriter(object):
+    '''
+    Append-only writer of dataset files, which store the audio, isolated
+    events and JAMS annotations of many soundscapes in a single chunked and
+    compressed container, instead of one audio file per soundscape and
+    event. Datasets are read back by index with ``Dataset``.
+
+    The audio of all soundscapes is concatenated into one array stored in
+    chunks of ``chunk_samples`` samples, and so are the samples spanned by
+    the isolated events (stems), so that reading soundscapes in order reads
+    the container sequentially. Index tables locate every soundscape and
+    event, and annotations are stored as JSON records (see
+    ``scaper.jsonl.jam_to_record``), without validation.
+
+    Datasets are HDF5 files if h5py is installed, otherwise (or with
+    ``backend='npy'``) folders of compressed NumPy chunk files. Existing
+    datasets are opened in append mode, and must have the same sample rate,
+    number of channels and data type.
+
+    Pass the writer to ``Scaper.generate`` or ``Scaper.generate_batch`` as
+    ``dataset_writer`` to append every generated soundscape. Writing is
+    thread-safe. The writer can be used as a context manager, which closes
+    the dataset on exit. Soundscapes written since the last call to
+    ``flush`` or ``close`` may be lost if the process is interrupted.
+
+    Parameters
+    ----------
+    path : str
+        Path to the dataset file (HDF5 backend) or folder ('npy' backend).
+    sr : int
+        Sample rate of the soundscapes.
+    n_channels : int
+        Number of channels of the soundscapes (default 1).
+    dtype : str
+        Data type of the stored audio: 'float32' (default), 'float64' or
+        'int16' (16 bit PCM, clipped to [-1, 1]).
+    save_stems : bool
+        Whether to store the audio of the isolated events (default True).
+    chunk_samples : int
+        Number of samples per chunk of the audio arrays (default 65536).
+    compress : bool
+        Whether to compress the chunks, with gzip (HDF5) or zlib (npy).
+        Default True.
+    backend : str or None
+        'hdf5' or 'npy'. If None (default), existing folders use the 'npy'
+        backend, and other paths the 'hdf5' backend if h5py is installed,
+        'npy' otherwise.
+
+    Raises
+    ------
+    ScaperError
+        If ``dtype`` or ``backend`` are not supported, if h5py is required
+        but not installed, or if the existing dataset has different
+        settings.
+
+    '''
+    def __init__(self, path, sr, n_channels=1, dtype='float32',
+                 save_stems=True, chunk_samples=65536, compress=True,
+                 backend=None):
+        if dtype not in _DATASET_DTYPES:
+            raise ScaperError(
+                'Invalid dtype: {}. Must be one of {}.'.format(
+                    dtype, _DATASET_DTYPES))
+        self.path = path
+        self._store = _open_store(path, 'a', backend=backend)
+        attrs = {'version': _DATASET_VERSION, 'sr': sr,
+                 'n_channels': n_channels, 'dtype': dtype,
+                 'save_stems': bool(save_stems),
+                 'chunk_samples': chunk_samples, 'compress': bool(compress)}
+        if 'version' in self._store.attrs:
+            for key in ['sr', 'n_channels', 'dtype', 'save_stems']:
+                if self._store.attrs[key] != attrs[key]:
+                    self._store.close()
+                    raise ScaperError(
+                        'The dataset {} has {:s}={!r}, cannot append '
+                        'soundscapes with {:s}={!r}.'.format(
+                            path, key, self._store.attrs[key], key,
+                            attrs[key]))
+        else:
+            self._store.attrs.update(attrs)
+        self.sr = sr
+        self.n_channels = n_channels
+        self.dtype = dtype
+        self.save_stems = self._store.attrs['save_stems']
+        self._columns = _open_columns(self._store)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._columns['soundscapes'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        raise ScaperError(
+            'A DatasetWriter can only be used by the process that created '
+            'it.')
+
+    def _encode(self, audio):
+        audio = np.asarray(audio).reshape(-1, self.n_channels)
+        if self.dtype == 'int16':
+            return np.rint(np.clip(audio, -1.0, 1.0) * 32767).astype(
+                np.int16)
+        return audio.astype(self.dtype, copy=False)
+
+    def write(self, soundscape_audio, jam, event_audio_list=None, key=None):
+        '''
+        Append a soundscape.
+
+        Parameters
+        ----------
+        soundscape_audio : np.ndarray
+            Audio of the soundscape, of shape (n_samples, n_channels).
+        jam : jams.JAMS
+            JAMS object of the soundscape.
+        event_audio_list : list or None
+            Audio of the isolated events, as full-length arrays or
+            ``EventAudio`` objects (e.g. with ``sc.event_audio_format =
+            'sparse'``). Only the samples each event spans are stored.
+            Ignored if the dataset doesn't store stems.
+        key : str, int or None
+            Identifier of the soundscape, stored with its annotation. If
+            None (default), the index of the soundscape in the dataset.
+
+        Returns
+        -------
+        key : str or int
+            Identifier of the soundscape.
+
+        Raises
+        ------
+        ScaperError
+            If the dataset stores stems and ``event_audio_list`` is None.
+
+        '''
+        if self.save_stems and event_audio_list is None:
+            raise ScaperError(
+                'The dataset stores isolated events, event_audio_list must '
+                'be given, e.g. by setting the event_audio_format of the '
+                'Scaper object to \'sparse\'.')
+        audio = self._encode(soundscape_audio)
+
+        # Samples spanned by every event and their onsets
+        spans = []
+        for event_audio in (event_audio_list if self.save_stems else []):
+            if isinstance(event_audio, EventAudio):
+                onset = event_audio.onset
+                span = np.multiply(event_audio.audio, event_audio.scale)
+            else:
+                event_audio = np.asarray(event_audio).reshape(
+                    -1, self.n_channels)
+                nonzero = np.flatnonzero(np.any(event_audio != 0, axis=1))
+                if len(nonzero):
+                    onset = nonzero[0]
+                    span = event_audio[onset:nonzero[-1] + 1]
+                else:
+                    onset, span = 0, event_audio[:0]
+            spans.append((onset, self._encode(span)))
+
+        with self._lock:
+            columns = self._columns
+            index = len(columns['soundscapes'])
+            if key is None:
+                key = index
+            stems_start = len(columns['stems'])
+            events = []
+            for onset, span in spans:
+                events.append([stems_start, len(span), onset])
+                stems_start += len(span)
+            if spans:
+                columns['stems'].append(
+                    np.concatenate([span for _, span in spans]))
+                columns['events'].append(np.array(events, dtype=np.int64))
+            columns['soundscapes'].append(np.array(
+                [[len(columns['audio']), len(audio),
+                  len(columns['events']) - len(events), len(events)]],
+                dtype=np.int64))
+            columns['audio'].append(audio)
+            self._store.append_annotation(
+                json.dumps(jam_to_record(jam, key=key)))
+        return key
+
+    def flush(self):
+        '''
+        Write the soundscapes appended so far to the dataset.
+        '''
+        with self._lock:
+            self._store.flush(self._columns)
+
+    def close(self):
+        '''
+        Flush the soundscapes and close the dataset.
+        '''
+        with self._lock:
+            if self._store is None:
+                return
+            self._store.flush(self._columns)
+            self._store.close()
+            self._store = None
+
+
+class Dataset(object):
+    '''
+    Reader of dataset files written by ``DatasetWriter``, with random
+    access to the soundscapes by index.
+
+    ``dataset[i]`` returns the (soundscape_audio, soundscape_jam,
+    event_audio_list) of soundscape ``i``, like the outputs of
+    ``Scaper.generate``, and iterating over the dataset reads the
+    soundscapes in order, which reads the container sequentially. Audio is
+    returned as float32 (float64 for float64 datasets), and isolated events
+    as ``EventAudio`` objects. The dataset can be used as a context manager,
+    which closes it on exit.
+
+    Parameters
+    ----------
+    path : str
+        Path to the dataset file or folder.
+    backend : str or None
+        'hdf5' or 'npy'. If None (default), folders are read with the 'npy'
+        backend and files with the 'hdf5' backend.
+
+    Raises
+    ------
+    ScaperError
+        If the path is not a dataset, or if h5py is required but not
+        installed.
+
+    '''
+    def __init__(self, path, backend=None):
+        self.path = path
+        self._store = _open_store(path, 'r', backend=backend)
+        if self._store.attrs.get('version') != _DATASET_VERSION:
+            self._store.close()
+            raise ScaperError('{} is not a dataset.'.format(path))
+        self.sr = self._store.attrs['sr']
+        self.n_channels = self._store.attrs['n_channels']
+        self.dtype = self._store.attrs['dtype']
+        self._columns = _open_columns(self._store)
+
+    def __len__(self):
+        return len(self._columns['soundscapes'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getitem__(self, index):
+        return (self.read_audio(index), self.read_annotation(index),
+                self.read_events(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _row(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError(
+                'Soundscape {} out of range for a dataset of {:d} '
+                'soundscapes.'.format(index, len(self)))
+        index %= len(self)
+        return index, self._columns['soundscapes'].read(index, index + 1)[0]
+
+    def _decode(self, audio):
+        if self.dtype == 'int16':
+            return audio.astype(np.float32) / 32767
+        return audio
+
+    def read_audio(self, index):
+        '''
+        Audio of a soundscape.
+
+        Parameters
+        ----------
+        index : int
+            Index of the soundscape.
+
+        Returns
+        -------
+        soundscape_audio : np.ndarray
+            Array of shape (n_samples, n_channels).
+
+        '''
+        _, (start, n_samples, _, _) = self._row(index)
+        return self._decode(
+            self._columns['audio'].read(start, start + n_samples))
+
+    def read_events(self, index):
+        '''
+        Audio of the isolated events of a soundscape.
+
+        Parameters
+        ----------
+        index : int
+            Index of the soundscape.
+
+        Returns
+        -------
+        event_audio_list : list or None
+            ``EventAudio`` objects of the events, in the order of the
+            observations of the annotation, or None if the dataset doesn't
+            store stems.
+
+        '''
+        _, (_, n_samples, first_event, n_events) = self._row(index)
+        if not self._store.attrs['save_stems']:
+            return None
+        if not n_events:
+            return []
+        events = self._columns['events'].read(first_event,
+                                              first_event + n_events)
+        stems = self._decode(self._columns['stems'].read(
+            events[0, 0], events[-1, 0] + events[-1, 1]))
+        return [EventAudio(stems[start - events[0, 0]:
+                                 start - events[0, 0] + length],
+                           int(onset), int(n_samples))
+                for start, length, onset in events]
+
+    def read_record(self, index):
+        '''
+        Annotation record of a soundscape, see
+        ``scaper.jsonl.jam_to_record``.
+        '''
+        index, _ = self._row(index)
+        return _loads(self._store.read_annotation(index))
+
+    def read_annotation(self, index):
+        '''
+        JAMS annotation of a soundscape.
+
+        Parameters
+        ----------
+        index : int
+            Index of the soundscape.
+
+        Returns
+        -------
+        jam : jams.JAMS
+
+        '''
+        return _jam_from_json(self.read_record(index))
+
+    def keys(self):
+        '''
+        Identifiers of the soundscapes, in order.
+
+        Returns
+        -------
+        keys : list
+
+        '''
+        return [self.read_record(index).get('key')
+                for index in range(len(self))]
+
+    def close(self):
+        '''
+        Close the dataset.
+        '''
+        if self._store is not None:
+            self._store.close()
+            self._store = None
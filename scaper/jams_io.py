@@ -0,0 +1,187 @@
+'''
+Fast JAMS input/output
+======================
+'''
+
+import json
+import jams
+from jams.core import serialize_obj
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _loads(text):
+    '''
+    Parse a JSON document, with orjson if it is installed.
+    '''
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # e.g. NaN values, which orjson doesn't accept
+            pass
+    return json.loads(text)
+
+
+def _annotation_to_json(ann):
+    '''
+    JSON representation of a scaper annotation, identical to
+    ``ann.__json__``.
+    '''
+    return {
+        'annotation_metadata': ann.annotation_metadata.__json__,
+        'namespace': ann.namespace,
+        'data': [{'time': serialize_obj(obs.time),
+                  'duration': serialize_obj(obs.duration),
+                  'value': serialize_obj(obs.value),
+                  'confidence': serialize_obj(obs.confidence)}
+                 for obs in ann.data],
+        'sandbox': ann.sandbox.__json__,
+        'time': serialize_obj(ann.time),
+        'duration': serialize_obj(ann.duration),
+    }
+
+
+def _jam_to_json(jam):
+    '''
+    JSON representation of a JAMS object, identical to ``jam.__json__``.
+    Annotations of the scaper namespace are serialized directly, other
+    annotations by jams.
+    '''
+    return {
+        'annotations': [
+            _annotation_to_json(ann) if ann.namespace == 'scaper'
+            else ann.__json__
+            for ann in jam.annotations],
+        'file_metadata': jam.file_metadata.__json__,
+        'sandbox': jam.sandbox.__json__,
+    }
+
+
+def _jam_from_json(jam_json):
+    '''
+    JAMS object from its JSON representation, equal to
+    ``jams.JAMS(**jam_json)``. The observations of annotations of the
+    scaper namespace are added in bulk.
+    '''
+    jam = jams.JAMS(file_metadata=jam_json.get('file_metadata'),
+                    sandbox=jam_json.get('sandbox'))
+    for ann_json in jam_json.get('annotations', []):
+        data = ann_json.get('data')
+        if ann_json.get('namespace') != 'scaper' or \
+                not isinstance(data, list):
+            jam.annotations.append(jams.Annotation(**ann_json))
+            continue
+        ann = jams.Annotation(**{k: v for k, v in ann_json.items()
+                                 if k != 'data'})
+        ann.data.update(
+            jams.Observation(time=float(obs['time']),
+                             duration=float(obs['duration']),
+                             value=obs.get('value'),
+                             confidence=obs.get('confidence'))
+            for obs in data)
+        jam.annotations.append(ann)
+    return jam
+
+
+def load_jams(path_or_file, validate=False, strict=True):
+    '''
+    Load a JAMS file, without validating it by default.
+
+    Equivalent to ``jams.load``, but faster for the annotations generated
+    by scaper: observations of the scaper namespace are added in bulk, the
+    JSON document is parsed with ``orjson`` if it is installed, and the
+    schema validation is opt-in. Compressed ``.jamz`` files are loaded with
+    ``jams.load``.
+
+    Parameters
+    ----------
+    path_or_file : str or file-like
+        Path to the JAMS file, or an open file.
+    validate : bool
+        Whether to validate the JAMS object against the JAMS schema
+        (default False).
+    strict : bool
+        If ``validate`` is True, whether validation errors raise an
+        exception (default True) or a warning.
+
+    Returns
+    -------
+    jam : jams.JAMS
+        The loaded JAMS object.
+
+    Raises
+    ------
+    jams.SchemaError
+        If ``validate`` and ``strict`` are True and the JAMS object fails
+        validation.
+
+    See Also
+    --------
+    save_jams
+
+    '''
+    if isinstance(path_or_file, str):
+        if path_or_file.endswith('.jamz'):
+            return jams.load(path_or_file, validate=validate, strict=strict)
+        with open(path_or_file, 'rb') as f:
+            text = f.read()
+    else:
+        text = path_or_file.read()
+    jam = _jam_from_json(_loads(text))
+    if validate:
+        jam.validate(strict=strict)
+    return jam
+
+
+def save_jams(jam, path_or_file, validate=False, strict=True):
+    '''
+    Save a JAMS object, without validating it by default.
+
+    Equivalent to ``jam.save``, and writes the same file, but faster for the
+    annotations generated by scaper, which are serialized directly, and the
+    schema validation is opt-in. Compressed ``.jamz`` files are saved with
+    ``jam.save``.
+
+    Parameters
+    ----------
+    jam : jams.JAMS
+        JAMS object to save.
+    path_or_file : str or file-like
+        Path to the JAMS file, or a file open for writing text.
+    validate : bool
+        Whether to validate the JAMS object against the JAMS schema before
+        saving it (default False).
+    strict : bool
+        If ``validate`` is True, whether validation errors raise an
+        exception (default True) or a warning.
+
+    Raises
+    ------
+    jams.SchemaError
+        If ``validate`` and ``strict`` are True and the JAMS object fails
+        validation.
+
+    See Also
+    --------
+    load_jams
+
+    '''
+    if isinstance(path_or_file, str) and path_or_file.endswith('.jamz'):
+        if validate:
+            jam.save(path_or_file, strict=strict)
+        else:
+            # jams always validates, don't fail on invalid objects
+            jam.save(path_or_file, strict=False)
+        return
+    if validate:
+        jam.validate(strict=strict)
+    # The standard library encoder gives the same bytes as jams.save
+    text = json.dumps(_jam_to_json(jam), indent=2)
+    if isinstance(path_or_file, str):
+        with open(path_or_file, 'w') as f:
+            f.write(text)
+    else:
+        path_or_file.write(text)
@@ -0,0 +1,203 @@
+'''
+JSON Lines annotations
+======================
+'''
+
+import json
+import os
+import threading
+from .jams_io import _jam_from_json
+from .jams_io import _jam_to_json
+from .jams_io import _loads
+from .scaper_exceptions import ScaperError
+
+
+def jam_to_record(jam, key=None):
+    '''
+    Convert a JAMS object to a record of a JSON Lines annotation file.
+
+    The record is the JSON representation of the JAMS object, as saved by
+    ``jams.JAMS.save`` (file metadata, annotations with one observation per
+    event and the scaper sandbox fields, global sandbox), plus its ``key``.
+    It is not validated against the JAMS schema.
+
+    Parameters
+    ----------
+    jam : jams.JAMS
+        JAMS object, e.g. generated by ``Scaper.generate``.
+    key : str, int or None
+        Identifier of the record.
+
+    Returns
+    -------
+    record : dict
+        JSON-serializable dictionary.
+
+    See Also
+    --------
+    record_to_jam
+
+    '''
+    record = {'key': key}
+    record.update(_jam_to_json(jam))
+    return record
+
+
+def record_to_jam(record):
+    '''
+    Convert a record of a JSON Lines annotation file back to a JAMS object,
+    equivalent to the one loaded by ``jams.load`` from a saved JAMS file.
+
+    Parameters
+    ----------
+    record : dict
+        Record created by ``jam_to_record``.
+
+    Returns
+    -------
+    jam : jams.JAMS
+
+    See Also
+    --------
+    jam_to_record
+
+    '''
+    return _jam_from_json(record)
+
+
+class JsonlWriter(object):
+    '''
+    Append-only writer of JSON Lines annotation files, which store the JAMS
+    annotations of many soundscapes in a single file, one soundscape per
+    line, instead of one JAMS file per soundscape. Annotations are not
+    validated against the JAMS schema.
+
+    Pass the writer to ``Scaper.generate`` as ``annotation_writer`` to
+    append the annotation of every generated soundscape. Records are read
+    back with ``read_jsonl`` or ``load_jsonl``, and their JAMS objects can
+    be passed to ``generate_from_jams`` and ``trim``.
+
+    Writing is thread-safe. The file is opened in append mode, so lines
+    written by previous writers are kept. The writer can be used as a
+    context manager, which closes the file on exit.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON Lines file. Created if it doesn't exist.
+
+    '''
+    def __init__(self, path):
+        self.path = path
+        # Default keys continue the numbering of the existing records
+        self.n_records = 0
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                self.n_records = sum(1 for line in f if line.strip())
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, jam, key=None):
+        '''
+        Append the annotation of a soundscape.
+
+        Parameters
+        ----------
+        jam : jams.JAMS
+            JAMS object of the soundscape.
+        key : str, int or None
+            Identifier of the record. If None (default), the index of the
+            record in the file.
+
+        Returns
+        -------
+        key : str or int
+            Identifier of the record.
+
+        '''
+        with self._lock:
+            if key is None:
+                key = self.n_records
+            line = json.dumps(jam_to_record(jam, key=key))
+            self._file.write(line + '\n')
+            self.n_records += 1
+        return key
+
+    def flush(self):
+        '''
+        Flush the records written so far to the file.
+        '''
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        '''
+        Flush the records and close the file.
+        '''
+        with self._lock:
+            self._file.close()
+
+
+def _read_records(path):
+    '''
+    Iterate over the records of a JSON Lines annotation file.
+    '''
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield _loads(line)
+
+
+def read_jsonl(path):
+    '''
+    Iterate over the annotations of a JSON Lines annotation file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON Lines file.
+
+    Yields
+    ------
+    key : str or int
+        Identifier of the record.
+    jam : jams.JAMS
+        JAMS object of the soundscape.
+
+    '''
+    for record in _read_records(path):
+        yield record.get('key'), record_to_jam(record)
+
+
+def load_jsonl(path, key):
+    '''
+    Load the annotation of one soundscape from a JSON Lines annotation file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON Lines file.
+    key : str or int
+        Identifier of the record.
+
+    Returns
+    -------
+    jam : jams.JAMS
+        JAMS object of the soundscape.
+
+    Raises
+    ------
+    ScaperError
+        If the file has no record with this key.
+
+    '''
+    for record in _read_records(path):
+        if record.get('key') == key:
+            return record_to_jam(record)
+    raise ScaperError('No record with key {!r} in {:s}.'.format(key, path))
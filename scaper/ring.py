@@ -0,0 +1,308 @@
+'''
+Shared memory ring
+==================
+'''
+
+from multiprocessing import shared_memory
+import numbers
+import threading
+import numpy as np
+from .audio import EventAudio
+from .scaper_exceptions import ScaperError
+
+
+class SharedAudioRing(object):
+    '''
+    Ring of fixed-size slots in shared memory, in which worker processes
+    write rendered soundscapes so that only the index of the slot and the
+    annotations are sent back to the consumer, instead of pickled audio.
+
+    Every slot holds the mix of one soundscape and up to ``n_stems`` isolated
+    events. The process that creates the ring owns it: it acquires a free
+    slot for each soundscape it submits, reads the audio back as views of
+    the slot and releases the slot once it is done with them, so that it
+    can be reused for another soundscape. Rings are picklable: copies sent
+    to other processes attach to the same shared memory block and can only
+    write to and read from slots.
+
+    The shared memory block is freed when the owner closes the ring, or
+    when the ring is used as a context manager and the ``with`` block exits.
+
+    Shared memory requires Python 3.8 or later
+    (``multiprocessing.shared_memory``).
+
+    Parameters
+    ----------
+    n_slots : int
+        Number of slots, i.e. of soundscapes that can be held at the same
+        time by the workers and the consumer.
+    n_samples : int
+        Maximum number of samples of a soundscape, e.g.
+        ``int(sc.duration * sc.sr)``.
+    n_channels : int
+        Number of channels of the soundscapes.
+    n_stems : int
+        Maximum number of isolated events stored with every soundscape. If
+        0 (default), only the mix is stored.
+    dtype : str
+        Data type of the samples, 'float64' (default) or 'float32'.
+
+    Raises
+    ------
+    ScaperError
+        If any of the sizes is not a positive integer (non-negative for
+        ``n_stems``) or if ``dtype`` is not supported.
+
+    '''
+    def __init__(self, n_slots, n_samples, n_channels=1, n_stems=0,
+                 dtype='float64'):
+        for name, value, minimum in [('n_slots', n_slots, 1),
+                                     ('n_samples', n_samples, 1),
+                                     ('n_channels', n_channels, 1),
+                                     ('n_stems', n_stems, 0)]:
+            if not isinstance(value, numbers.Integral) or value < minimum:
+                raise ScaperError(
+                    '{:s} must be an integer of at least {:d}.'.format(
+                        name, minimum))
+        if dtype not in ('float32', 'float64'):
+            raise ScaperError(
+                'Invalid dtype: {}. Must be \'float32\' or '
+                '\'float64\'.'.format(dtype))
+
+        self.n_slots = int(n_slots)
+        self.n_samples = int(n_samples)
+        self.n_channels = int(n_channels)
+        self.n_stems = int(n_stems)
+        self.dtype = dtype
+
+        size = int(np.prod(self._shape)) * np.dtype(dtype).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.name = self._shm.name
+        self._owner = True
+        self._free = list(range(n_slots))
+        self._lock = threading.Lock()
+        self._array = self._map()
+
+    @property
+    def _shape(self):
+        return (self.n_slots, 1 + self.n_stems, self.n_samples,
+                self.n_channels)
+
+    def _map(self):
+        return np.ndarray(self._shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        # Only send the name of the block, copies attach to it
+        state = self.__dict__.copy()
+        for key in ['_shm', '_array', '_free', '_lock']:
+            del state[key]
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        try:
+            # the owner is responsible for freeing the block
+            self._shm = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # Python < 3.13, the block is registered again with the
+            # resource tracker of the owner, which is harmless
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        self._free = None
+        self._lock = None
+        self._array = self._map()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return ('SharedAudioRing(n_slots={:d}, n_samples={:d}, '
+                'n_channels={:d}, n_stems={:d}, dtype={!r})'.format(
+                    self.n_slots, self.n_samples, self.n_channels,
+                    self.n_stems, self.dtype))
+
+    def _check_owner(self):
+        if not self._owner:
+            raise ScaperError(
+                'Slots can only be acquired and released by the process '
+                'that created the ring.')
+        if self._array is None:
+            raise ScaperError('The ring is closed.')
+
+    @property
+    def n_free(self):
+        '''Number of slots that can be acquired.'''
+        self._check_owner()
+        with self._lock:
+            return len(self._free)
+
+    def acquire(self):
+        '''
+        Reserve a free slot.
+
+        Returns
+        -------
+        slot : int
+            Index of the slot.
+
+        Raises
+        ------
+        ScaperError
+            If all the slots are in use, or if the ring is not owned by the
+            current process.
+
+        '''
+        self._check_owner()
+        with self._lock:
+            if not self._free:
+                raise ScaperError(
+                    'All {:d} slots of the ring are in use, release the '
+                    'soundscapes that are no longer needed.'.format(
+                        self.n_slots))
+            return self._free.pop(0)
+
+    def release(self, slot):
+        '''
+        Return a slot to the ring, so that it can be reused. The views of
+        the slot returned by ``SharedAudioRing.read`` must not be used
+        afterwards.
+
+        Parameters
+        ----------
+        slot : int or np.ndarray
+            Index of the slot, or an array returned by
+            ``SharedAudioRing.read`` for it, e.g. the soundscape audio.
+
+        Raises
+        ------
+        ScaperError
+            If ``slot`` is not a slot of the ring in use, or if the ring is
+            not owned by the current process.
+
+        '''
+        self._check_owner()
+        if isinstance(slot, np.ndarray):
+            slot = self._slot_of(slot)
+        with self._lock:
+            if not isinstance(slot, numbers.Integral) or \
+                    not 0 <= slot < self.n_slots or slot in self._free:
+                raise ScaperError(
+                    'Slot {} of the ring is not in use.'.format(slot))
+            self._free.append(int(slot))
+
+    def _slot_of(self, array):
+        '''
+        Index of the slot that ``array`` is a view of.
+        '''
+        start = self._array.__array_interface__['data'][0]
+        address = array.__array_interface__['data'][0]
+        slot_nbytes = self._array[0].nbytes
+        if not start <= address < start + self._array.nbytes:
+            raise ScaperError('The array is not a view of a slot of the ring.')
+        return (address - start) // slot_nbytes
+
+    def write(self, slot, soundscape_audio, event_audio_list=None):
+        '''
+        Copy a soundscape into a slot.
+
+        Parameters
+        ----------
+        slot : int
+            Index of the slot, acquired by the owner of the ring.
+        soundscape_audio : np.ndarray
+            Audio of the soundscape, of shape (n_samples, n_channels).
+        event_audio_list : list or None
+            Full-length audio of the isolated events, as arrays or EventAudio
+            objects. Ignored if the ring stores no stems.
+
+        Returns
+        -------
+        n_samples : int
+            Number of samples of the soundscape.
+        n_events : int or None
+            Number of isolated events written, None if the ring stores no
+            stems or ``event_audio_list`` is None.
+
+        Raises
+        ------
+        ScaperError
+            If the soundscape or its events don't fit in a slot.
+
+        '''
+        n_samples = soundscape_audio.shape[0]
+        if n_samples > self.n_samples or \
+                soundscape_audio.shape[1:] != (self.n_channels,):
+            raise ScaperError(
+                'A soundscape of shape {} does not fit in a slot of shape '
+                '({:d}, {:d}).'.format(soundscape_audio.shape, self.n_samples,
+                                       self.n_channels))
+        buffers = self._array[slot]
+        buffers[0, :n_samples] = soundscape_audio
+
+        if not self.n_stems or event_audio_list is None:
+            return n_samples, None
+        if len(event_audio_list) > self.n_stems:
+            raise ScaperError(
+                'The soundscape has {:d} events but the slots of the ring '
+                'store at most {:d}.'.format(
+                    len(event_audio_list), self.n_stems))
+        for stem, event_audio in zip(buffers[1:], event_audio_list):
+            stem = stem[:n_samples]
+            if isinstance(event_audio, EventAudio):
+                # only the samples of the event are copied
+                stem[:event_audio.onset] = 0
+                stem[event_audio.offset:] = 0
+                np.multiply(event_audio.audio, event_audio.scale,
+                            out=stem[event_audio.onset:event_audio.offset],
+                            casting='unsafe')
+            else:
+                stem[:] = event_audio
+        return n_samples, len(event_audio_list)
+
+    def read(self, slot, n_samples, n_events=None):
+        '''
+        Audio stored in a slot, as views of the shared memory: they are only
+        valid until the slot is released or the ring is closed.
+
+        Parameters
+        ----------
+        slot : int
+            Index of the slot.
+        n_samples : int
+            Number of samples of the soundscape.
+        n_events : int or None
+            Number of isolated events stored, or None if they weren't stored.
+
+        Returns
+        -------
+        soundscape_audio : np.ndarray
+            Audio of the soundscape.
+        event_audio_list : list or None
+            Audio of the isolated events, None if ``n_events`` is None.
+
+        '''
+        buffers = self._array[slot, :, :n_samples]
+        if n_events is None:
+            return buffers[0], None
+        return buffers[0], list(buffers[1:1 + n_events])
+
+    def close(self):
+        '''
+        Detach from the shared memory block, and free it if the ring is
+        owned by the current process. Views returned by
+        ``SharedAudioRing.read`` keep their memory mapped until they are
+        deleted.
+        '''
+        if self._array is None:
+            return
+        self._array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # views are still alive, the mapping goes away with them
+            pass
+        if self._owner:
+            self._shm.unlink()
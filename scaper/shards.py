@@ -0,0 +1,311 @@
+'''
+Tar shards
+==========
+'''
+
+import csv
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import soundfile
+from .audio import _check_audio_format
+from .jams_io import load_jams
+from .jams_io import save_jams
+from .scaper_exceptions import ScaperError
+
+
+# File names of the shards and of their index files
+SHARD_NAME = '{:s}-{:06d}.tar'
+SHARD_INDEX_SUFFIX = '.index.jsonl'
+
+
+def _padded_size(size):
+    '''
+    Size of a tar member of ``size`` bytes, header and padding included,
+    for names short enough to fit in the header.
+    '''
+    return tarfile.BLOCKSIZE + -(-size // tarfile.BLOCKSIZE) * \
+        tarfile.BLOCKSIZE
+
+
+def _index_path(tar_path):
+    '''
+    Path of the index file of a shard.
+    '''
+    return os.path.splitext(tar_path)[0] + SHARD_INDEX_SUFFIX
+
+
+def _check_key(key):
+    '''
+    Check that a key gives member names that WebDataset readers group into
+    one sample, i.e. that its base name has no dot.
+    '''
+    if not key or '.' in key.rsplit('/', 1)[-1]:
+        raise ScaperError(
+            'Invalid shard key {!r}: keys must be non-empty and their base '
+            'name can\'t contain dots.'.format(key))
+
+
+class ShardWriter(object):
+    '''
+    Writer of tar shards in the WebDataset layout: the audio, JAMS file and
+    simplified txt annotation of every soundscape are written to a tar file
+    as ``<key>.wav``, ``<key>.jams`` and ``<key>.txt``, and a new shard is
+    started once a shard reaches ``max_size`` bytes or ``max_count``
+    soundscapes. This avoids saving millions of small files and repacking
+    them for streaming training.
+
+    Shards are named ``<prefix>-000000.tar``, ``<prefix>-000001.tar``, ...,
+    continuing the numbering of the shards already in ``out_dir``. A shard
+    is written to a hidden temporary file and only renamed to its final
+    name once it is complete, so readers listing ``*.tar`` files never see
+    partial shards. Every shard has an index file
+    (``<prefix>-000000.index.jsonl``), written before the shard is renamed,
+    with one line per soundscape giving its key and the offset and size in
+    the tar file of the data of each of its members, for random access
+    without scanning the shard (see ``read_shard``).
+
+    Pass the writer to ``Scaper.generate`` or ``Scaper.generate_batch`` as
+    ``shard_writer`` to write every generated soundscape. Writing is
+    thread-safe. The writer can be used as a context manager, which closes
+    it on exit. Processes writing shards to the same folder must use
+    different prefixes.
+
+    Parameters
+    ----------
+    out_dir : str
+        Folder in which the shards are saved. Created if it doesn't exist.
+    prefix : str
+        Prefix of the shard names (default 'shard').
+    max_size : int
+        Size in bytes above which a new shard is started (default 1 GiB).
+        Soundscapes are never split across shards, so a shard exceeds
+        ``max_size`` if it contains a single soundscape larger than this.
+    max_count : int or None
+        Maximum number of soundscapes per shard. If None (default), only
+        ``max_size`` limits the shards.
+    audio_format : str
+        Format of the audio members, e.g. 'WAV' (default) or 'FLAC'. The
+        extension of the members is the format in lower case.
+    audio_subtype : str or None
+        Sample type of the audio members, see ``Scaper.generate``.
+    txt_sep : str
+        Separator of the txt annotations (default tab).
+
+    Raises
+    ------
+    ScaperError
+        If ``max_size`` or ``max_count`` are not positive, or if the audio
+        format or subtype are not supported.
+
+    '''
+    def __init__(self, out_dir, prefix='shard', max_size=2**30,
+                 max_count=None, audio_format='WAV', audio_subtype=None,
+                 txt_sep='\t'):
+        if max_size <= 0 or (max_count is not None and max_count <= 0):
+            raise ScaperError('max_size and max_count must be positive.')
+        self.audio_format, self.audio_subtype = _check_audio_format(
+            None, audio_format, audio_subtype)
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.max_size = max_size
+        self.max_count = max_count
+        self.txt_sep = txt_sep
+        # Paths of the shards finalized by this writer
+        self.shard_paths = []
+
+        os.makedirs(out_dir, exist_ok=True)
+        pattern = re.compile(re.escape(prefix) + r'-(\d+)\.tar$')
+        numbers = [int(match.group(1)) for match in
+                   map(pattern.match, os.listdir(out_dir)) if match]
+        self._next_shard = max(numbers) + 1 if numbers else 0
+        self._file = None
+        self._tar = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        raise ScaperError(
+            'A ShardWriter can only be used by the process that created it.')
+
+    def _open_shard(self):
+        name = SHARD_NAME.format(self.prefix, self._next_shard)
+        self._next_shard += 1
+        self._path = os.path.join(self.out_dir, name)
+        self._temp_path = os.path.join(
+            self.out_dir, '.tmp{:d}.{:s}'.format(os.getpid(), name))
+        self._file = open(self._temp_path, 'wb')
+        self._tar = tarfile.open(fileobj=self._file, mode='w')
+        self._entries = []
+        self._callbacks = []
+
+    def _finalize_shard(self):
+        '''
+        Close the current shard, save its index and rename both to their
+        final names. Returns the callbacks of its soundscapes.
+        '''
+        self._tar.close()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._tar, self._file = None, None
+
+        index_path = _index_path(self._path)
+        temp_index_path = _index_path(self._temp_path)
+        with open(temp_index_path, 'w') as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_index_path, index_path)
+        os.replace(self._temp_path, self._path)
+        self.shard_paths.append(self._path)
+        return self._callbacks
+
+    def _encode(self, soundscape_audio, jam, annotation_list):
+        '''
+        Bytes of the (extension, data) members of a soundscape.
+        '''
+        ann = jam.annotations.search(namespace='scaper')[0]
+        audio_file = io.BytesIO()
+        soundfile.write(audio_file, soundscape_audio, ann.sandbox.scaper.sr,
+                        subtype=self.audio_subtype, format=self.audio_format)
+        jams_file = io.StringIO()
+        save_jams(jam, jams_file)
+        txt_file = io.StringIO()
+        csv.writer(txt_file, delimiter=self.txt_sep).writerows(
+            annotation_list)
+        return [(self.audio_format.lower(), audio_file.getvalue()),
+                ('jams', jams_file.getvalue().encode()),
+                ('txt', txt_file.getvalue().encode())]
+
+    def write(self, soundscape_audio, jam, annotation_list, key=None,
+              on_finalize=None):
+        '''
+        Append a soundscape to the current shard, first finalizing the shard
+        if it is full.
+
+        Parameters
+        ----------
+        soundscape_audio : np.ndarray
+            Audio of the soundscape.
+        jam : jams.JAMS
+            JAMS object of the soundscape, whose sample rate is used to
+            encode the audio.
+        annotation_list : list
+            Simplified annotation list of the soundscape, as returned by
+            ``Scaper.generate``.
+        key : str or None
+            Key of the soundscape, i.e. name of its members without
+            extension. If None (default),
+            ``'<prefix>-<shard number>-<position in the shard>'``.
+        on_finalize : callable or None
+            If given, called without arguments once the shard containing the
+            soundscape is finalized.
+
+        Returns
+        -------
+        key : str
+            Key of the soundscape.
+
+        Raises
+        ------
+        ScaperError
+            If the key is empty or its base name contains a dot.
+
+        '''
+        if key is not None:
+            key = str(key)
+            _check_key(key)
+        members = self._encode(soundscape_audio, jam, annotation_list)
+        size = sum(_padded_size(len(data)) for _, data in members)
+
+        callbacks = []
+        with self._lock:
+            if self._tar is not None and (
+                    len(self._entries) == self.max_count or
+                    self._tar.offset + size > self.max_size):
+                callbacks = self._finalize_shard()
+            if self._tar is None:
+                self._open_shard()
+            if key is None:
+                key = '{:s}-{:06d}-{:06d}'.format(
+                    self.prefix, self._next_shard - 1, len(self._entries))
+            entry = {'key': key, 'members': {}}
+            for extension, data in members:
+                info = tarfile.TarInfo('{:s}.{:s}'.format(key, extension))
+                info.size = len(data)
+                self._tar.addfile(info, io.BytesIO(data))
+                # the data is followed by padding up to the end of its block
+                offset = self._tar.offset - \
+                    _padded_size(len(data)) + tarfile.BLOCKSIZE
+                entry['members'][extension] = [offset, len(data)]
+            self._entries.append(entry)
+            if on_finalize is not None:
+                self._callbacks.append(on_finalize)
+
+        for callback in callbacks:
+            callback()
+        return key
+
+    def flush(self):
+        '''
+        Finalize the current shard, if it contains any soundscape. The next
+        soundscape starts a new shard.
+        '''
+        callbacks = []
+        with self._lock:
+            if self._tar is not None:
+                callbacks = self._finalize_shard()
+        for callback in callbacks:
+            callback()
+
+    def close(self):
+        '''
+        Finalize the current shard, see ``ShardWriter.flush``.
+        '''
+        self.flush()
+
+
+def read_shard(path):
+    '''
+    Iterate over the soundscapes of a shard written by ``ShardWriter``,
+    using its index file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the tar file of the shard.
+
+    Yields
+    ------
+    key : str
+        Key of the soundscape.
+    soundscape_audio : np.ndarray
+        Audio of the soundscape, of shape (n_samples, n_channels).
+    jam : jams.JAMS
+        JAMS object of the soundscape.
+
+    '''
+    with open(_index_path(path)) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    with open(path, 'rb') as f:
+        for entry in entries:
+            data = {}
+            for extension, (offset, size) in entry['members'].items():
+                f.seek(offset)
+                data[extension] = f.read(size)
+            jam = load_jams(io.StringIO(data.pop('jams').decode()))
+            data.pop('txt', None)
+            (audio_data,) = data.values()
+            soundscape_audio, _ = soundfile.read(io.BytesIO(audio_data),
+                                                 always_2d=True)
+            yield entry['key'], soundscape_audio, jam
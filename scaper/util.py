@@ -4,14 +4,17 @@ Utility functions
 =================
 '''
 
+import abc
 from contextlib import contextmanager
 import logging
 import os
+import threading
 import glob
 from .scaper_exceptions import ScaperError
 import warnings
 from .scaper_warnings import ScaperWarning
 import scipy
+import scipy.special
 import numpy as np
 import numbers
 from copy import deepcopy
@@ -64,6 +67,47 @@ def _set_temp_logging_level(level):
     logger.setLevel(current_level)
 
 
+class _ThreadLevelFilter(logging.Filter):
+    '''
+    Logging filter dropping the records of a single thread whose level is
+    below ``level``.
+    '''
+    def __init__(self, level, thread):
+        super(_ThreadLevelFilter, self).__init__()
+        if isinstance(level, str):
+            level = logging.getLevelName(level)
+        self.level = level
+        self.thread = thread
+
+    def filter(self, record):
+        return record.thread != self.thread or record.levelno >= self.level
+
+
+@contextmanager
+def _set_temp_thread_logging_level(level, name='sox'):
+    '''
+    Utility function for temporarily ignoring the messages of a logger below
+    ``level`` in the current thread only, without changing the level of the
+    logger, which would also affect other threads.
+
+    Parameters
+    ----------
+    level : str or int
+        The desired temporary logging level. For allowed values see:
+        https://docs.python.org/2/library/logging.html#logging-levels
+    name : str
+        Name of the logger, by default the logger of the pysox module.
+
+    '''
+    logger = logging.getLogger(name)
+    log_filter = _ThreadLevelFilter(level, threading.get_ident())
+    logger.addFilter(log_filter)
+    try:
+        yield
+    finally:
+        logger.removeFilter(log_filter)
+
+
 def _get_sorted_files(folder_path):
     '''
     Return a list of absolute paths to all valid files contained within the
@@ -152,27 +196,108 @@ def _populate_label_list(folder_path, label_list):
 
 
 def _check_random_state(seed):
-    """Turn seed into a np.random.RandomState instance
+    """Turn seed into a np.random.RandomState or np.random.Generator instance
 
     Parameters
     ----------
-    seed : None | int | instance of RandomState
+    seed : None | int | instance of RandomState, Generator, BitGenerator or SeedSequence
         If seed is None, return the RandomState singleton used by np.random.
         If seed is an int, return a new RandomState instance seeded with seed.
-        If seed is already a RandomState instance, return it.
+        If seed is already a RandomState or Generator instance, return it.
+        If seed is a BitGenerator (e.g. np.random.PCG64 or np.random.Philox),
+        return a new Generator using it.
+        If seed is a SeedSequence, return a new Generator using a PCG64 bit
+        generator seeded with it.
         Otherwise raise ValueError.
     """
     if seed is None or seed is np.random:
         return np.random.mtrand._rand
     elif isinstance(seed, (numbers.Integral, np.integer, int)):
         return np.random.RandomState(seed)
-    elif isinstance(seed, np.random.RandomState):
+    elif isinstance(seed, (np.random.RandomState, np.random.Generator)):
         return seed
+    elif isinstance(seed, np.random.BitGenerator):
+        return np.random.Generator(seed)
+    elif isinstance(seed, np.random.SeedSequence):
+        return np.random.Generator(np.random.PCG64(seed))
     else:
         raise ValueError('%r cannot be used to seed a numpy.random.RandomState'
                          ' instance' % seed)
 
 
+def _randint(random_state, high, size=None, dtype=int):
+    '''
+    Random integers in [0, high), drawn with ``randint`` from a RandomState
+    or ``integers`` from a Generator.
+    '''
+    if isinstance(random_state, np.random.Generator):
+        return random_state.integers(high, size=size, dtype=dtype)
+    return random_state.randint(high, size=size, dtype=dtype)
+
+
+def _random_sample(random_state, size=None):
+    '''
+    Random floats in [0, 1), drawn with ``random_sample`` from a RandomState
+    or ``random`` from a Generator.
+    '''
+    if isinstance(random_state, np.random.Generator):
+        return random_state.random(size)
+    return random_state.random_sample(size)
+
+
+def _random_state_from_seed(seed_sequence, random_state=None):
+    '''
+    Create a random state seeded from a seed sequence: a Generator with the
+    same type of bit generator as ``random_state`` if it is a Generator,
+    otherwise a RandomState using an MT19937 bit generator.
+
+    Parameters
+    ----------
+    seed_sequence : np.random.SeedSequence
+        Seed of the new random state.
+    random_state : np.random.RandomState, np.random.Generator or None
+        Random state of the same kind as the one to create.
+
+    Returns
+    -------
+    random_state : np.random.RandomState or np.random.Generator
+
+    '''
+    if isinstance(random_state, np.random.Generator):
+        return np.random.Generator(
+            type(random_state.bit_generator)(seed_sequence))
+    return np.random.RandomState(np.random.MT19937(seed_sequence))
+
+
+def _spawn_random_states(random_state, n):
+    '''
+    Create ``n`` independent child random states of ``random_state``.
+
+    Entropy is drawn from ``random_state`` to seed a
+    ``np.random.SeedSequence``, whose ``spawn`` method seeds the children.
+    The children only depend on the state of ``random_state`` when this
+    function is called, which is advanced by the same amount whatever ``n``.
+
+    Parameters
+    ----------
+    random_state : np.random.RandomState or np.random.Generator
+        Parent random state.
+    n : int
+        Number of child random states.
+
+    Returns
+    -------
+    random_states : list
+        List of ``n`` random states of the same kind as ``random_state``,
+        see ``_random_state_from_seed``.
+
+    '''
+    entropy = _randint(random_state, 2**32, size=4, dtype=np.uint64)
+    seed_sequence = np.random.SeedSequence([int(x) for x in entropy])
+    return [_random_state_from_seed(child, random_state)
+            for child in seed_sequence.spawn(n)]
+
+
 def _sample_const(item, random_state):
     '''
     Return a value sampled from a constant distribution (just the item).
@@ -181,8 +306,8 @@ def _sample_const(item, random_state):
     ----------
     item : any
         What to return
-    random_state : mtrand.RandomState
-        RandomState object used to sample from this distribution (ignored).
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution (ignored).
         This is here to match the other function specifications.
 
     Returns
@@ -205,8 +330,8 @@ def _sample_uniform(minimum, maximum, random_state):
         Minimum of uniform distribution
     maximum : float
         Maximum of uniform distribution
-    random_state : mtrand.RandomState
-        RandomState object used to sample from this distribution.
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution.
 
     Returns
     -------
@@ -229,8 +354,8 @@ def _sample_normal(mu, sigma, random_state):
         The mean of the truncated normal distribution
     sig : float
         The standard deviation of the truncated normal distribution
-    random_state : mtrand.RandomState
-        RandomState object used to sample from this distribution.
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution.
 
     Returns
     -------
@@ -252,8 +377,8 @@ def _sample_choose(list_of_options, random_state):
     ----------
     list_of_options : list
         List of items to choose from.
-    random_state : mtrand.RandomState
-        RandomState object used to sample from this distribution.
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution.
 
     Returns
     -------
@@ -267,7 +392,7 @@ def _sample_choose(list_of_options, random_state):
             'Removed duplicates from choose list. List length changed '
             'from {:d} to {:d}'.format(len(list_of_options), len(new_list_of_options)),
             ScaperWarning)
-    index = random_state.randint(len(new_list_of_options))
+    index = _randint(random_state, len(new_list_of_options))
     return new_list_of_options[index]
 
 
@@ -286,8 +411,8 @@ def _sample_choose_weighted(list_of_options, probabilities, random_state):
     probabilities : list of floats
         List of probabilities corresponding to the elements in ```list_of_options```, such 
         that the item in ```list_of_options[i]``` is chosen with probability ```probabilities[i]```.
-    random_state : mtrand.RandomState
-        RandomState object used to sample from this distribution.
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution.
 
     Returns
     -------
@@ -314,8 +439,8 @@ def _sample_trunc_norm(mu, sigma, trunc_min, trunc_max, random_state):
         The minimum value allowed for the distribution (lower boundary)
     trunc_max : float
         The maximum value allowed for the distribution (upper boundary)
-    random_state : mtrand.RandomState
-        RandomState object used to sample from this distribution.
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution.
 
     Returns
     -------
@@ -335,6 +460,323 @@ def _sample_trunc_norm(mu, sigma, trunc_min, trunc_max, random_state):
     # then back to a scalar.
     return np.array(sample).item() 
 
+
+def _trunc_norm_constants(a, b):
+    '''
+    Constants of the inverse CDF sampling of a standard normal distribution
+    truncated to [a, b]. Intervals on the right of the mean (a > 0) are
+    mirrored to the left, where the CDF is accurate in the tail.
+
+    Parameters
+    ----------
+    a, b : float or np.ndarray
+        Lower and upper bounds of the standard normal distribution.
+
+    Returns
+    -------
+    flip : bool or np.ndarray
+        Whether the interval is mirrored.
+    cdf_min : float or np.ndarray
+        CDF at the lower bound of the (mirrored) interval.
+    cdf_range : float or np.ndarray
+        Difference between the CDF at the upper and lower bounds of the
+        (mirrored) interval.
+
+    '''
+    flip = np.greater(a, 0)
+    lower = np.where(flip, np.negative(b), a)
+    upper = np.where(flip, np.negative(a), b)
+    cdf_min = scipy.special.ndtr(lower)
+    return flip, cdf_min, scipy.special.ndtr(upper) - cdf_min
+
+
+def _sample_trunc_norm_fast(mu, sigma, trunc_min, trunc_max, random_state,
+                            size=None):
+    '''
+    Return random values sampled from a truncated normal distribution with
+    mean ```mu``` and standard deviation ```sigma``` whose values are limited
+    between ```trunc_min``` and ```trunc_max```.
+
+    Faster alternative to ```_sample_trunc_norm```, using inverse transform
+    sampling: a uniform value ```u``` is mapped to
+    ```ndtri(ndtr(a) + u * (ndtr(b) - ndtr(a)))```, where ```a``` and ```b```
+    are the bounds of the standard normal distribution, so every value
+    consumes a single uniform draw from ```random_state```. The values follow
+    the same distribution as ```_sample_trunc_norm```, but are not the same
+    values given the same random state.
+
+    Parameters
+    ----------
+    mu : float or np.ndarray
+        The mean of the truncated normal distribution
+    sigma : float or np.ndarray
+        The standard deviation of the truncated normal distribution
+    trunc_min : float or np.ndarray
+        The minimum value allowed for the distribution (lower boundary)
+    trunc_max : float or np.ndarray
+        The maximum value allowed for the distribution (upper boundary)
+    random_state : mtrand.RandomState or np.random.Generator
+        Random state used to sample from this distribution.
+    size : int or None
+        Number of values to sample. If None, a single value is returned,
+        unless the parameters are arrays, in which case one value is sampled
+        for each set of parameters.
+
+    Returns
+    -------
+    value : float or np.ndarray
+        Random values sampled from the truncated normal distribution defined
+        by ```mu```, ```sigma```, ```trunc_min``` and ```trunc_max```.
+
+    '''
+    mu, sigma, trunc_min, trunc_max = [
+        np.asarray(x, dtype=float) for x in (mu, sigma, trunc_min, trunc_max)]
+    a, b = (trunc_min - mu) / sigma, (trunc_max - mu) / sigma
+    flip, cdf_min, cdf_range = _trunc_norm_constants(a, b)
+    if size is None:
+        size = np.broadcast(mu, sigma, trunc_min, trunc_max).shape or None
+    x = scipy.special.ndtri(cdf_min + _random_sample(random_state, size) *
+                            cdf_range)
+    value = np.clip(mu + sigma * np.where(flip, -x, x), trunc_min, trunc_max)
+    if np.ndim(value) == 0:
+        return float(value)
+    return value
+
+
+def _options_array(options):
+    '''
+    Array of the items of a list of options: a float array if all the items
+    are real numbers, otherwise an object array holding the items as is.
+    '''
+    if all(is_real_number(option) for option in options):
+        return np.asarray(options, dtype=float)
+    array = np.empty(len(options), dtype=object)
+    array[:] = options
+    return array
+
+
+class _Sampler(abc.ABC):
+    '''
+    Sampler of a distribution tuple, compiled once so that repeated draws
+    don't parse the tuple again. ``sample`` draws the same values as the
+    ``_sample_*`` function of the distribution given the same random state
+    (except for "truncnorm", see ``_TruncNormSampler``), and ``sample_n``
+    draws an array of values at once.
+
+    Samplers don't validate their distribution tuple, see
+    ``core._compile_distribution``.
+
+    Parameters
+    ----------
+    dist_tuple : tuple
+        Valid distribution tuple, see ``Scaper.add_event``.
+
+    '''
+    def __init__(self, dist_tuple):
+        self.dist_tuple = dist_tuple
+
+    @abc.abstractmethod
+    def sample(self, random_state):
+        '''
+        Sample a single value.
+
+        Parameters
+        ----------
+        random_state : mtrand.RandomState or np.random.Generator
+            Random state used to sample from the distribution.
+
+        Returns
+        -------
+        value
+            A value from the distribution.
+
+        '''
+
+    @abc.abstractmethod
+    def sample_n(self, random_state, n):
+        '''
+        Sample ``n`` values at once. The values follow the same distribution
+        as ``sample``, but are not the same values as ``n`` successive calls
+        of ``sample`` with the same random state.
+
+        Parameters
+        ----------
+        random_state : mtrand.RandomState or np.random.Generator
+            Random state used to sample from the distribution.
+        n : int
+            Number of values to sample.
+
+        Returns
+        -------
+        values : np.ndarray
+            Array of shape (n,). Float array for numerical values, object
+            array otherwise (e.g. for labels and source files).
+
+        '''
+
+
+class _ConstSampler(_Sampler):
+    def __init__(self, dist_tuple):
+        super(_ConstSampler, self).__init__(dist_tuple)
+        self.value = dist_tuple[1]
+
+    def sample(self, random_state):
+        return self.value
+
+    def sample_n(self, random_state, n):
+        return _options_array([self.value])[np.zeros(n, dtype=int)]
+
+
+class _ChooseSampler(_Sampler):
+    def __init__(self, dist_tuple):
+        super(_ChooseSampler, self).__init__(dist_tuple)
+        list_of_options = dist_tuple[1]
+        self.options = sorted(list(set(list_of_options)))
+        self._n_duplicates = len(list_of_options) - len(self.options)
+
+    def _warn_duplicates(self):
+        if self._n_duplicates > 0:
+            warnings.warn(
+                'Removed duplicates from choose list. List length changed '
+                'from {:d} to {:d}'.format(
+                    len(self.options) + self._n_duplicates,
+                    len(self.options)),
+                ScaperWarning)
+
+    def sample(self, random_state):
+        self._warn_duplicates()
+        index = _randint(random_state, len(self.options))
+        return self.options[index]
+
+    def sample_n(self, random_state, n):
+        self._warn_duplicates()
+        index = _randint(random_state, len(self.options), size=n)
+        return _options_array(self.options)[index]
+
+
+class _ChooseWeightedSampler(_Sampler):
+    def __init__(self, dist_tuple):
+        super(_ChooseWeightedSampler, self).__init__(dist_tuple)
+        self.options = np.array(dist_tuple[1])
+        self.probabilities = np.array(dist_tuple[2], dtype=float)
+
+    def sample(self, random_state):
+        return random_state.choice(self.options, p=self.probabilities)
+
+    def sample_n(self, random_state, n):
+        index = random_state.choice(
+            len(self.options), size=n, p=self.probabilities)
+        return _options_array(self.dist_tuple[1])[index]
+
+
+class _UniformSampler(_Sampler):
+    def __init__(self, dist_tuple):
+        super(_UniformSampler, self).__init__(dist_tuple)
+        self.minimum, self.maximum = dist_tuple[1:]
+
+    def sample(self, random_state):
+        return random_state.uniform(self.minimum, self.maximum)
+
+    def sample_n(self, random_state, n):
+        return random_state.uniform(self.minimum, self.maximum, size=n)
+
+
+class _NormalSampler(_Sampler):
+    def __init__(self, dist_tuple):
+        super(_NormalSampler, self).__init__(dist_tuple)
+        self.mu, self.sigma = dist_tuple[1:]
+
+    def sample(self, random_state):
+        return random_state.normal(self.mu, self.sigma)
+
+    def sample_n(self, random_state, n):
+        return random_state.normal(self.mu, self.sigma, size=n)
+
+
+class _TruncNormSampler(_Sampler):
+    '''
+    Sampler of the "truncnorm" distribution. Values are sampled with the
+    inverse CDF, see ``_sample_trunc_norm_fast``, or with
+    ``scipy.stats.truncnorm`` if ``legacy`` is True, which gives the same
+    values as ``_sample_trunc_norm`` (and scaper < 1.7) for a given random
+    state.
+    '''
+    def __init__(self, dist_tuple, legacy=False):
+        super(_TruncNormSampler, self).__init__(dist_tuple)
+        self.legacy = legacy
+        self.mu, self.sigma, self.trunc_min, self.trunc_max = dist_tuple[1:]
+        # bounds of the standard normal distribution, see _sample_trunc_norm
+        self.a = (self.trunc_min - self.mu) / float(self.sigma)
+        self.b = (self.trunc_max - self.mu) / float(self.sigma)
+        flip, cdf_min, cdf_range = _trunc_norm_constants(self.a, self.b)
+        self._flip = bool(flip)
+        self._cdf_min = float(cdf_min)
+        self._cdf_range = float(cdf_range)
+
+    def sample(self, random_state):
+        if self.legacy:
+            sample = scipy.stats.truncnorm.rvs(
+                self.a, self.b, self.mu, self.sigma, random_state=random_state)
+            return np.array(sample).item()
+        x = scipy.special.ndtri(
+            self._cdf_min + _random_sample(random_state) * self._cdf_range)
+        if self._flip:
+            x = -x
+        value = self.mu + self.sigma * x
+        return float(min(max(value, self.trunc_min), self.trunc_max))
+
+    def sample_n(self, random_state, n):
+        if self.legacy:
+            return np.asarray(scipy.stats.truncnorm.rvs(
+                self.a, self.b, self.mu, self.sigma, size=n,
+                random_state=random_state), dtype=float).reshape(n)
+        x = scipy.special.ndtri(
+            self._cdf_min + _random_sample(random_state, n) * self._cdf_range)
+        if self._flip:
+            x = -x
+        return np.clip(self.mu + self.sigma * x, self.trunc_min,
+                       self.trunc_max)
+
+
+_SAMPLERS = {"const": _ConstSampler,
+             "choose": _ChooseSampler,
+             "choose_weighted": _ChooseWeightedSampler,
+             "uniform": _UniformSampler,
+             "normal": _NormalSampler,
+             "truncnorm": _TruncNormSampler}
+
+
+def _make_sampler(dist_tuple, legacy_truncnorm=False):
+    '''
+    Compile a valid distribution tuple into a sampler object.
+
+    Parameters
+    ----------
+    dist_tuple : tuple
+        Valid distribution tuple, see ``Scaper.add_event``.
+    legacy_truncnorm : bool
+        If True, "truncnorm" tuples are sampled with
+        ``scipy.stats.truncnorm``, as in scaper < 1.7.
+
+    Returns
+    -------
+    sampler : _Sampler
+        Sampler of the distribution.
+
+    Raises
+    ------
+    ScaperError
+        If the distribution name is not supported.
+
+    '''
+    if dist_tuple[0] not in _SAMPLERS:
+        raise ScaperError(
+            'Unsupported distribution name: {:s}'.format(dist_tuple[0]))
+    if dist_tuple[0] == 'truncnorm':
+        return _TruncNormSampler(dist_tuple, legacy=legacy_truncnorm)
+    return _SAMPLERS[dist_tuple[0]](dist_tuple)
+
+
 def max_polyphony(ann):
     '''
     Given an annotation of sound events, compute the maximum polyphony, i.e.
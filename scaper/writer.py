@@ -0,0 +1,179 @@
+'''
+Asynchronous writer
+===================
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+import csv
+import numbers
+import threading
+from .scaper_exceptions import ScaperError
+
+
+class AsyncWriter(object):
+    '''
+    Pool of threads that write output files in the background, so that the
+    next soundscape is rendered while the previous ones are written to disk.
+
+    Writes are queued with ``AsyncWriter.submit``, which blocks once
+    ``max_pending`` writes are queued or running, so that rendering can't
+    get ahead of the disk by more than ``max_pending`` files. The first
+    error raised by a write is raised again by the next call to ``submit``,
+    ``flush`` or ``close``. The writer can be used as a context manager,
+    which waits for the pending writes and shuts the threads down on exit.
+
+    Pass the writer to ``Scaper.generate`` or ``Scaper.generate_batch`` as
+    ``writer`` to save their outputs asynchronously. Arrays passed to the
+    writer must not be modified until their writes are done, e.g. until
+    ``flush`` returns.
+
+    Parameters
+    ----------
+    n_threads : int
+        Number of writing threads (default 2).
+    max_pending : int
+        Maximum number of writes queued or running (default 16).
+
+    Raises
+    ------
+    ScaperError
+        If ``n_threads`` or ``max_pending`` is not a positive integer.
+
+    '''
+    def __init__(self, n_threads=2, max_pending=16):
+        for name, value in [('n_threads', n_threads),
+                            ('max_pending', max_pending)]:
+            if not isinstance(value, numbers.Integral) or value < 1:
+                raise ScaperError(
+                    '{:s} must be a positive integer.'.format(name))
+        self.n_threads = int(n_threads)
+        self.max_pending = int(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.n_threads)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._error = None
+
+    def __getstate__(self):
+        raise ScaperError(
+            'An AsyncWriter can only be used by the process that created it.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # don't mask the exception with the errors of the writes
+            self._executor.shutdown(wait=True)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            if self._error is None and not future.cancelled() and \
+                    future.exception() is not None:
+                self._error = future.exception()
+        self._slots.release()
+
+    def _raise_error(self):
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Queue a call to ``func(*args, **kwargs)``, waiting for a write to
+        finish if ``max_pending`` writes are already queued or running.
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            Future of the call.
+
+        Raises
+        ------
+        Exception
+            The first error raised by a previous write, if any.
+
+        '''
+        self._raise_error()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def pending(self):
+        '''
+        Writes queued or running.
+
+        Returns
+        -------
+        futures : list
+            Futures of the writes.
+
+        '''
+        with self._lock:
+            return list(self._pending)
+
+    def flush(self):
+        '''
+        Wait for all the queued writes to finish.
+
+        Raises
+        ------
+        Exception
+            The first error raised by a write since the last call to
+            ``submit``, ``flush`` or ``close``, if any.
+
+        '''
+        while True:
+            futures = self.pending()
+            if not futures:
+                break
+            concurrent.futures.wait(futures)
+        self._raise_error()
+
+    def close(self):
+        '''
+        Wait for all the queued writes to finish and shut the threads down.
+
+        Raises
+        ------
+        Exception
+            The first error raised by a write, see ``AsyncWriter.flush``.
+
+        '''
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+def _write(writer, func, *args, **kwargs):
+    '''
+    Call ``func(*args, **kwargs)`` now if ``writer`` is None, otherwise
+    queue it on the writer.
+    '''
+    if writer is None:
+        func(*args, **kwargs)
+    else:
+        writer.submit(func, *args, **kwargs)
+
+
+def _write_txt(txt_path, annotation_list, txt_sep):
+    '''
+    Save a simplified annotation list as a text file with one
+    [onset  offset  label] row per event.
+    '''
+    with open(txt_path, 'w') as csv_file:
+        writer = csv.writer(csv_file, delimiter=txt_sep)
+        writer.writerows(annotation_list)
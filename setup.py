@@ -16,6 +16,9 @@ setup(
     url='https://github.com/justinsalamon/scaper',
     download_url='http://github.com/justinsalamon/scaper/releases',
     packages=['scaper'],
+    entry_points={
+        'console_scripts': ['scaper=scaper.cli:main'],
+    },
     long_description=long_description,
     long_description_content_type='text/markdown',
     keywords='audio sound soundscape environmental dsp mixing',
@@ -35,12 +38,13 @@ setup(
             "Programming Language :: Python :: 3.5",
             "Programming Language :: Python :: 3.6",
         ],
+    python_requires='>=3.8',
     install_requires=[
         'sox==1.4.0',
         'jams>=0.3.2',
-        'numpy>=1.13.3',
+        'numpy>=1.17',
         "soxbindings>=1.2.2;platform_system!='Windows'",
-        'pyloudnorm',
+        'scipy',
         'soundfile',
     ],
     extras_require={
@@ -49,6 +53,7 @@ setup(
                 'sphinx_rtd_theme',
                 'sphinx_issues',
             ],
-        'tests': ['backports.tempfile', 'pytest', 'pytest-cov', 'tqdm']
+        'tests': ['backports.tempfile', 'pytest', 'pytest-cov', 'tqdm',
+                  'pyloudnorm']
     }
 )
@@ -0,0 +1,27 @@
+'''
+Helpers shared by the tests
+'''
+
+import scaper
+
+
+# FIXTURES
+FG_PATH = 'tests/data/audio/foreground'
+BG_PATH = 'tests/data/audio/background'
+
+
+def create_scaper(sr=44100, n_events=1, event_audio_format='dense',
+                  random_state=0):
+    '''
+    Scaper object for 10 s soundscapes with a background and ``n_events``
+    foreground events with random labels, sources, times and SNRs.
+    '''
+    sc = scaper.Scaper(10.0, FG_PATH, BG_PATH, random_state=random_state)
+    sc.sr = sr
+    sc.event_audio_format = event_audio_format
+    sc.add_background(('choose', []), ('choose', []), ('const', 0))
+    for _ in range(n_events):
+        sc.add_event(('choose', []), ('choose', []), ('uniform', 0, 1),
+                     ('uniform', 0, 9), ('uniform', 0.5, 1),
+                     ('uniform', -5, 5), None, None)
+    return sc
@@ -1,7 +1,11 @@
 # CREATED: 5/5/17 14:36 by Justin Salamon <justin.salamon@nyu.edu>
 
 from scaper.audio import get_integrated_lufs, match_sample_length
+from scaper.audio import get_integrated_lufs_batch
+from scaper.audio import LoudnessMeter
 from scaper.audio import peak_normalize
+from scaper.audio import EventAudio
+from scaper.audio import SourceAudioCache
 from scaper.util import _close_temp_files
 import numpy as np
 import scipy.signal as sg
@@ -13,6 +17,8 @@ import shutil
 import soundfile as sf
 import tempfile
 import random
+import pickle
+import pyloudnorm
 
 # fixtures
 SIREN_FILE = 'tests/data/audio/foreground/siren/69-Siren-1.wav'
@@ -40,6 +46,132 @@ def test_get_integrated_lufs():
         assert np.allclose(i, li)
 
 
+def _pyloudnorm_lufs(audio, sr, filter_class='K-weighting',
+                     min_duration=0.5):
+    # reference implementation: self-concatenate short clips and measure
+    # with pyloudnorm
+    if audio.ndim == 1:
+        audio = audio[:, None]
+    duration = audio.shape[0] / float(sr)
+    if duration < min_duration:
+        audio = np.tile(audio, (int(np.ceil(min_duration / duration)), 1))
+    meter = pyloudnorm.Meter(sr, filter_class=filter_class)
+    return max(meter.integrated_loudness(audio), -70)
+
+
+def test_get_integrated_lufs_matches_pyloudnorm():
+    audiofiles = [CARHORN_FILE, HUMANVOICE_FILE, DOGBARK_FILE]
+    filter_classes = ['K-weighting', 'Fenton/Lee 1', 'Fenton/Lee 2',
+                      'Dash et al.']
+    rng = np.random.RandomState(0)
+
+    signals = [sf.read(af) for af in audiofiles]
+    for sr in [16000, 44100]:
+        for n_channels in [1, 2, 5]:
+            # short (self-concatenated) and long signals with varying level
+            for duration in [0.001, 0.1, 0.45, 2.3]:
+                n_samples = max(int(duration * sr), 1)
+                envelope = np.linspace(0, 1, n_samples)[:, None] ** 4
+                audio = rng.randn(n_samples, n_channels) * envelope * 0.1
+                signals.append((audio, sr))
+
+    for audio, sr in signals:
+        for filter_class in filter_classes:
+            i = get_integrated_lufs(audio, sr, filter_class=filter_class)
+            ref = _pyloudnorm_lufs(audio, sr, filter_class=filter_class)
+            assert np.allclose(i, ref, atol=1e-6, rtol=0)
+
+    # silence and audio too short to be measured
+    assert get_integrated_lufs(np.zeros((44100, 1)), 44100) == -70
+    assert get_integrated_lufs(np.ones((100, 1)), 44100, min_duration=0.1) \
+        == -70
+
+    # invalid filter class and number of channels
+    pytest.raises(ScaperError, get_integrated_lufs, np.ones((44100, 1)),
+                  44100, filter_class='DeMan')
+    pytest.raises(ScaperError, get_integrated_lufs, np.ones((44100, 6)),
+                  44100)
+
+
+def test_get_integrated_lufs_batch():
+    rng = np.random.RandomState(0)
+    for sr in [16000, 44100]:
+        for n_channels in [1, 2]:
+            carhorn, _ = sf.read(CARHORN_FILE, always_2d=True)
+            audio_list = [carhorn[:, [0] * n_channels]]
+            for n_samples in list(rng.randint(1, 3 * sr, 20)) + [1, sr // 10]:
+                envelope = np.linspace(0, 1, n_samples)[:, None] ** 4
+                audio_list.append(
+                    rng.randn(n_samples, n_channels) * envelope * 0.1)
+            audio_list.append(np.zeros((sr, n_channels)))
+
+            lufs = [get_integrated_lufs(audio, sr) for audio in audio_list]
+
+            # list of arrays of different lengths
+            lufs_batch = get_integrated_lufs_batch(audio_list, sr)
+            assert lufs_batch.shape == (len(audio_list),)
+            assert np.allclose(lufs_batch, lufs, atol=1e-9, rtol=0)
+
+            # zero-padded stack
+            lengths = [len(audio) for audio in audio_list]
+            stack = np.zeros((len(audio_list), max(lengths), n_channels))
+            for i, audio in enumerate(audio_list):
+                stack[i, :len(audio)] = audio
+            lufs_batch = get_integrated_lufs_batch(stack, sr, lengths=lengths)
+            assert np.allclose(lufs_batch, lufs, atol=1e-9, rtol=0)
+
+            # float32 signals are filtered in float32
+            lufs_batch = get_integrated_lufs_batch(
+                [audio.astype(np.float32) for audio in audio_list], sr)
+            assert np.allclose(lufs_batch, lufs, atol=1e-3, rtol=0)
+
+    # 1d signals and empty batches
+    audio_list = [rng.randn(1000), rng.randn(50000)]
+    assert np.allclose(get_integrated_lufs_batch(audio_list, 16000),
+                       [get_integrated_lufs(x, 16000) for x in audio_list])
+    assert get_integrated_lufs_batch([], 16000).shape == (0,)
+
+    pytest.raises(ScaperError, get_integrated_lufs_batch,
+                  [np.ones((44100, 6))], 44100)
+
+
+def test_loudness_meter():
+    rng = np.random.RandomState(0)
+    carhorn, _ = sf.read(CARHORN_FILE, always_2d=True)
+    audio_list = [carhorn, carhorn[:, [0, 0]], np.zeros((44100, 1))]
+    for n_samples in [1, 4410, 20000, 3 * 44100 + 17]:
+        envelope = np.linspace(0, 1, n_samples)[:, None] ** 4
+        audio_list.append(rng.randn(n_samples, 2) * envelope * 0.1)
+
+    # same loudness whatever the block size
+    for audio in audio_list:
+        for block_samples in [1000, 4410, 44100]:
+            meter = LoudnessMeter(44100)
+            for start in range(0, len(audio), block_samples):
+                meter.update(audio[start:start + block_samples])
+            assert np.allclose(meter.integrated_lufs(),
+                               get_integrated_lufs(audio, 44100),
+                               atol=1e-9, rtol=0)
+
+    # 1d blocks, other settings
+    meter = LoudnessMeter(16000, filter_class='Fenton/Lee 1',
+                          block_size=0.2)
+    audio = rng.randn(50000)
+    meter.update(audio[:30000])
+    meter.update(audio[30000:])
+    assert np.allclose(
+        meter.integrated_lufs(),
+        get_integrated_lufs(audio, 16000, filter_class='Fenton/Lee 1',
+                            block_size=0.2))
+    assert LoudnessMeter(16000).integrated_lufs() == -70
+
+    pytest.raises(ScaperError, LoudnessMeter, 16000, filter_class='invalid')
+    meter = LoudnessMeter(44100)
+    pytest.raises(ScaperError, meter.update, np.ones((44100, 6)))
+    meter.update(np.ones((44100, 1)))
+    pytest.raises(ScaperError, meter.update, np.ones((44100, 2)))
+
+
 def change_format_and_subtype(audio_path):
     audio, sr = sf.read(audio_path)
     audio_info = sf.info(audio_path)
@@ -170,3 +302,97 @@ def test_peak_normalize():
                         assert np.allclose(max_sample_event,
                                            A * factor * scale_factor,
                                            atol=1e-3)
+
+
+def test_event_audio():
+    audio = np.random.RandomState(0).randn(100, 2)
+    event = EventAudio(audio, 50, 200)
+    assert event.shape == (200, 2)
+    assert len(event) == 200
+    assert event.dtype == audio.dtype
+    assert event.offset == 150
+
+    dense = event.to_dense()
+    assert dense.shape == event.shape
+    assert np.array_equal(dense[50:150], audio)
+    assert not np.any(dense[:50]) and not np.any(dense[150:])
+    assert np.array_equal(np.asarray(event), dense)
+    assert np.asarray(event, dtype=np.float32).dtype == np.float32
+
+    # scaling is lazy
+    scaled = 0.5 * event
+    assert isinstance(scaled, EventAudio)
+    assert scaled.audio is audio
+    assert scaled.scale == 0.5 and event.scale == 1.0
+    assert np.array_equal(np.asarray(scaled), dense * 0.5)
+    assert (event * 2).scale == 2
+
+    # numpy scalars, e.g. gains computed with numpy, keep events sparse
+    for scaled in [np.float64(2) * event, event * np.float64(2),
+                   np.float32(2) * event, np.int64(2) * event]:
+        assert isinstance(scaled, EventAudio)
+        assert scaled.scale == 2
+    with pytest.raises(TypeError):
+        np.ones(200) * event
+    with pytest.raises(TypeError):
+        np.abs(event)
+    assert np.array_equal(np.array(event, copy=True), dense)
+    pytest.raises(ValueError, event.__array__, copy=False)
+
+    # peak normalization scales EventAudio objects lazily
+    mix = dense + EventAudio(audio[:20], 0, 200).to_dense()
+    mix_norm, events_norm, scale_factor = peak_normalize(
+        mix, [event, dense])
+    assert isinstance(events_norm[0], EventAudio)
+    assert events_norm[0].audio is audio
+    assert np.array_equal(events_norm[0].to_dense(), events_norm[1])
+
+    pytest.raises(ScaperError, EventAudio, audio, 150, 200)
+    pytest.raises(ScaperError, EventAudio, audio, -1, 200)
+
+
+def test_source_audio_cache():
+    cache = SourceAudioCache(max_bytes=3 * 8 * 100)
+    loads = []
+
+    def loader(n):
+        def _load():
+            loads.append(n)
+            return np.ones((n, 1))
+        return _load
+
+    # miss, then hit
+    a = cache.get('a', loader(100))
+    assert cache.get('a', loader(100)) is a
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert loads == [100]
+    assert cache.nbytes == a.nbytes
+
+    # cached arrays are read-only
+    pytest.raises(ValueError, a.__setitem__, 0, 0)
+
+    # least recently used entry is evicted once over budget
+    cache.get('b', loader(100))
+    cache.get('c', loader(100))
+    cache.get('a', loader(100))
+    cache.get('d', loader(100))
+    assert 'b' not in cache
+    assert all(k in cache for k in ['a', 'c', 'd'])
+    assert len(cache) == 3
+    assert cache.nbytes == 3 * 8 * 100
+
+    # arrays over budget are returned but not cached
+    big = cache.get('e', loader(1000))
+    assert big.shape == (1000, 1)
+    assert 'e' not in cache
+
+    # copies start out empty
+    copied = pickle.loads(pickle.dumps(cache))
+    assert len(copied) == 0
+    assert copied.max_bytes == cache.max_bytes
+
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses, cache.nbytes) == (0, 0, 0)
+
+    pytest.raises(ScaperError, SourceAudioCache, -1)
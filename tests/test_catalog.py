@@ -0,0 +1,146 @@
+'''
+Tests for functions in catalog.py
+'''
+
+from scaper.catalog import SourceCatalog, SourceInfo
+from scaper.util import _get_sorted_files
+from scaper.scaper_exceptions import ScaperError
+import scaper
+import backports.tempfile
+import json
+import numpy as np
+import os
+import pytest
+import shutil
+import soundfile
+
+
+# FIXTURES
+FG_PATH = 'tests/data/audio/foreground'
+BG_PATH = 'tests/data/audio/background'
+
+
+def _all_files(folder_path):
+    files = []
+    for label in sorted(os.listdir(folder_path)):
+        files.extend(_get_sorted_files(os.path.join(folder_path, label)))
+    return files
+
+
+def test_catalog_info():
+    catalog = SourceCatalog()
+    for source_file in _all_files(FG_PATH) + _all_files(BG_PATH):
+        info = catalog.info(source_file)
+        sfinfo = soundfile.info(source_file)
+        assert isinstance(info, SourceInfo)
+        assert info.label == os.path.basename(os.path.dirname(source_file))
+        assert info.duration == sfinfo.duration
+        assert info.samplerate == sfinfo.samplerate
+        assert info.channels == sfinfo.channels
+        assert info.frames == sfinfo.frames
+        assert info.size == os.path.getsize(source_file)
+
+    # samples are read as float64 unless requested otherwise
+    source_file = _all_files(FG_PATH)[0]
+    audio = catalog.read(source_file)
+    assert audio.dtype == 'float64'
+    audio32 = catalog.read(source_file, 10, 100, dtype='float32')
+    assert audio32.dtype == 'float32'
+    assert (audio32 == audio[10:100].astype('float32')).all()
+
+    # lazily listed folders match _get_sorted_files
+    for label in os.listdir(FG_PATH):
+        folder = os.path.join(FG_PATH, label)
+        assert catalog.files(folder) == _get_sorted_files(folder)
+
+    # invalid folder
+    pytest.raises(ScaperError, catalog.files, '/path/to/invalid/folder')
+
+
+def test_catalog_modified_source():
+    catalog = SourceCatalog()
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        source_file = os.path.join(tmpdir, 'source.wav')
+        soundfile.write(source_file, np.zeros((4410, 1)), 44100)
+        assert catalog.info(source_file).samplerate == 44100
+
+        # rewritten files are read again
+        soundfile.write(source_file, np.zeros((1600, 2)), 16000)
+        mtime = os.stat(source_file).st_mtime + 10
+        os.utime(source_file, (mtime, mtime))
+        info = catalog.info(source_file)
+        assert (info.samplerate, info.channels, info.frames) == (16000, 2,
+                                                                1600)
+        assert info.mtime == mtime
+
+        # removed files keep their metadata
+        os.remove(source_file)
+        assert catalog.info(source_file) == info
+
+
+def test_catalog_scan_and_cache():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        fg_path = os.path.join(tmpdir, 'foreground')
+        shutil.copytree(FG_PATH, fg_path)
+        cache_path = os.path.join(tmpdir, 'catalog.json')
+
+        # not an audio file: listed but not indexed
+        with open(os.path.join(fg_path, 'car_horn', 'notes.txt'), 'w') as f:
+            f.write('not audio')
+
+        catalog = SourceCatalog(cache_path)
+        labels = catalog.scan(fg_path)
+        assert labels == sorted(os.listdir(fg_path))
+        for label in labels:
+            folder = os.path.join(fg_path, label)
+            assert catalog.files(folder) == _get_sorted_files(folder)
+        pytest.raises(RuntimeError, catalog.info,
+                      os.path.join(fg_path, 'car_horn', 'notes.txt'))
+
+        catalog.save()
+        with open(cache_path) as f:
+            data = json.load(f)
+        indexed = [os.path.abspath(x) for x in _all_files(fg_path)
+                   if not x.endswith('.txt')]
+        assert sorted(data['sources'].keys()) == sorted(indexed)
+
+        # reload: unchanged files are taken from the cache
+        source_file = _get_sorted_files(os.path.join(fg_path, 'car_horn'))[0]
+        reloaded = SourceCatalog(cache_path)
+        reloaded.scan(fg_path)
+        assert reloaded.info(source_file) == catalog.info(source_file)
+        assert not reloaded._dirty
+
+        # modified files are re-read
+        audio, sr = soundfile.read(source_file)
+        soundfile.write(source_file, audio[:sr // 10], sr)
+        os.utime(source_file, (0, 0))
+        reloaded = SourceCatalog(cache_path)
+        reloaded.scan(fg_path)
+        assert reloaded.info(source_file).frames == sr // 10
+        assert reloaded.info(source_file).mtime == 0
+        assert reloaded._dirty
+
+        # invalid cache file
+        with open(cache_path, 'w') as f:
+            f.write('not json')
+        pytest.raises(ScaperError, SourceCatalog, cache_path)
+
+        # save needs a path
+        pytest.raises(ScaperError, SourceCatalog().save)
+
+
+def test_scaper_catalog():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        cache_path = os.path.join(tmpdir, 'catalog.json')
+        sc = scaper.Scaper(10.0, FG_PATH, BG_PATH, catalog=cache_path)
+        assert os.path.isfile(cache_path)
+        assert sc.catalog.cache_path == cache_path
+
+        # the catalog can be shared between scaper objects
+        sc2 = scaper.Scaper(10.0, FG_PATH, BG_PATH, catalog=sc.catalog)
+        assert sc2.catalog is sc.catalog
+
+    sc = scaper.Scaper(10.0, FG_PATH, BG_PATH)
+    assert isinstance(sc.catalog, SourceCatalog)
+    assert sc.catalog.cache_path is None
@@ -7,8 +7,11 @@ import pytest
 from scaper.core import EventSpec
 import tempfile
 import backports.tempfile
+import logging
 import os
+import time
 import numpy as np
+import scipy.stats
 import soundfile
 import jams
 import numbers
@@ -862,6 +865,74 @@ def test_get_value_from_dist():
     __test_bad_tuple_list(badargs)
 
 
+def test_compile_distribution():
+    # samplers draw the same values as _get_value_from_dist
+    dist_tuples = [('const', 1), ('const', 'siren'),
+                   ('choose', [3, 1, 2]), ('choose', ['b', 'a']),
+                   ('choose_weighted', [1, 2, 3], [0.2, 0.3, 0.5]),
+                   ('uniform', 0, 1), ('normal', 5, 1),
+                   ('truncnorm', 5, 10, 0, 10)]
+    for dist_tuple in dist_tuples:
+        sampler = scaper.core._compile_distribution(
+            dist_tuple, legacy_truncnorm=True)
+        rng = scaper.util._check_random_state(0)
+        ref_rng = scaper.util._check_random_state(0)
+        for _ in range(10):
+            assert sampler.sample(rng) == \
+                scaper.core._get_value_from_dist(dist_tuple, ref_rng)
+        values = sampler.sample_n(rng, 5)
+        assert values.shape == (5,)
+
+    # tuples are validated once, when compiled
+    for dist_tuple in [('const', 1, 2), ('uniform', 2, 1), ('invalid', 1),
+                       ('choose_weighted', [1, 2], [0.5, 0.6])]:
+        pytest.raises(ScaperError, scaper.core._compile_distribution,
+                      dist_tuple)
+
+    # event specifications
+    event = EventSpec(label=('choose', []), source_file=('choose', []),
+                      source_time=('const', 0), event_time=('uniform', 0, 1),
+                      event_duration=('const', 1), snr=('normal', 0, 1),
+                      role='foreground', pitch_shift=None,
+                      time_stretch=('const', 1))
+    samplers = scaper.core._compile_event(event)
+    assert samplers.label is None and samplers.source_file is None
+    assert samplers.pitch_shift is None
+    assert samplers.role == 'foreground'
+    assert samplers.event_time.dist_tuple == ('uniform', 0, 1)
+    pytest.raises(ScaperError, scaper.core._compile_event,
+                  event._replace(snr=('normal', 0, -1)))
+
+    # events are compiled when added, and the specification is unchanged
+    sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH)
+    sc.add_event(*[getattr(event, field) for field in EventSpec._fields
+                   if field != 'role'])
+    assert sc.fg_spec == [event]
+    samplers = sc._event_samplers(sc.fg_spec[0])
+    assert samplers is sc._event_samplers(sc.fg_spec[0])
+    assert sc._event_samplers(event) is not samplers
+    assert sc._choose_sampler(sc.fg_labels) is \
+        sc._choose_sampler(sc.fg_labels)
+    sc.reset_fg_event_spec()
+    assert sc._samplers == {}
+
+    # truncnorm tuples are sampled as in previous versions with
+    # legacy_truncnorm
+    sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH)
+    sc.add_event(('const', 'siren'),
+                 ('const', 'tests/data/audio/foreground/siren/69-Siren-1.wav'),
+                 ('const', 0), ('truncnorm', 3, 2, 0, 6), ('const', 1),
+                 ('const', 0), None, None)
+    for legacy_truncnorm, sample_trunc_norm in [
+            (False, scaper.util._sample_trunc_norm_fast),
+            (True, scaper.util._sample_trunc_norm)]:
+        sc.legacy_truncnorm = legacy_truncnorm
+        sc.set_random_state(0)
+        event = sc._instantiate_event(sc.fg_spec[0])
+        assert event.event_time == sample_trunc_norm(
+            3, 2, 0, 6, scaper.util._check_random_state(0))
+
+
 def test_ensure_satisfiable_source_time_tuple():
     # Documenting the expected behavior of _ensure_satisfiable_source_time_tuple
     source_duration = 10
@@ -1593,6 +1664,129 @@ def test_scaper_instantiate():
                              exclude_additional_scaper_sandbox_keys=sandbox_exclude)
 
 
+def test_scaper_instantiate_batch():
+    # constant specs give the same soundscapes as _instantiate
+    sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH)
+    sc.add_background(('const', 'street'), ('choose', []), ('const', 0))
+    sc.add_event(('const', 'siren'),
+                 ('const', 'tests/data/audio/foreground/siren/69-Siren-1.wav'),
+                 ('const', 5), ('const', 2), ('const', 5), ('const', 5),
+                 None, None)
+    sc.add_event(('const', 'car_horn'), ('choose', []), ('const', 0),
+                 ('const', 9), ('const', 2), ('const', 20), ('const', 1),
+                 ('const', 1.2))
+    jam = sc._instantiate(disable_instantiation_warnings=True)
+    jams_batch = list(sc.instantiate_batch(
+        3, disable_instantiation_warnings=True))
+    assert len(jams_batch) == 3
+    ann = jam.annotations.search(namespace='scaper')[0]
+    for batch_jam in jams_batch:
+        batch_ann = batch_jam.annotations.search(namespace='scaper')[0]
+        assert batch_ann.sandbox.scaper.keys() == ann.sandbox.scaper.keys()
+        for obs, batch_obs in zip(ann.data, batch_ann.data):
+            if obs.value['role'] == 'foreground' and \
+                    obs.value['label'] == 'siren':
+                assert batch_obs == obs
+            else:
+                # source files are drawn independently
+                assert batch_obs.value['label'] == obs.value['label']
+
+    # adjustments are reported with a single warning per kind and event
+    # specification
+    with pytest.warns(ScaperWarning) as record:
+        list(sc.instantiate_batch(5))
+    messages = [str(w.message) for w in record]
+    assert messages.count('5 of 5 foreground events: event duration greater '
+                          'than source duration, changed to source '
+                          'duration') == 2
+
+    # random specs respect the same bounds as _instantiate
+    sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH, random_state=0)
+    sc.protected_labels = ['human_voice']
+    sc.add_background(('choose', []), ('choose', []), ('uniform', 0, 5))
+    for _ in range(2):
+        sc.add_event(('choose', []), ('choose', []), ('uniform', 0, 3),
+                     ('truncnorm', 5, 3, 0, 10), ('uniform', 0.5, 12),
+                     ('normal', 0, 5), ('uniform', -1, 1),
+                     ('choose_weighted', [0.8, 1.5], [0.5, 0.5]))
+    specs = list(sc.instantiate_batch(
+        50, disable_instantiation_warnings=True, as_jams=False))
+    assert len(specs) == 50
+    for values in specs:
+        assert len(values) == 3
+        assert values[0].role == 'background'
+        assert values[0].event_duration == 10
+        for value in values:
+            assert isinstance(value, EventSpec)
+            assert isinstance(value.snr, float)
+            assert isinstance(value.label, str)
+            source_duration = soundfile.info(value.source_file).duration
+            stretch = value.time_stretch or 1
+            assert value.event_time >= 0
+            assert value.event_time + value.event_duration * stretch <= \
+                10 + 1e-9
+            assert value.source_time >= 0
+            assert value.source_time + value.event_duration <= \
+                source_duration + 1e-9
+            if value.label == 'human_voice':
+                assert value.source_time == 0
+                assert value.event_duration * stretch == 10 or \
+                    value.event_duration == source_duration
+
+    # same values with the same seed
+    for random_state in [1, 2]:
+        sc.set_random_state(random_state)
+        jams_batch = list(sc.instantiate_batch(
+            5, disable_instantiation_warnings=True))
+        sc.set_random_state(random_state)
+        assert list(sc.instantiate_batch(
+            5, disable_instantiation_warnings=True)) == jams_batch
+
+    # soundscapes are instantiated one by one when repetitions are not
+    # allowed
+    specs = list(sc.instantiate_batch(
+        10, allow_repeated_label=False, disable_instantiation_warnings=True,
+        as_jams=False))
+    assert len(specs) == 10
+    for values in specs:
+        assert values[1].label != values[2].label
+
+    assert len(list(sc.instantiate_batch(
+        np.int64(3), disable_instantiation_warnings=True))) == 3
+    pytest.raises(ScaperError, list, sc.instantiate_batch(-1))
+    pytest.raises(ScaperError, list, sc.instantiate_batch(1.5))
+
+
+def test_sample_source_time_array(monkeypatch):
+    source_duration = np.array([20.0, 20.0, 5.0, 3.0])
+    event_duration = np.full(4, 2.0)
+
+    # legacy truncnorm values are the values of scipy.stats.truncnorm
+    source_time = ('truncnorm', 5, 2, 1, 9)
+    values, modified = scaper.core._sample_source_time_array(
+        source_time, source_duration[:2], event_duration[:2],
+        np.random.RandomState(0), legacy_truncnorm=True)
+    assert not modified.any()
+    assert np.allclose(values, scipy.stats.truncnorm.rvs(
+        -2, 2, 5, 2, size=2, random_state=np.random.RandomState(0)))
+
+    # choose tuples are compiled once per distinct modified tuple
+    compiled = []
+
+    def _make_sampler(dist_tuple, **kwargs):
+        compiled.append(dist_tuple)
+        return scaper.util._make_sampler(dist_tuple, **kwargs)
+
+    monkeypatch.setattr(scaper.core, '_make_sampler', _make_sampler)
+    values, modified = scaper.core._sample_source_time_array(
+        ('choose', [0, 2, 4]), source_duration, event_duration,
+        np.random.RandomState(0))
+    assert len(compiled) == 3
+    assert list(modified) == [False, False, True, True]
+    assert set(values[:2]) <= {0, 2, 4}
+    assert (values + event_duration <= source_duration).all()
+
+
 def test_generate_with_seeding(atol=1e-4, rtol=1e-8):
     # test a scaper generator with different random seeds. init with same random seed
     # over and over to make sure the output wav stays the same
@@ -1618,7 +1812,9 @@ def test_set_random_state(atol=1e-4, rtol=1e-8):
         0, 10, 20, 
         scaper.util._check_random_state(0),
         scaper.util._check_random_state(10),
-        scaper.util._check_random_state(20)
+        scaper.util._check_random_state(20),
+        np.random.default_rng(0),
+        np.random.Philox(10),
     ]
     num_generators = 2
     for seed in seeds:
@@ -1631,6 +1827,498 @@ def test_set_random_state(atol=1e-4, rtol=1e-8):
         _compare_generators(generators)
 
 
+def test_independent_streams():
+    def _instantiate(n_events, random_state, instantiate_batch=False):
+        sc = scaper.Scaper(10.0, FG_PATH, BG_PATH, random_state=random_state)
+        sc.independent_streams = True
+        sc.add_background(('choose', []), ('choose', []), ('uniform', 0, 5))
+        for _ in range(n_events):
+            sc.add_event(('choose', []), ('choose', []), ('uniform', 0, 1),
+                         ('uniform', 0, 9), ('uniform', 0.5, 2),
+                         ('uniform', -5, 5), None, None)
+        if instantiate_batch:
+            return [values[0] for values in sc.instantiate_batch(
+                3, disable_instantiation_warnings=True, as_jams=False)]
+        return [sc._instantiate_event(sc.bg_spec[0]),
+                sc._instantiate(disable_instantiation_warnings=True)]
+
+    for random_state in [0, np.random.default_rng(0)]:
+        # the background doesn't depend on the foreground events
+        bg_event, jam = _instantiate(1, deepcopy(random_state))
+        other_bg_event, other_jam = _instantiate(3, deepcopy(random_state))
+        assert bg_event == other_bg_event
+        bg_events = [obs for obs in jam.annotations[0].data
+                     if obs.value['role'] == 'background']
+        other_bg_events = [obs for obs in other_jam.annotations[0].data
+                           if obs.value['role'] == 'background']
+        assert bg_events == other_bg_events
+        assert len(other_jam.annotations[0].data) == 4
+
+        assert _instantiate(1, deepcopy(random_state), True) == \
+            _instantiate(3, deepcopy(random_state), True)
+
+
+def test_generate_with_audio_cache(atol=1e-4, rtol=1e-8):
+    sc = _create_scaper_with_random_seed(0)
+    sc.audio_cache = scaper.audio.SourceAudioCache()
+    # make sure every event reuses a source file
+    sc.add_event(
+        label=('const', 'siren'),
+        source_file=('const', os.path.join(FG_PATH, 'siren', '69-Siren-1.wav')),
+        source_time=('const', 0),
+        event_time=('const', 1),
+        event_duration=('const', 2),
+        snr=('const', 10),
+        pitch_shift=('const', 1),
+        time_stretch=('const', 1.2))
+
+    audio, jam, _, event_audio_list = sc.generate(
+        disable_instantiation_warnings=True)
+    assert sc.audio_cache.misses == len(sc.audio_cache) > 0
+    n_misses = sc.audio_cache.misses
+
+    # generating the same soundscape again is served from the cache
+    sc.audio_cache.hits = 0
+    ann = jam.annotations.search(namespace='scaper')[0]
+    audio2, event_audio_list2, _, _ = sc._generate_audio(None, ann)
+    assert sc.audio_cache.misses == n_misses
+    assert sc.audio_cache.hits == len(ann.data)
+    assert np.allclose(audio, audio2, atol=atol, rtol=rtol)
+    for e, e2 in zip(event_audio_list, event_audio_list2):
+        assert np.allclose(e, e2, atol=atol, rtol=rtol)
+
+    # cached sources are not modified by generation
+    for source in sc.audio_cache._entries.values():
+        assert not source.flags.writeable
+
+    # and the result is close to generating without the cache
+    sc.audio_cache = None
+    audio3, _, _, _ = sc._generate_audio(None, ann)
+    assert audio3.shape == audio.shape
+    assert np.allclose(audio, audio3, atol=0.1)
+
+
+def test_audio_cache_modified_source():
+    sc = _create_scaper_with_random_seed(0)
+    sc.audio_cache = scaper.audio.SourceAudioCache()
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        source_file = os.path.join(tmpdir, 'source.wav')
+        audio = np.linspace(-0.5, 0.5, 4410)[:, None]
+        soundfile.write(source_file, audio, 44100, subtype='FLOAT')
+        source = sc._read_source_audio(source_file, 'foreground')
+        assert np.allclose(source, audio)
+        sc._read_source_audio(source_file, 'foreground')
+        assert (sc.audio_cache.hits, sc.audio_cache.misses) == (1, 1)
+
+        # modified files are read again, even if the catalog knows them
+        soundfile.write(source_file, audio / 2, 44100, subtype='FLOAT')
+        mtime = os.stat(source_file).st_mtime + 10
+        os.utime(source_file, (mtime, mtime))
+        source = sc._read_source_audio(source_file, 'foreground')
+        assert np.allclose(source, audio / 2)
+        assert sc.audio_cache.misses == 2
+
+
+def test_final_spans():
+    # every sample belongs to the last event spanning it
+    spans = [(0, 100), (10, 30), (20, 40), (50, 50), (120, 90), (60, 100)]
+    assert scaper.core._final_spans(spans) == [
+        [(0, 10), (40, 60)], [(10, 20)], [(20, 40)], [], [], [(60, 100)]]
+
+    rng = np.random.RandomState(0)
+    for _ in range(100):
+        starts = rng.randint(0, 50, size=5)
+        spans = list(zip(starts, starts + rng.randint(0, 30, size=5)))
+        owners = -np.ones(80, dtype=int)
+        for i, (start, stop) in enumerate(spans):
+            owners[start:stop] = i
+        final = -np.ones(80, dtype=int)
+        for i, ranges in enumerate(scaper.core._final_spans(spans)):
+            for start, stop in ranges:
+                assert (final[start:stop] == -1).all()
+                final[start:stop] = i
+        assert (final == owners).all()
+
+
+def test_generate_event_audio_format():
+    sc = _create_scaper_with_random_seed(0)
+    jam = sc._instantiate(disable_instantiation_warnings=True)
+    ann = jam.annotations.search(namespace='scaper')[0]
+
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        for peak_normalization in [False, True]:
+            dense_path = os.path.join(tmpdir, 'dense.wav')
+            sc.event_audio_format = 'dense'
+            audio, event_audio_list, scale_factor, _ = sc._generate_audio(
+                dense_path, ann, peak_normalization=peak_normalization,
+                save_isolated_events=True)
+            assert len(event_audio_list) == len(ann.data)
+            for event_audio in event_audio_list:
+                assert event_audio.shape == audio.shape
+
+            # without the isolated events, the mixture is the same and the
+            # events are only materialized to be saved
+            mix_path = os.path.join(tmpdir, 'mix.wav')
+            sc.event_audio_format = None
+            audio2, event_audio_list2, scale_factor2, _ = sc._generate_audio(
+                mix_path, ann, peak_normalization=peak_normalization,
+                save_isolated_events=True)
+            assert event_audio_list2 is None
+            assert scale_factor2 == scale_factor
+            assert np.array_equal(audio, audio2)
+            for event_file in ann.sandbox.scaper.isolated_events_audio_path:
+                dense_file = event_file.replace('mix_events', 'dense_events')
+                assert np.array_equal(soundfile.read(event_file)[0],
+                                      soundfile.read(dense_file)[0])
+
+            # sparse isolated events only store the samples of each event
+            sc.event_audio_format = 'sparse'
+            audio3, event_audio_list3, _, _ = sc._generate_audio(
+                None, ann, peak_normalization=peak_normalization)
+            assert np.array_equal(audio, audio3)
+            for event_audio, sparse_event_audio in zip(event_audio_list,
+                                                       event_audio_list3):
+                assert isinstance(sparse_event_audio, scaper.audio.EventAudio)
+                assert sparse_event_audio.scale == scale_factor
+                assert np.array_equal(event_audio,
+                                      sparse_event_audio.to_dense())
+
+    sc.event_audio_format = 'invalid'
+    pytest.raises(ScaperError, sc._generate_audio, None, ann)
+
+
+def test_generate_dtype():
+    sc = _create_scaper_with_random_seed(0)
+    jam = sc._instantiate(disable_instantiation_warnings=True)
+    ann = jam.annotations.search(namespace='scaper')[0]
+
+    audio, event_audio_list, _, _ = sc._generate_audio(None, ann)
+    assert audio.dtype == np.float64
+
+    for event_audio_format in ['dense', 'sparse']:
+        sc.dtype = 'float32'
+        sc.event_audio_format = event_audio_format
+        audio32, event_audio_list32, _, _ = sc._generate_audio(
+            None, ann, peak_normalization=True)
+        assert audio32.dtype == np.float32
+        assert np.allclose(audio32, audio / np.max(np.abs(audio)), atol=1e-4)
+        for event_audio32 in event_audio_list32:
+            assert event_audio32.dtype == np.float32
+            assert np.asarray(event_audio32).dtype == np.float32
+
+    # cached sources are converted once per dtype
+    sc.audio_cache = scaper.audio.SourceAudioCache()
+    sc.event_audio_format = 'dense'
+    audio32, _, _, _ = sc._generate_audio(None, ann)
+    assert audio32.dtype == np.float32
+    for source in sc.audio_cache._entries.values():
+        assert source.dtype == np.float32
+    sc.dtype = 'float64'
+    audio64, _, _, _ = sc._generate_audio(None, ann)
+    assert audio64.dtype == np.float64
+    assert np.allclose(audio32, audio64, atol=1e-4)
+
+    sc.dtype = 'int16'
+    pytest.raises(ScaperError, sc._generate_audio, None, ann)
+
+
+def test_generate_batch():
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _read_batch(paths):
+        batch = []
+        for audio_path, jams_path, txt_path in paths:
+            audio, _ = soundfile.read(audio_path)
+            jam = jams.load(jams_path)
+            ann = jam.annotations.search(namespace='scaper')[0]
+            with open(txt_path) as f:
+                txt = f.read()
+            batch.append((audio, ann.data, txt))
+        return batch
+
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        batches = []
+        for i, (n_jobs, executor, writer) in enumerate(
+                [(1, None, None), (2, None, None),
+                 (None, ThreadPoolExecutor(3), None),
+                 (1, None, scaper.AsyncWriter(2, max_pending=3)),
+                 (None, ThreadPoolExecutor(3), scaper.AsyncWriter())]):
+            sc = _create_scaper_with_random_seed(0)
+            out_dir = os.path.join(tmpdir, str(i))
+            paths = sc.generate_batch(
+                4, out_dir, n_jobs=n_jobs, executor=executor, writer=writer,
+                filename_template='item_{index:03d}',
+                disable_instantiation_warnings=True)
+            assert [os.path.basename(p[0]) for p in paths] == [
+                'item_000.wav', 'item_001.wav', 'item_002.wav', 'item_003.wav']
+            batches.append(_read_batch(paths))
+            # all the items are recorded, no temporary file is left
+            with open(os.path.join(
+                    out_dir, '.scaper_batch.0-of-1.jsonl')) as f:
+                assert len(f.readlines()) == 4
+            assert not [name for name in os.listdir(out_dir)
+                        if name.startswith('.tmp')]
+            if writer is not None:
+                writer.close()
+
+        # soundscapes don't depend on the number of workers, and differ from
+        # each other
+        for batch in batches[1:]:
+            for (audio, data, txt), (ref_audio, ref_data, ref_txt) in zip(
+                    batch, batches[0]):
+                assert np.array_equal(audio, ref_audio)
+                assert data == ref_data
+                assert txt == ref_txt
+        assert batches[0][0][1] != batches[0][1][1]
+
+        # an explicit seed gives the same batch whatever the random state
+        sc = _create_scaper_with_random_seed(1)
+        paths = sc.generate_batch(2, os.path.join(tmpdir, 'a'), n_jobs=1,
+                                  seed=123, save_txt=False,
+                                  disable_instantiation_warnings=True)
+        assert paths[0][2] is None
+        sc = _create_scaper_with_random_seed(2)
+        # counts computed with numpy are accepted
+        paths2 = sc.generate_batch(np.int64(2), os.path.join(tmpdir, 'b'),
+                                   n_jobs=1, seed=123, save_txt=False,
+                                   disable_instantiation_warnings=True)
+        assert len(paths2) == 2
+        for path, path2 in zip(paths, paths2):
+            assert np.array_equal(soundfile.read(path[0])[0],
+                                  soundfile.read(path2[0])[0])
+
+        sc = _create_scaper_with_random_seed(0)
+        pytest.raises(ScaperError, sc.generate_batch, 2, tmpdir,
+                      filename_template='soundscape')
+        pytest.raises(ScaperError, sc.generate_batch, 2, tmpdir,
+                      jams_path='soundscape.jams')
+        pytest.raises(ScaperError, sc.generate_batch, -1, tmpdir)
+        pytest.raises(ScaperError, sc.generate_batch, 2.0, tmpdir)
+        with scaper.AsyncWriter() as writer:
+            pytest.raises(ScaperError, sc.generate_batch, 2, tmpdir,
+                          n_jobs=2, writer=writer)
+
+
+def test_iter_soundscapes():
+    from concurrent.futures import ThreadPoolExecutor
+
+    class _CountingExecutor(ThreadPoolExecutor):
+        n_submitted = 0
+
+        def submit(self, *args, **kwargs):
+            self.n_submitted += 1
+            return super(_CountingExecutor, self).submit(*args, **kwargs)
+
+    streams = []
+    for n_workers, executor in [(1, None), (2, None),
+                                (None, ThreadPoolExecutor(2))]:
+        sc = _create_scaper_with_random_seed(0)
+        streams.append(list(sc.iter_soundscapes(
+            3, n_workers=n_workers, executor=executor,
+            disable_instantiation_warnings=True)))
+
+    # soundscapes don't depend on the number of workers, and differ from
+    # each other
+    for stream in streams:
+        assert len(stream) == 3
+        for (audio, jam, ann_list, event_audio), \
+                (ref_audio, ref_jam, ref_ann_list, ref_event_audio) in zip(
+                    stream, streams[0]):
+            assert np.array_equal(audio, ref_audio)
+            assert jam.annotations[0].data == ref_jam.annotations[0].data
+            assert ann_list == ref_ann_list
+            assert len(event_audio) == len(ref_event_audio)
+    assert not np.array_equal(streams[0][0][0], streams[0][1][0])
+
+    # same soundscapes as generate_batch with the same seed
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        sc = _create_scaper_with_random_seed(0)
+        paths = sc.generate_batch(2, tmpdir, n_jobs=1, seed=5,
+                                  disable_instantiation_warnings=True)
+        stream = sc.iter_soundscapes(np.int64(2), n_workers=1, seed=5,
+                                     disable_instantiation_warnings=True)
+        for (audio_path, _, _), (audio, _, _, _) in zip(paths, stream):
+            saved_audio, _ = soundfile.read(audio_path, always_2d=True)
+            assert np.allclose(saved_audio, audio, atol=1e-6)
+
+    # infinite streams with backpressure: no more than prefetch soundscapes
+    # are generated ahead of the consumer
+    with _CountingExecutor(2) as executor:
+        sc = _create_scaper_with_random_seed(0)
+        stream = sc.iter_soundscapes(prefetch=np.int64(2), executor=executor,
+                                     disable_instantiation_warnings=True)
+        for i, outputs in enumerate(stream):
+            assert len(outputs) == 4
+            assert executor.n_submitted <= i + 3
+            if i == 4:
+                break
+        stream.close()
+        assert executor.n_submitted <= 7
+
+    sc = _create_scaper_with_random_seed(0)
+    pytest.raises(ScaperError, sc.iter_soundscapes, -1)
+    pytest.raises(ScaperError, sc.iter_soundscapes, 2.0)
+    pytest.raises(ScaperError, sc.iter_soundscapes, 2, prefetch=0)
+    pytest.raises(ScaperError, sc.iter_soundscapes, 2,
+                  audio_path='soundscape.wav')
+
+
+def test_iter_soundscapes_ring():
+    from concurrent.futures import ThreadPoolExecutor
+    sc = _create_scaper_with_random_seed(0)
+    reference = list(sc.iter_soundscapes(
+        3, n_workers=1, seed=0, disable_instantiation_warnings=True))
+
+    n_samples = int(sc.duration * sc.sr)
+    with scaper.SharedAudioRing(3, n_samples, n_stems=5) as ring:
+        for n_workers, executor in [(1, None), (2, None),
+                                    (None, ThreadPoolExecutor(2))]:
+            stream = sc.iter_soundscapes(
+                3, n_workers=n_workers, executor=executor, seed=0, ring=ring,
+                disable_instantiation_warnings=True)
+            for (audio, jam, ann_list, event_audio), \
+                    (ref_audio, ref_jam, _, ref_event_audio) in zip(
+                        stream, reference):
+                # same soundscapes, as views of the ring
+                assert not audio.flags.owndata
+                assert np.array_equal(audio, ref_audio)
+                assert jam.annotations[0].data == \
+                    ref_jam.annotations[0].data
+                assert len(event_audio) == len(ref_event_audio)
+                for stem, ref_stem in zip(event_audio, ref_event_audio):
+                    assert np.allclose(stem, ref_stem)
+                ring.release(audio)
+            assert ring.n_free == 3
+
+        # generation fails if the consumer holds all the slots, and the
+        # slots of cancelled soundscapes are released
+        stream = sc.iter_soundscapes(
+            n_workers=None, executor=ThreadPoolExecutor(2), seed=0,
+            ring=ring, disable_instantiation_warnings=True)
+        held = [next(stream)[0] for _ in range(3)]
+        pytest.raises(ScaperError, next, stream)
+        for audio in held:
+            ring.release(audio)
+        executor = ThreadPoolExecutor(2)
+        stream = sc.iter_soundscapes(executor=executor, ring=ring,
+                                     disable_instantiation_warnings=True)
+        ring.release(next(stream)[0])
+        stream.close()
+        executor.shutdown()
+        assert ring.n_free == 3
+
+        # isolated events aren't returned without stems
+        with scaper.SharedAudioRing(1, n_samples) as mix_ring:
+            _, _, _, event_audio = next(sc.iter_soundscapes(
+                n_workers=1, ring=mix_ring,
+                disable_instantiation_warnings=True))
+            assert event_audio is None
+
+    for ring in [scaper.SharedAudioRing(1, n_samples - 1),
+                 scaper.SharedAudioRing(1, n_samples, n_channels=2),
+                 scaper.SharedAudioRing(1, n_samples, dtype='float32')]:
+        with ring:
+            pytest.raises(ScaperError, sc.iter_soundscapes, 2, ring=ring)
+
+
+class _PickleCounter(object):
+    n_pickled = 0
+
+    def __getstate__(self):
+        _PickleCounter.n_pickled += 1
+        return {}
+
+
+def test_batch_sends_scaper_once_per_worker():
+    # the Scaper object is sent to every worker process once, not with every
+    # soundscape
+    sc = _create_scaper_with_random_seed(0)
+    sc.pickle_counter = _PickleCounter()
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        _PickleCounter.n_pickled = 0
+        paths = sc.generate_batch(6, tmpdir, n_jobs=2, seed=0,
+                                  disable_instantiation_warnings=True)
+        assert len(paths) == 6
+        assert _PickleCounter.n_pickled <= 2
+
+    _PickleCounter.n_pickled = 0
+    soundscapes = list(sc.iter_soundscapes(
+        n=6, n_workers=2, seed=0, disable_instantiation_warnings=True))
+    assert len(soundscapes) == 6
+    assert _PickleCounter.n_pickled <= 2
+
+
+def _generate_shard(out_dir, shard_index, num_shards):
+    sc = _create_scaper_with_random_seed(0)
+    return sc.generate_batch(5, out_dir, n_jobs=1, seed=0,
+                             shard_index=shard_index, num_shards=num_shards,
+                             save_isolated_events=True,
+                             disable_instantiation_warnings=True)
+
+
+def test_generate_batch_shards():
+    from concurrent.futures import ProcessPoolExecutor
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        full_dir = os.path.join(tmpdir, 'full')
+        full_paths = _generate_shard(full_dir, 0, 1)
+        assert len(full_paths) == 5
+
+        # shards run in separate processes against the same folder
+        sharded_dir = os.path.join(tmpdir, 'sharded')
+        with ProcessPoolExecutor(2) as executor:
+            futures = [executor.submit(_generate_shard, sharded_dir, i, 2)
+                       for i in range(2)]
+            shard_paths = [future.result() for future in futures]
+        assert [len(paths) for paths in shard_paths] == [3, 2]
+        assert sorted(os.path.basename(p[0]) for paths in shard_paths
+                      for p in paths) == \
+            sorted(os.path.basename(p[0]) for p in full_paths)
+
+        for audio_path, jams_path, txt_path in full_paths:
+            sharded_audio_path = audio_path.replace(full_dir, sharded_dir)
+            assert np.array_equal(soundfile.read(audio_path)[0],
+                                  soundfile.read(sharded_audio_path)[0])
+            ann = jams.load(jams_path.replace(full_dir, sharded_dir)).search(
+                namespace='scaper')[0]
+            assert ann.data == jams.load(jams_path).search(
+                namespace='scaper')[0].data
+            # annotations point to the final files
+            assert ann.sandbox.scaper['audio_path'] == sharded_audio_path
+            for event_path in \
+                    ann.sandbox.scaper['isolated_events_audio_path']:
+                assert os.path.isfile(event_path)
+        assert not [f for f in os.listdir(sharded_dir) if f.startswith('.tmp')]
+
+        manifests = sorted(f for f in os.listdir(sharded_dir)
+                           if f.startswith('.scaper_batch'))
+        assert manifests == ['.scaper_batch.0-of-2.jsonl',
+                             '.scaper_batch.1-of-2.jsonl']
+
+        # a rerun only generates the soundscapes missing from the manifests
+        manifest_path = os.path.join(sharded_dir, manifests[0])
+        with open(manifest_path) as f:
+            lines = f.readlines()
+        with open(manifest_path, 'w') as f:
+            f.writelines(lines[:-1])
+            # incomplete line of an interrupted process
+            f.write('{"index": 4, "entr')
+        mtime = os.path.getmtime(full_paths[0][0].replace(full_dir,
+                                                          sharded_dir))
+        assert _generate_shard(sharded_dir, 0, 2) == \
+            [shard_paths[0][-1]]
+        assert os.path.getmtime(
+            full_paths[0][0].replace(full_dir, sharded_dir)) == mtime
+        assert _generate_shard(sharded_dir, 0, 2) == []
+        assert _generate_shard(sharded_dir, np.int64(1), np.int64(2)) == []
+
+        # resuming with a different seed is not allowed
+        sc = _create_scaper_with_random_seed(0)
+        pytest.raises(ScaperError, sc.generate_batch, 5, sharded_dir,
+                      n_jobs=1, seed=1)
+        pytest.raises(ScaperError, sc.generate_batch, 5, sharded_dir,
+                      shard_index=2, num_shards=2)
+
+
 def _compare_generators(generators, atol=1e-4, rtol=1e-8):
     tmpfiles = []
     with _close_temp_files(tmpfiles):
@@ -1689,6 +2377,253 @@ def _compare_generators(generators, atol=1e-4, rtol=1e-8):
             assert (t[:, 2] == regtxt_data[:, 2]).all()
 
 
+def test_generate_streamed():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        for seed in range(3):
+            sc = _create_scaper_with_random_seed(seed)
+            audio, jam, ann_list, _ = sc.generate(
+                disable_instantiation_warnings=True)
+
+            # same soundscape as generate, whatever the block duration
+            for block_duration in [10.0, 1.0, 0.37]:
+                sc = _create_scaper_with_random_seed(seed)
+                audio_path = os.path.join(tmpdir, 'streamed.wav')
+                jams_path = os.path.join(tmpdir, 'streamed.jams')
+                txt_path = os.path.join(tmpdir, 'streamed.txt')
+                streamed_jam, streamed_ann_list = sc.generate_streamed(
+                    audio_path, jams_path=jams_path, txt_path=txt_path,
+                    block_duration=block_duration,
+                    disable_instantiation_warnings=True)
+                assert streamed_jam.annotations[0].data == \
+                    jam.annotations[0].data
+                assert streamed_ann_list == ann_list
+
+                streamed_audio, sr = soundfile.read(
+                    audio_path, always_2d=True)
+                assert sr == sc.sr
+                assert streamed_audio.shape == audio.shape
+                assert np.allclose(streamed_audio, np.clip(audio, -1, 1),
+                                   atol=1e-6)
+
+                saved_jam = jams.load(jams_path)
+                sandbox = saved_jam.annotations[0].sandbox.scaper
+                assert sandbox['audio_path'] == audio_path
+                assert sandbox['ref_db_generated'] == sc.ref_db
+                assert os.path.isfile(txt_path)
+
+        # sources in the format of the soundscape are read block by block,
+        # other backgrounds are converted once, trimmed as in generate
+        audio_path = os.path.join(tmpdir, 'streamed.wav')
+        for sr in [44100, 22050]:
+            sc = _create_scaper_with_random_seed(0)
+            sc.sr = sr
+            audio, _, _, _ = sc.generate(disable_instantiation_warnings=True)
+            sc = _create_scaper_with_random_seed(0)
+            sc.sr = sr
+            convert = sc._convert_source_audio
+            converted = []
+
+            def _convert(source_file, role, start=0, stop=None):
+                converted.append((start, stop))
+                return convert(source_file, role, start=start, stop=stop)
+
+            sc._convert_source_audio = _convert
+            sc.generate_streamed(audio_path, block_duration=1.0,
+                                 disable_instantiation_warnings=True)
+            streamed_audio, _ = soundfile.read(audio_path, always_2d=True)
+            assert np.allclose(streamed_audio, np.clip(audio, -1, 1),
+                               atol=1e-6)
+            if sr == 44100:
+                assert converted == []
+            else:
+                assert len(converted) == 1
+                assert converted[0][1] is not None
+
+        # no events: warning and no audio
+        sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH)
+        audio_path = os.path.join(tmpdir, 'silent.wav')
+        pytest.warns(ScaperWarning, sc.generate_streamed, audio_path)
+        assert not os.path.exists(audio_path)
+
+        sc = _create_scaper_with_random_seed(0)
+        pytest.raises(ScaperError, sc.generate_streamed, audio_path,
+                      block_duration=0)
+
+
+def test_iter_blocks():
+    sc = _create_scaper_with_random_seed(0)
+    reference = [sc.generate(disable_instantiation_warnings=True)
+                 for _ in range(2)]
+
+    # the stream is the concatenation of the soundscapes generate returns
+    sc = _create_scaper_with_random_seed(0)
+    blocks = list(sc.iter_blocks(
+        block_duration=0.37, n=np.int64(2), prefetch=np.int64(1),
+        disable_instantiation_warnings=True))
+    block_samples = int(0.37 * sc.sr)
+    n_samples = int(sc.duration * sc.sr)
+    assert all(block.shape == (block_samples, 1) for block, _ in blocks)
+    assert len(blocks) == -(-2 * n_samples // block_samples)
+    audio = np.concatenate([block for block, _ in blocks])
+    for i, (ref_audio, ref_jam, _, _) in enumerate(reference):
+        assert np.allclose(audio[i * n_samples:(i + 1) * n_samples],
+                           ref_audio, atol=1e-6)
+    assert not np.any(audio[2 * n_samples:])
+
+    # events start and stop in the blocks where their audio does
+    for i, (block, events) in enumerate(blocks):
+        for event in events:
+            sample = int(round(event.time * sc.sr))
+            if event.kind == 'start':
+                assert i * block_samples <= sample < (i + 1) * block_samples
+            else:
+                assert i * block_samples < sample <= (i + 1) * block_samples
+    events = [event for _, block_events in blocks for event in block_events]
+    for i, (_, ref_jam, _, _) in enumerate(reference):
+        for kind, field in [('start', 'time'), ('stop', None)]:
+            times = sorted(
+                event.time - i * sc.duration for event in events
+                if event.kind == kind and event.soundscape == i)
+            ref_times = sorted(
+                obs.time if field else min(obs.time + obs.duration,
+                                           sc.duration)
+                for obs in ref_jam.annotations[0].data)
+            assert np.allclose(times, ref_times, atol=1e-3)
+        labels = sorted(event.label for event in events
+                        if event.kind == 'start' and event.soundscape == i)
+        assert labels == sorted(obs.value['label']
+                                for obs in ref_jam.annotations[0].data)
+
+    # raw PCM written to a file descriptor
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        for subtype, dtype in [('PCM_16', np.int16), ('FLOAT', np.float32)]:
+            pcm_path = os.path.join(tmpdir, 'stream.pcm')
+            fd = os.open(pcm_path, os.O_WRONLY | os.O_CREAT)
+            sc = _create_scaper_with_random_seed(0)
+            blocks = list(sc.iter_blocks(
+                block_duration=1.0, n=1, output=fd, subtype=subtype,
+                disable_instantiation_warnings=True))
+            os.close(fd)
+            pcm = np.fromfile(pcm_path, dtype=dtype)
+            audio = np.concatenate([block for block, _ in blocks])[:, 0]
+            if dtype == np.int16:
+                pcm = pcm / 32767.0
+                audio = np.clip(audio, -1, 1)
+            assert np.allclose(pcm, audio, atol=1e-4)
+
+    # infinite streams, paced to real time
+    sc = _create_scaper_with_random_seed(0)
+    stream = sc.iter_blocks(block_duration=0.05, realtime=True,
+                            disable_instantiation_warnings=True)
+    start_time = time.time()
+    level = logging.getLogger().level
+    for i, (block, _) in enumerate(stream):
+        # sox messages are only ignored in the prefetch thread
+        assert logging.getLogger().level == level
+        if i == 3:
+            break
+    stream.close()
+    assert time.time() - start_time >= 0.2
+
+    sc = _create_scaper_with_random_seed(0)
+    pytest.raises(ScaperError, sc.iter_blocks, block_duration=0)
+    pytest.raises(ScaperError, sc.iter_blocks, n=-1)
+    pytest.raises(ScaperError, sc.iter_blocks, n=1.0)
+    pytest.raises(ScaperError, sc.iter_blocks, prefetch=0)
+    pytest.raises(ScaperError, sc.iter_blocks, subtype='PCM_24')
+
+
+def test_generate_audio_format():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        sc = _create_scaper_with_random_seed(0)
+        audio, jam, _, _ = sc.generate(fix_clipping=True,
+                                       disable_instantiation_warnings=True)
+        jams_path = os.path.join(tmpdir, 'soundscape.jams')
+        jam.save(jams_path)
+
+        for filename, audio_format, audio_subtype, ref_format, ref_subtype, \
+                atol in [
+                    ('a.wav', None, None, 'WAV', 'PCM_32', 1e-8),
+                    ('b.wav', None, 'PCM_16', 'WAV', 'PCM_16', 1e-4),
+                    ('c.wav', None, 'FLOAT', 'WAV', 'FLOAT', 1e-6),
+                    ('d.flac', None, None, 'FLAC', 'PCM_16', 1e-4),
+                    ('e.flac', None, 'PCM_24', 'FLAC', 'PCM_24', 1e-6),
+                    ('f.audio', 'flac', None, 'FLAC', 'PCM_16', 1e-4)]:
+            audio_path = os.path.join(tmpdir, filename)
+            sc = _create_scaper_with_random_seed(0)
+            sc.generate(audio_path, fix_clipping=True,
+                        save_isolated_events=True, audio_format=audio_format,
+                        audio_subtype=audio_subtype,
+                        disable_instantiation_warnings=True)
+            generated_paths = [audio_path] + [
+                os.path.join(tmpdir, filename.split('.')[0] + '_events', name)
+                for name in os.listdir(os.path.join(
+                    tmpdir, filename.split('.')[0] + '_events'))]
+            for path in generated_paths:
+                info = soundfile.info(path)
+                assert (info.format, info.subtype) == (ref_format,
+                                                       ref_subtype)
+            saved_audio, _ = soundfile.read(audio_path, always_2d=True)
+            assert np.allclose(saved_audio, audio, atol=atol)
+
+            # same files from generate_from_jams, encoded in parallel
+            with scaper.AsyncWriter(n_threads=4) as writer:
+                out_path = os.path.join(tmpdir, 'from_jams_' + filename)
+                scaper.generate_from_jams(
+                    jams_path, out_path, save_isolated_events=True,
+                    audio_format=audio_format, audio_subtype=audio_subtype,
+                    writer=writer)
+                assert not writer.pending()
+            info = soundfile.info(out_path)
+            assert (info.format, info.subtype) == (ref_format, ref_subtype)
+            assert np.array_equal(soundfile.read(out_path)[0],
+                                  soundfile.read(audio_path)[0])
+
+        # streamed soundscapes and batches
+        sc = _create_scaper_with_random_seed(0)
+        audio_path = os.path.join(tmpdir, 'streamed.flac')
+        sc.generate_streamed(audio_path, audio_subtype='PCM_24',
+                             disable_instantiation_warnings=True)
+        info = soundfile.info(audio_path)
+        assert (info.format, info.subtype) == ('FLAC', 'PCM_24')
+
+        sc = _create_scaper_with_random_seed(0)
+        paths = sc.generate_batch(2, os.path.join(tmpdir, 'batch'), n_jobs=1,
+                                  audio_format='FLAC',
+                                  disable_instantiation_warnings=True)
+        for audio_path, _, _ in paths:
+            assert audio_path.endswith('.flac')
+            assert soundfile.info(audio_path).format == 'FLAC'
+
+        sc = _create_scaper_with_random_seed(0)
+        for kwargs in [dict(audio_path=os.path.join(tmpdir, 'g.audio')),
+                       dict(audio_path=os.path.join(tmpdir, 'g.wav'),
+                            audio_format='MP5'),
+                       dict(audio_path=os.path.join(tmpdir, 'g.flac'),
+                            audio_subtype='PCM_32')]:
+            pytest.raises(ScaperError, sc.generate,
+                          disable_instantiation_warnings=True, **kwargs)
+            assert not os.path.exists(kwargs['audio_path'])
+
+
+def test_trim_audio_format():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        audio_path = os.path.join(tmpdir, 'soundscape.wav')
+        jams_path = os.path.join(tmpdir, 'soundscape.jams')
+        sc = _create_scaper_with_random_seed(0)
+        sc.generate(audio_path, jams_path, disable_instantiation_warnings=True)
+
+        trim_path = os.path.join(tmpdir, 'trimmed.flac')
+        scaper.trim(audio_path, jams_path, trim_path, None, 2, 7,
+                    audio_subtype='PCM_24')
+        info = soundfile.info(trim_path)
+        assert (info.format, info.subtype) == ('FLAC', 'PCM_24')
+        assert np.isclose(info.duration, 5)
+
+        pytest.raises(ScaperError, scaper.trim, audio_path, jams_path,
+                      trim_path, None, 2, 7, audio_subtype='PCM_32')
+
+
 def _create_scaper_with_random_seed(seed):
     sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH, random_state=deepcopy(seed))
     sc.ref_db = -50
@@ -1734,6 +2669,23 @@ def _create_scaper_with_random_seed(seed):
     return sc
 
 
+def test_generate_silent():
+    # soundscape with no events: no audio and no isolated events
+    sc = scaper.Scaper(10.0, fg_path=FG_PATH, bg_path=BG_PATH)
+    for event_audio_format in ['dense', 'sparse']:
+        sc.event_audio_format = event_audio_format
+        with pytest.warns(ScaperWarning):
+            audio, _, annotation_list, event_audio_list = sc.generate(
+                None, None)
+        assert audio is None
+        assert annotation_list == []
+        assert event_audio_list == []
+    sc.event_audio_format = None
+    with pytest.warns(ScaperWarning):
+        _, _, _, event_audio_list = sc.generate(None, None)
+    assert event_audio_list is None
+
+
 def test_generate_audio():
     for sr in SAMPLE_RATES:
         for n_ch in range(1, 3):
@@ -0,0 +1,305 @@
+'''
+Tests for functions in corpus.py and cli.py
+'''
+
+from scaper.corpus import pack_corpus, PackedCorpus, _as_packed_corpus
+from scaper.corpus import prepare_corpus, _read_prepared_manifest
+from scaper.corpus import PREPARED_MANIFEST
+from scaper.catalog import SourceCatalog
+from scaper.cli import main
+from scaper.util import _get_sorted_files
+from scaper.scaper_exceptions import ScaperError
+import scaper
+import backports.tempfile
+import json
+import numpy as np
+import os
+import pickle
+import pytest
+import shutil
+import soundfile
+
+
+# FIXTURES
+FG_PATH = 'tests/data/audio/foreground'
+BG_PATH = 'tests/data/audio/background'
+
+
+def test_pack_corpus():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        pack_path = os.path.join(tmpdir, 'pack')
+        corpus = pack_corpus(FG_PATH, BG_PATH, pack_path)
+        assert isinstance(corpus, PackedCorpus)
+        assert isinstance(corpus, SourceCatalog)
+        assert corpus.fg_labels == sorted(os.listdir(FG_PATH))
+        assert corpus.bg_labels == sorted(os.listdir(BG_PATH))
+
+        catalog = SourceCatalog()
+        for root, labels in [(FG_PATH, corpus.fg_labels),
+                             (BG_PATH, corpus.bg_labels)]:
+            for label in labels:
+                folder = os.path.join(root, label)
+                assert corpus.files(folder) == _get_sorted_files(folder)
+                for source_file in corpus.files(folder):
+                    assert source_file in corpus
+                    assert corpus.info(source_file) == \
+                        catalog.info(source_file)
+
+                    # reads are views of the data file
+                    audio, _ = soundfile.read(
+                        source_file, always_2d=True, dtype='float32')
+                    packed = corpus.read(source_file)
+                    assert not packed.flags.owndata
+                    assert np.array_equal(packed, audio)
+                    assert np.array_equal(
+                        corpus.read(source_file, 100, 200), audio[100:200])
+                    assert corpus.read(
+                        source_file, dtype='float64').dtype == np.float64
+
+        # files that aren't packed are read from disk
+        assert '/path/to/file.wav' not in corpus
+
+        # reopened packs and pickled copies are equivalent
+        source_file = corpus.files(os.path.join(FG_PATH, 'car_horn'))[0]
+        for other in [PackedCorpus(pack_path),
+                      pickle.loads(pickle.dumps(corpus))]:
+            assert other.fg_labels == corpus.fg_labels
+            assert np.array_equal(other.read(source_file),
+                                  corpus.read(source_file))
+
+        # int16 packs are converted to float on read
+        corpus16 = pack_corpus(FG_PATH, BG_PATH,
+                               os.path.join(tmpdir, 'pack16'), dtype='int16')
+        audio, _ = soundfile.read(source_file, always_2d=True)
+        assert corpus16.read(source_file).dtype == np.float32
+        assert np.allclose(corpus16.read(source_file), audio, atol=1e-4)
+
+        assert _as_packed_corpus(pack_path).path == pack_path
+        assert _as_packed_corpus(corpus) is corpus
+        assert _as_packed_corpus(FG_PATH) is None
+
+        # packed files keep the metadata of the pack if the originals change
+        fg_path = os.path.join(tmpdir, 'foreground')
+        shutil.copytree(FG_PATH, fg_path)
+        corpus = pack_corpus(fg_path, BG_PATH, os.path.join(tmpdir, 'copy'))
+        source_file = corpus.files(os.path.join(fg_path, 'car_horn'))[0]
+        info = corpus.info(source_file)
+        soundfile.write(source_file, np.zeros((100, 2)), 16000)
+        mtime = os.stat(source_file).st_mtime + 10
+        os.utime(source_file, (mtime, mtime))
+        assert corpus.info(source_file) == info
+        assert corpus.read(source_file).shape == (info.frames, info.channels)
+
+        # invalid packs
+        pytest.raises(ScaperError, pack_corpus, FG_PATH, BG_PATH,
+                      os.path.join(tmpdir, 'pack8'), dtype='int8')
+        pytest.raises(ScaperError, PackedCorpus, FG_PATH)
+
+
+def test_scaper_packed_corpus():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        pack_path = os.path.join(tmpdir, 'pack')
+        corpus = pack_corpus(FG_PATH, BG_PATH, pack_path)
+
+        for fg, bg in [(corpus, corpus), (pack_path, pack_path),
+                       (corpus, BG_PATH)]:
+            sc = scaper.Scaper(10.0, fg, bg)
+            ref = scaper.Scaper(10.0, FG_PATH, BG_PATH)
+            assert sc.fg_path == ref.fg_path
+            assert sc.bg_path == ref.bg_path
+            assert sc.fg_labels == ref.fg_labels
+            assert sc.bg_labels == ref.bg_labels
+            assert isinstance(sc.catalog, PackedCorpus)
+
+        # same instantiation as with the source folders
+        jams = []
+        for fg, bg in [(corpus, corpus), (FG_PATH, BG_PATH)]:
+            sc = scaper.Scaper(10.0, fg, bg, random_state=0)
+            sc.add_background(('choose', []), ('choose', []), ('const', 0))
+            sc.add_event(('choose', []), ('choose', []), ('uniform', 0, 1),
+                         ('uniform', 0, 9), ('uniform', 0.5, 1),
+                         ('uniform', -5, 5), None, None)
+            jams.append(sc._instantiate(disable_instantiation_warnings=True))
+        assert jams[0] == jams[1]
+
+        # soundscapes generated from the source folders can be regenerated
+        # from the pack
+        jams_file = os.path.join(tmpdir, 'soundscape.jams')
+        audio, jam, _, _ = sc.generate(
+            jams_path=jams_file, disable_instantiation_warnings=True)
+        packed_audio, packed_jam, _, _ = scaper.generate_from_jams(
+            jams_file, fg_path=pack_path, bg_path=corpus)
+        assert np.allclose(audio, packed_audio, atol=1e-4)
+        ann = jam.annotations.search(namespace='scaper')[0]
+        packed_ann = packed_jam.annotations.search(namespace='scaper')[0]
+        assert ann.data == packed_ann.data
+        assert packed_ann.sandbox.scaper['fg_path'] == sc.fg_path
+
+        # a separate catalog or different packs are not allowed
+        pytest.raises(ScaperError, scaper.Scaper, 10.0, corpus, corpus,
+                      catalog=SourceCatalog())
+        other = pack_corpus(FG_PATH, BG_PATH, os.path.join(tmpdir, 'other'))
+        pytest.raises(ScaperError, scaper.Scaper, 10.0, corpus, other)
+
+
+def test_cli_pack():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        pack_path = os.path.join(tmpdir, 'pack')
+        assert main(['pack', FG_PATH, BG_PATH, pack_path,
+                     '--dtype', 'int16']) == 0
+        corpus = PackedCorpus(pack_path)
+        assert corpus.dtype == 'int16'
+        assert corpus.fg_labels == sorted(os.listdir(FG_PATH))
+
+        assert main(['pack', '/path/to/invalid/folder', BG_PATH,
+                     pack_path]) == 1
+
+
+def test_prepare_corpus():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        fg_path = os.path.join(tmpdir, 'foreground')
+        shutil.copytree(FG_PATH, fg_path)
+        # not an audio file: copied as is
+        with open(os.path.join(fg_path, 'car_horn', 'notes.txt'), 'w') as f:
+            f.write('not audio')
+
+        out_path = os.path.join(tmpdir, 'prepared')
+        prepared_fg_path, prepared_bg_path = prepare_corpus(
+            fg_path, BG_PATH, out_path, 22050, 2, n_jobs=1)
+        assert prepared_fg_path == os.path.join(out_path, 'foreground')
+        assert prepared_bg_path == os.path.join(out_path, 'background')
+
+        for root, prepared_root in [(fg_path, prepared_fg_path),
+                                    (BG_PATH, prepared_bg_path)]:
+            assert sorted(os.listdir(root)) == sorted(
+                x for x in os.listdir(prepared_root) if x[0] != '.')
+            for label in os.listdir(root):
+                files = _get_sorted_files(os.path.join(root, label))
+                prepared_files = _get_sorted_files(
+                    os.path.join(prepared_root, label))
+                assert [os.path.basename(x) for x in files] == \
+                    [os.path.basename(x) for x in prepared_files]
+                for source_file in prepared_files:
+                    if source_file.endswith('.txt'):
+                        continue
+                    sfinfo = soundfile.info(source_file)
+                    assert sfinfo.samplerate == 22050
+                    assert sfinfo.channels == 2
+
+        assert _read_prepared_manifest(fg_path) is None
+        manifest = _read_prepared_manifest(prepared_fg_path)
+        assert manifest['sr'] == 22050
+        assert manifest['n_channels'] == 2
+
+        # files are only converted again if needed
+        source_file = os.path.join(
+            prepared_fg_path, 'car_horn', '17-CAR-Rolls-Royce-Horn.wav')
+        mtime = os.path.getmtime(source_file)
+        prepare_corpus(fg_path, BG_PATH, out_path, 22050, 2, n_jobs=1)
+        assert os.path.getmtime(source_file) == mtime
+        prepare_corpus(fg_path, BG_PATH, out_path, 16000, 1, n_jobs=1)
+        assert soundfile.info(source_file).samplerate == 16000
+        mtime = os.path.getmtime(source_file)
+
+        # outputs whose source was deleted are removed
+        os.remove(os.path.join(fg_path, 'car_horn', 'notes.txt'))
+        shutil.rmtree(os.path.join(fg_path, 'human_voice'))
+        prepare_corpus(fg_path, BG_PATH, out_path, np.int64(16000),
+                       np.int32(1), n_jobs=1)
+        assert not os.path.exists(
+            os.path.join(prepared_fg_path, 'car_horn', 'notes.txt'))
+        assert not os.path.isdir(
+            os.path.join(prepared_fg_path, 'human_voice'))
+        assert os.path.getmtime(source_file) == mtime
+        manifest = _read_prepared_manifest(prepared_fg_path)
+        assert manifest['sr'] == 16000
+
+        # Scaper skips the conversion of prepared sources
+        sc = scaper.Scaper(10.0, prepared_fg_path, prepared_bg_path)
+        sc.sr = 16000
+        assert sc._is_prepared(source_file, 'foreground')
+        sc.sr = 44100
+        assert not sc._is_prepared(source_file, 'foreground')
+        sc = scaper.Scaper(10.0, FG_PATH, BG_PATH)
+        assert not sc._is_prepared(
+            os.path.join(FG_PATH, 'car_horn', '17-CAR-Rolls-Royce-Horn.wav'),
+            'foreground')
+
+        pytest.raises(ScaperError, prepare_corpus, fg_path, BG_PATH,
+                      out_path, 0, 1)
+        pytest.raises(ScaperError, prepare_corpus, fg_path, BG_PATH,
+                      out_path, 16000, 1.5)
+
+
+def test_prepare_corpus_folders():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        data_path = os.path.join(tmpdir, 'data')
+        fg_path = os.path.join(data_path, 'foreground')
+        bg_path = os.path.join(data_path, 'background')
+        shutil.copytree(FG_PATH, fg_path)
+        shutil.copytree(BG_PATH, bg_path)
+        source_file = os.path.join(
+            fg_path, 'car_horn', '17-CAR-Rolls-Royce-Horn.wav')
+        sfinfo = soundfile.info(source_file)
+
+        # the prepared folders would overwrite the sources
+        for out_path in [data_path, os.path.join(fg_path, 'prepared'),
+                         os.path.join(bg_path, 'car_horn')]:
+            pytest.raises(ScaperError, prepare_corpus, fg_path, bg_path,
+                          out_path, 16000, 1, n_jobs=1)
+        assert soundfile.info(source_file).samplerate == sfinfo.samplerate
+
+        # folders that were not prepared from the sources are left alone
+        out_path = os.path.join(tmpdir, 'out')
+        other_file = os.path.join(out_path, 'foreground', 'other', 'a.txt')
+        os.makedirs(os.path.dirname(other_file))
+        with open(other_file, 'w') as f:
+            f.write('not prepared')
+        pytest.raises(ScaperError, prepare_corpus, fg_path, bg_path,
+                      out_path, 16000, 1, n_jobs=1)
+        assert os.path.isfile(other_file)
+        prepared_fg_path, _ = prepare_corpus(
+            fg_path, bg_path, os.path.join(tmpdir, 'prepared'), 16000, 1,
+            n_jobs=1)
+        pytest.raises(ScaperError, prepare_corpus, bg_path, fg_path,
+                      os.path.join(tmpdir, 'prepared'), 16000, 1, n_jobs=1)
+
+        # an interrupted preparation is not used, but can be resumed
+        manifest = _read_prepared_manifest(prepared_fg_path)
+        manifest['complete'] = False
+        with open(os.path.join(prepared_fg_path, PREPARED_MANIFEST),
+                  'w') as f:
+            json.dump(manifest, f)
+        assert _read_prepared_manifest(prepared_fg_path) is None
+        prepare_corpus(fg_path, bg_path, os.path.join(tmpdir, 'prepared'),
+                       16000, 1, n_jobs=1)
+        assert _read_prepared_manifest(prepared_fg_path)['complete']
+
+
+def test_generate_prepared_corpus():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        prepared_fg_path, prepared_bg_path = prepare_corpus(
+            FG_PATH, BG_PATH, tmpdir, 16000, 1, n_jobs=2)
+
+        sc = scaper.Scaper(10.0, FG_PATH, BG_PATH, random_state=0)
+        sc.sr = 16000
+        sc.add_background(('choose', []), ('choose', []), ('const', 0))
+        sc.add_event(('choose', []), ('choose', []), ('uniform', 0, 1),
+                     ('uniform', 0, 9), ('uniform', 0.5, 1),
+                     ('uniform', -5, 5), None, None)
+        jams_file = os.path.join(tmpdir, 'soundscape.jams')
+        audio, _, _, _ = sc.generate(
+            jams_path=jams_file, disable_instantiation_warnings=True)
+
+        prepared_audio, _, _, _ = scaper.generate_from_jams(
+            jams_file, fg_path=prepared_fg_path, bg_path=prepared_bg_path)
+        assert prepared_audio.shape == audio.shape
+        assert np.allclose(audio, prepared_audio, atol=0.1)
+
+
+def test_cli_prepare():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        assert main(['prepare', FG_PATH, BG_PATH, tmpdir, '--sr', '16000',
+                     '--n-channels', '1', '--n-jobs', '1']) == 0
+        manifest = _read_prepared_manifest(os.path.join(tmpdir, 'background'))
+        assert manifest['sr'] == 16000
@@ -0,0 +1,170 @@
+'''
+Tests for functions in dataset.py
+'''
+
+from scaper.dataset import DatasetWriter, Dataset
+from scaper.audio import EventAudio
+from scaper.scaper_exceptions import ScaperError
+from tests.helpers import create_scaper
+import scaper
+import backports.tempfile
+import numpy as np
+import os
+import pickle
+import pytest
+
+
+def _check_dataset(path, outputs, dtype='float32', keys=None, **kwargs):
+    atol = 1.0 / 32767 if dtype == 'int16' else 1e-6
+    with Dataset(path, **kwargs) as dataset:
+        assert len(dataset) == len(outputs)
+        if keys is not None:
+            assert dataset.keys() == keys
+        for (audio, jam, events), (ref_audio, ref_jam, ref_events) in zip(
+                dataset, outputs):
+            assert audio.shape == ref_audio.shape
+            assert np.allclose(audio, ref_audio, atol=atol)
+            ann = jam.annotations.search(namespace='scaper')[0]
+            ref_ann = ref_jam.annotations.search(namespace='scaper')[0]
+            assert ann.data == ref_ann.data
+            assert len(events) == len(ref_events)
+            for event, ref_event in zip(events, ref_events):
+                assert isinstance(event, EventAudio)
+                assert np.allclose(np.asarray(event),
+                                   np.asarray(ref_event), atol=atol)
+
+        # random access
+        audio, _, _ = dataset[-1]
+        assert np.allclose(audio, outputs[-1][0], atol=atol)
+        with pytest.raises(IndexError):
+            dataset.read_audio(len(outputs))
+
+
+def _generate(sc, n, dataset_writer=None):
+    outputs = []
+    for _ in range(n):
+        audio, jam, _, events = sc.generate(
+            dataset_writer=dataset_writer, fix_clipping=True,
+            disable_instantiation_warnings=True)
+        outputs.append((audio, jam, events))
+    return outputs
+
+
+@pytest.mark.parametrize('dtype', ['float32', 'int16'])
+def test_dataset_npy(dtype):
+    sc = create_scaper(sr=16000, n_events=2, event_audio_format='sparse')
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dataset')
+        with DatasetWriter(path, sc.sr, dtype=dtype, chunk_samples=10000,
+                           backend='npy') as writer:
+            outputs = _generate(sc, 3, dataset_writer=writer)
+            assert len(writer) == 3
+        _check_dataset(path, outputs, dtype=dtype, keys=[0, 1, 2])
+
+        # append to the existing dataset, with keys
+        with DatasetWriter(path, sc.sr, dtype=dtype,
+                           backend='npy') as writer:
+            output = _generate(sc, 1)[0]
+            assert writer.write(*output, key='extra') == 'extra'
+            assert len(writer) == 4
+        _check_dataset(path, outputs + [output], dtype=dtype,
+                       keys=[0, 1, 2, 'extra'])
+
+        # different settings
+        pytest.raises(ScaperError, DatasetWriter, path, 22050, dtype=dtype,
+                      backend='npy')
+
+
+def test_dataset_unflushed():
+    sc = create_scaper(sr=16000, n_events=2, event_audio_format='sparse')
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dataset')
+        writer = DatasetWriter(path, sc.sr, chunk_samples=30000,
+                               backend='npy')
+        outputs = _generate(sc, 2, dataset_writer=writer)
+        writer.flush()
+        # full chunks of the soundscapes written after the flush are saved,
+        # but the dataset isn't: they are lost, as if the process had died
+        _generate(sc, 3, dataset_writer=writer)
+        del writer
+
+        with DatasetWriter(path, sc.sr, backend='npy') as writer:
+            assert len(writer) == 2
+            outputs += _generate(sc, 1, dataset_writer=writer)
+        _check_dataset(path, outputs, keys=[0, 1, 2])
+
+
+def test_dataset_no_stems():
+    sc = create_scaper(sr=16000, n_events=2, event_audio_format='sparse')
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dataset')
+        with DatasetWriter(path, sc.sr, save_stems=False,
+                           backend='npy') as writer:
+            audio, jam, _, _ = sc.generate(
+                disable_instantiation_warnings=True)
+            writer.write(audio, jam)
+        with Dataset(path) as dataset:
+            assert np.allclose(dataset.read_audio(0), audio, atol=1e-6)
+            assert dataset.read_events(0) is None
+
+
+def test_dataset_errors():
+    sc = create_scaper(sr=16000, n_events=2, event_audio_format='sparse')
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dataset')
+        pytest.raises(ScaperError, DatasetWriter, path, sc.sr,
+                      dtype='int8', backend='npy')
+        pytest.raises(ScaperError, DatasetWriter, path, sc.sr,
+                      backend='zarr')
+        pytest.raises(ScaperError, Dataset, tmpdir, backend='npy')
+
+        with DatasetWriter(path, sc.sr, backend='npy') as writer:
+            # stems are required
+            audio, jam, _, _ = sc.generate(
+                disable_instantiation_warnings=True)
+            pytest.raises(ScaperError, writer.write, audio, jam)
+            pytest.raises(ScaperError, sc.generate, no_audio=True,
+                          dataset_writer=writer)
+            pytest.raises(ScaperError, pickle.dumps, writer)
+            pytest.raises(ScaperError, sc.generate_batch, 2, tmpdir,
+                          n_jobs=2, dataset_writer=writer)
+
+
+def test_generate_batch_dataset():
+    sc = create_scaper(sr=16000, n_events=2, event_audio_format='sparse')
+    sc.event_audio_format = None
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dataset')
+        out_dir = os.path.join(tmpdir, 'batch')
+        with DatasetWriter(path, sc.sr, backend='npy') as writer:
+            sc.generate_batch(3, out_dir, n_jobs=1, seed=0, save_audio=False,
+                              dataset_writer=writer, fix_clipping=True)
+        assert not any(name.endswith('.wav')
+                       for name in os.listdir(out_dir))
+
+        with Dataset(path) as dataset:
+            assert dataset.keys() == [0, 1, 2]
+            for index, (audio, jam, events) in enumerate(dataset):
+                ann = jam.annotations.search(namespace='scaper')[0]
+                jams_path = os.path.join(
+                    out_dir, 'soundscape{:d}.jams'.format(index))
+                audio_ref, _, _, events_ref = scaper.generate_from_jams(
+                    jams_path)
+                assert np.allclose(audio, audio_ref, atol=1e-6)
+                assert len(events) == len(ann.data)
+                for event, event_ref in zip(events, events_ref):
+                    assert np.allclose(np.asarray(event), event_ref,
+                                       atol=1e-6)
+
+
+def test_dataset_hdf5():
+    pytest.importorskip('h5py')
+    sc = create_scaper(sr=16000, n_events=2, event_audio_format='sparse')
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dataset.h5')
+        with DatasetWriter(path, sc.sr, chunk_samples=10000,
+                           backend='hdf5') as writer:
+            outputs = _generate(sc, 2, dataset_writer=writer)
+        with DatasetWriter(path, sc.sr) as writer:
+            outputs += _generate(sc, 1, dataset_writer=writer)
+        _check_dataset(path, outputs, keys=[0, 1, 2])
@@ -0,0 +1,60 @@
+'''
+Tests for functions in jams_io.py
+'''
+
+from scaper.jams_io import load_jams, save_jams, _jam_to_json
+from tests.helpers import create_scaper
+import scaper
+import backports.tempfile
+import glob
+import io
+import jams
+import json
+import os
+import pytest
+
+
+# FIXTURES
+REG_PATH = 'tests/data/regression'
+
+
+def test_load_save_jams():
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        for jams_path in sorted(glob.glob(os.path.join(REG_PATH, '*.jams'))):
+            jam = load_jams(jams_path)
+            assert jam == jams.load(jams_path)
+
+            # lossless round trip, same file as jams.save
+            saved_path = os.path.join(tmpdir, os.path.basename(jams_path))
+            save_jams(jam, saved_path)
+            with open(jams_path) as f, open(saved_path) as saved:
+                assert json.load(saved) == json.load(f)
+            assert load_jams(saved_path) == jam
+            buf, ref_buf = io.StringIO(), io.StringIO()
+            save_jams(jam, buf)
+            jam.save(ref_buf)
+            assert buf.getvalue() == ref_buf.getvalue()
+
+            # open files
+            with open(jams_path) as f:
+                assert load_jams(f) == jam
+
+    sc = create_scaper()
+    _, jam, _, _ = sc.generate(no_audio=True,
+                               disable_instantiation_warnings=True)
+    assert _jam_to_json(jam) == jam.__json__
+
+
+def test_load_save_jams_validation():
+    jam = jams.load(os.path.join(REG_PATH, 'soundscape_20200501_44100.jams'))
+    jam.file_metadata.duration = 'long'
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        jams_path = os.path.join(tmpdir, 'invalid.jams')
+        # validation is opt-in
+        save_jams(jam, jams_path)
+        assert load_jams(jams_path).file_metadata.duration == 'long'
+        pytest.raises(jams.SchemaError, save_jams, jam, jams_path,
+                      validate=True)
+        pytest.raises(jams.SchemaError, load_jams, jams_path, validate=True)
+        pytest.raises(jams.SchemaError, scaper.generate_from_jams,
+                      jams_path, validate=True)
@@ -0,0 +1,66 @@
+'''
+Tests for functions in jsonl.py
+'''
+
+from scaper.jsonl import JsonlWriter, read_jsonl, load_jsonl
+from scaper.jsonl import jam_to_record, record_to_jam
+from scaper.scaper_exceptions import ScaperError
+from tests.helpers import create_scaper
+import scaper
+import backports.tempfile
+import jams
+import json
+import numpy as np
+import os
+import pytest
+
+
+def test_jsonl_records():
+    sc = create_scaper()
+    _, jam, _, _ = sc.generate(no_audio=True,
+                               disable_instantiation_warnings=True)
+    record = jam_to_record(jam, key='a')
+    assert record['key'] == 'a'
+
+    # same as saving and loading a JAMS file
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        jams_path = os.path.join(tmpdir, 'soundscape.jams')
+        jam.save(jams_path)
+        loaded = record_to_jam(json.loads(json.dumps(record)))
+        assert loaded == jams.load(jams_path)
+        loaded.validate()
+
+
+def test_jsonl_writer():
+    sc = create_scaper()
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'annotations.jsonl')
+        generated = []
+        with JsonlWriter(path) as writer:
+            for _ in range(3):
+                audio, jam, _, _ = sc.generate(
+                    annotation_writer=writer,
+                    disable_instantiation_warnings=True)
+                generated.append((audio, jam))
+            assert writer.write(jam, key='last') == 'last'
+
+        # appending continues the numbering
+        with JsonlWriter(path) as writer:
+            assert writer.write(jam) == 4
+
+        records = list(read_jsonl(path))
+        assert [key for key, _ in records] == [0, 1, 2, 'last', 4]
+        for (_, jam), (_, ref_jam) in zip(records, generated):
+            assert jam.annotations[0].data == ref_jam.annotations[0].data
+        assert load_jsonl(path, 'last').annotations[0].data == \
+            generated[-1][1].annotations[0].data
+        pytest.raises(ScaperError, load_jsonl, path, 'missing')
+
+        # entries can be regenerated and trimmed
+        jam = load_jsonl(path, 1)
+        audio, regenerated_jam, _, _ = scaper.generate_from_jams(jam)
+        assert np.allclose(audio, generated[1][0])
+        assert jam == load_jsonl(path, 1)
+        trimmed = scaper.trim(None, jam, None, None, 2.0, 7.0, no_audio=True)
+        assert trimmed.file_metadata.duration == 5.0
+        assert trimmed.annotations[0].sandbox.scaper['duration'] == 5.0
@@ -0,0 +1,80 @@
+'''
+Tests for functions in ring.py
+'''
+
+from scaper.ring import SharedAudioRing
+from scaper.audio import EventAudio
+from scaper.scaper_exceptions import ScaperError
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pickle
+import pytest
+
+
+def _write_slot(ring, slot, value):
+    audio = np.full((ring.n_samples, ring.n_channels), value)
+    return ring.write(slot, audio, [audio, 2 * audio])
+
+
+def test_shared_audio_ring():
+    with SharedAudioRing(3, 100, n_channels=2, n_stems=2) as ring:
+        assert ring.n_free == 3
+        slots = [ring.acquire() for _ in range(3)]
+        assert sorted(slots) == [0, 1, 2]
+        assert ring.n_free == 0
+        pytest.raises(ScaperError, ring.acquire)
+
+        # dense and sparse events, shorter soundscapes
+        audio = np.random.RandomState(0).rand(80, 2)
+        event = EventAudio(audio[:10], 30, 80, scale=0.5)
+        assert ring.write(slots[0], audio, [audio, event]) == (80, 2)
+        mix, events = ring.read(slots[0], 80, 2)
+        assert np.array_equal(mix, audio)
+        assert np.array_equal(events[0], audio)
+        assert np.array_equal(events[1], event.to_dense())
+        assert ring.write(slots[1], audio) == (80, None)
+        assert ring.read(slots[1], 80)[1] is None
+
+        # soundscapes that don't fit
+        pytest.raises(ScaperError, ring.write, slots[2], np.zeros((101, 2)))
+        pytest.raises(ScaperError, ring.write, slots[2], np.zeros((10, 1)))
+        pytest.raises(ScaperError, ring.write, slots[2], np.zeros((10, 2)),
+                      [np.zeros((10, 2))] * 3)
+
+        # slots are released by index or by any of their views
+        ring.release(mix)
+        ring.release(ring.read(slots[1], 80)[0][10:])
+        # e.g. slot indices stored in numpy arrays
+        ring.release(np.array(slots)[2])
+        assert ring.n_free == 3
+        pytest.raises(ScaperError, ring.release, slots[2])
+        pytest.raises(ScaperError, ring.release, np.int64(slots[2]))
+        pytest.raises(ScaperError, ring.release, 3)
+        pytest.raises(ScaperError, ring.release, np.zeros(3))
+
+        # copies in other processes write to the same memory, but can't
+        # manage slots
+        copy = pickle.loads(pickle.dumps(ring))
+        pytest.raises(ScaperError, copy.acquire)
+        pytest.raises(ScaperError, copy.release, 0)
+        slot = ring.acquire()
+        with ProcessPoolExecutor(1) as executor:
+            shape = executor.submit(_write_slot, ring, slot, 0.25).result()
+        assert shape == (100, 2)
+        mix, events = ring.read(slot, *shape)
+        assert np.all(mix == 0.25)
+        assert np.all(events[1] == 0.5)
+        del mix, events
+        copy.close()
+
+    # the ring is closed on exit
+    pytest.raises(ScaperError, ring.acquire)
+
+    with SharedAudioRing(np.int64(2), np.int32(100)) as ring:
+        assert (ring.n_slots, ring.n_samples) == (2, 100)
+        assert type(ring.n_slots) is int
+
+    pytest.raises(ScaperError, SharedAudioRing, 0, 100)
+    pytest.raises(ScaperError, SharedAudioRing, 1, 100.0)
+    pytest.raises(ScaperError, SharedAudioRing, 1, 100, n_stems=-1)
+    pytest.raises(ScaperError, SharedAudioRing, 1, 100, dtype='int16')
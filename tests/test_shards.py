@@ -0,0 +1,148 @@
+'''
+Tests for functions in shards.py
+'''
+
+from scaper.shards import ShardWriter, read_shard
+from scaper.scaper_exceptions import ScaperError
+from tests.helpers import create_scaper
+import backports.tempfile
+import glob
+import numpy as np
+import os
+import pickle
+import pytest
+import soundfile
+import tarfile
+
+
+def _shards(out_dir):
+    return sorted(glob.glob(os.path.join(out_dir, '*.tar')))
+
+
+def test_shard_writer():
+    sc = create_scaper(sr=16000)
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        outputs = []
+        with ShardWriter(tmpdir, max_count=2) as writer:
+            for _ in range(5):
+                audio, jam, annotation_list, _ = sc.generate(
+                    fix_clipping=True, shard_writer=writer,
+                    disable_instantiation_warnings=True)
+                outputs.append((audio, jam, annotation_list))
+            # the current shard is only renamed once finalized
+            assert len(_shards(tmpdir)) == 2
+        shards = _shards(tmpdir)
+        assert [os.path.basename(path) for path in shards] == [
+            'shard-{:06d}.tar'.format(i) for i in range(3)]
+        assert writer.shard_paths == shards
+        assert sorted(os.listdir(tmpdir)) == sorted(
+            [os.path.basename(path) for path in shards] +
+            ['shard-{:06d}.index.jsonl'.format(i) for i in range(3)])
+
+        # WebDataset layout
+        with tarfile.open(shards[0]) as tar:
+            assert tar.getnames() == [
+                'shard-000000-000000.wav', 'shard-000000-000000.jams',
+                'shard-000000-000000.txt', 'shard-000000-000001.wav',
+                'shard-000000-000001.jams', 'shard-000000-000001.txt']
+            txt = tar.extractfile('shard-000000-000001.txt').read().decode()
+            rows = [row.split('\t') for row in txt.splitlines()]
+            assert rows == [[str(onset), str(offset), label]
+                            for onset, offset, label in outputs[1][2]]
+
+        # read back with the index files
+        items = [item for path in shards for item in read_shard(path)]
+        assert len(items) == 5
+        for (key, audio, jam), (ref_audio, ref_jam, _) in zip(items,
+                                                               outputs):
+            assert np.allclose(audio, ref_audio, atol=1e-6)
+            ann = jam.annotations.search(namespace='scaper')[0]
+            ref_ann = ref_jam.annotations.search(namespace='scaper')[0]
+            assert ann.data == ref_ann.data
+
+        # new writers continue the numbering
+        with ShardWriter(tmpdir, audio_format='FLAC') as writer:
+            audio, jam, annotation_list, _ = sc.generate(
+                disable_instantiation_warnings=True)
+            assert writer.write(audio, jam, annotation_list,
+                                key='a/b') == 'a/b'
+        assert writer.shard_paths == [
+            os.path.join(tmpdir, 'shard-000003.tar')]
+        with tarfile.open(writer.shard_paths[0]) as tar:
+            assert tar.getnames() == ['a/b.flac', 'a/b.jams', 'a/b.txt']
+        (key, audio, _), = read_shard(writer.shard_paths[0])
+        assert key == 'a/b'
+        assert audio.shape == (sc.sr * 10, 1)
+
+
+def test_shard_writer_max_size():
+    sc = create_scaper(sr=16000)
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        # every soundscape is larger than max_size
+        with ShardWriter(tmpdir, max_size=1000) as writer:
+            for _ in range(3):
+                sc.generate(shard_writer=writer,
+                            disable_instantiation_warnings=True)
+        shards = _shards(tmpdir)
+        assert len(shards) == 3
+        for path in shards:
+            assert len(list(read_shard(path))) == 1
+
+        with ShardWriter(tmpdir, prefix='big') as writer:
+            for _ in range(3):
+                sc.generate(shard_writer=writer,
+                            disable_instantiation_warnings=True)
+        assert len(glob.glob(os.path.join(tmpdir, 'big-*.tar'))) == 1
+
+
+def test_shard_writer_errors():
+    sc = create_scaper(sr=16000)
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        pytest.raises(ScaperError, ShardWriter, tmpdir, max_size=0)
+        pytest.raises(ScaperError, ShardWriter, tmpdir, max_count=0)
+        pytest.raises(ScaperError, ShardWriter, tmpdir, audio_format='XYZ')
+
+        with ShardWriter(tmpdir) as writer:
+            audio, jam, annotation_list, _ = sc.generate(
+                disable_instantiation_warnings=True)
+            for key in ['', 'a.b', 'a/b.c']:
+                pytest.raises(ScaperError, writer.write, audio, jam,
+                              annotation_list, key=key)
+            pytest.raises(ScaperError, sc.generate, no_audio=True,
+                          shard_writer=writer)
+            pytest.raises(ScaperError, pickle.dumps, writer)
+            pytest.raises(ScaperError, sc.generate_batch, 2, tmpdir,
+                          n_jobs=2, shard_writer=writer)
+        assert _shards(tmpdir) == []
+
+
+def test_generate_batch_shard_writer():
+    sc = create_scaper(sr=16000)
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        out_dir = os.path.join(tmpdir, 'batch')
+        shard_dir = os.path.join(tmpdir, 'shards')
+        with ShardWriter(shard_dir, max_count=2) as writer:
+            sc.generate_batch(3, out_dir, n_jobs=1, seed=0, save_audio=False,
+                              save_jams=False, save_txt=False,
+                              shard_writer=writer)
+            # the last shard is finalized at the end of the batch
+            assert len(writer.shard_paths) == 2
+        assert not [name for name in os.listdir(out_dir)
+                    if not name.startswith('.scaper_batch')]
+
+        items = [item for path in _shards(shard_dir)
+                 for item in read_shard(path)]
+        assert [key for key, _, _ in items] == [
+            'soundscape{:d}'.format(i) for i in range(3)]
+
+        # same soundscapes as saved files
+        paths = sc.generate_batch(3, os.path.join(tmpdir, 'files'),
+                                  n_jobs=1, seed=0)
+        for (_, audio, _), (audio_path, _, _) in zip(items, paths):
+            ref_audio, _ = soundfile.read(audio_path, always_2d=True)
+            assert np.allclose(audio, ref_audio)
+
+        # soundscapes are recorded once their shard is finalized
+        with ShardWriter(shard_dir, max_count=2) as writer:
+            assert sc.generate_batch(3, out_dir, n_jobs=1, seed=0,
+                                     shard_writer=writer) == []
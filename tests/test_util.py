@@ -6,20 +6,25 @@ Tests for functions in util.py
 
 from scaper.util import _close_temp_files
 from scaper.util import _set_temp_logging_level
+from scaper.util import _set_temp_thread_logging_level
 from scaper.util import _validate_folder_path
 from scaper.util import _get_sorted_files
 from scaper.util import _populate_label_list
 from scaper.util import _sample_trunc_norm, _sample_choose, _sample_choose_weighted
+from scaper.util import _sample_trunc_norm_fast
+from scaper.util import _make_sampler
 from scaper.util import max_polyphony
 from scaper.util import polyphony_gini
 from scaper.util import is_real_number, is_real_array
-from scaper.util import _check_random_state
+from scaper.util import _check_random_state, _spawn_random_states
+from scaper.util import _random_state_from_seed
 from scaper.scaper_exceptions import ScaperError
 from scaper.scaper_warnings import ScaperWarning
 import tempfile
 import os
 import logging
 import pytest
+import threading
 import shutil
 import numpy as np
 from scipy.stats import truncnorm
@@ -97,6 +102,26 @@ def test_set_temp_logging_level():
     assert logging.getLevelName(logger.level) == 'DEBUG'
 
 
+def test_set_temp_thread_logging_level(caplog):
+    '''
+    Ensure messages are only ignored in the current thread
+
+    '''
+    logger = logging.getLogger('sox')
+    with caplog.at_level('WARNING'):
+        with _set_temp_thread_logging_level('CRITICAL'):
+            logger.warning('ignored')
+            thread = threading.Thread(
+                target=lambda: logger.warning('other thread'))
+            thread.start()
+            thread.join()
+            logger.critical('critical')
+        logger.warning('restored')
+    assert [record.getMessage() for record in caplog.records] == [
+        'other thread', 'critical', 'restored']
+    assert logger.filters == []
+
+
 def test_get_sorted_files():
     '''
     Ensure files are returned in expected order.
@@ -148,15 +173,54 @@ def test_check_random_state():
     rng = _check_random_state(rng_test)
     assert type(rng) == rng_type
 
+    # seed is Generator, BitGenerator or SeedSequence
+    rng_test = np.random.default_rng(10)
+    assert _check_random_state(rng_test) is rng_test
+    rng = _check_random_state(np.random.Philox(10))
+    assert isinstance(rng, np.random.Generator)
+    assert isinstance(rng.bit_generator, np.random.Philox)
+    rng = _check_random_state(np.random.SeedSequence(10))
+    assert isinstance(rng.bit_generator, np.random.PCG64)
+    assert rng.random() == np.random.default_rng(10).random()
+
     # seed is none of the above : error
     pytest.raises(ValueError, _check_random_state, 'random')
 
 
+def test_spawn_random_states():
+    for make_rng in [np.random.RandomState, np.random.default_rng,
+                     lambda seed: np.random.Generator(np.random.Philox(seed))]:
+        rng = make_rng(0)
+        children = _spawn_random_states(rng, 3)
+        assert len(children) == 3
+        for child in children:
+            assert type(child) == type(rng)
+            if isinstance(rng, np.random.Generator):
+                assert type(child.bit_generator) == type(rng.bit_generator)
+        # independent streams
+        values = [child.uniform(size=5) for child in children]
+        assert not np.allclose(values[0], values[1])
+
+        # reproducible, and the parent is advanced by the same amount
+        # whatever the number of children
+        other = make_rng(0)
+        assert np.array_equal(
+            _spawn_random_states(other, 1)[0].uniform(size=5), values[0])
+        assert rng.uniform() == other.uniform()
+
+    rng = _random_state_from_seed(np.random.SeedSequence(0))
+    assert isinstance(rng, np.random.RandomState)
+
+
 def test_sample_choose():
     # using choose with duplicates will issue a warning
     rng = _check_random_state(0)
     pytest.warns(ScaperWarning, _sample_choose, [0, 1, 2, 2, 2], rng)
 
+    # Generators are supported as well
+    rng = _check_random_state(np.random.default_rng(0))
+    assert _sample_choose(['a', 'b'], rng) in ['a', 'b']
+
 
 def test_sample_choose_weighted():
     # make sure probabilities are factored in
@@ -198,6 +262,91 @@ def test_sample_trunc_norm():
     assert np.allclose(hist, trunc_closed, atol=0.015)
 
 
+def test_sample_trunc_norm_fast():
+    '''
+    Should return values from a truncated normal distribution, with a single
+    uniform draw per value.
+
+    '''
+    rng = _check_random_state(0)
+    mu, sigma, trunc_min, trunc_max = 2, 1, 0, 5
+    x = _sample_trunc_norm_fast(mu, sigma, trunc_min, trunc_max, rng,
+                                size=100000)
+    assert x.shape == (100000,)
+    assert (x >= trunc_min).all() and (x <= trunc_max).all()
+    hist, bins = np.histogram(x, bins=np.arange(0, 10.1, 0.2), density=True)
+    xticks = bins[:-1] + 0.1
+    a, b = (trunc_min - mu) / float(sigma), (trunc_max - mu) / float(sigma)
+    trunc_closed = truncnorm.pdf(xticks, a, b, mu, sigma)
+    assert np.allclose(hist, trunc_closed, atol=0.015)
+
+    # intervals far in the tails
+    for trunc_min, trunc_max in [(6, 8), (-8, -6)]:
+        x = _sample_trunc_norm_fast(0, 1, trunc_min, trunc_max, rng,
+                                    size=1000)
+        assert (x >= trunc_min).all() and (x <= trunc_max).all()
+        assert np.isclose(np.median(x), truncnorm.median(
+            trunc_min, trunc_max), atol=0.05)
+
+    # scalars, arrays of parameters and reproducibility
+    x = _sample_trunc_norm_fast(mu, sigma, trunc_min, trunc_max,
+                                _check_random_state(1))
+    assert isinstance(x, float)
+    x = _sample_trunc_norm_fast([0, 10], 1, [-1, 9], [1, 11],
+                                _check_random_state(1))
+    assert x.shape == (2,) and -1 <= x[0] <= 1 and 9 <= x[1] <= 11
+    assert x[0] == _sample_trunc_norm_fast(0, 1, -1, 1, _check_random_state(1))
+
+    # samplers use the fast method unless legacy_truncnorm is True
+    dist_tuple = ('truncnorm', mu, sigma, trunc_min, trunc_max)
+    sampler = _make_sampler(dist_tuple)
+    assert sampler.sample(_check_random_state(2)) == _sample_trunc_norm_fast(
+        mu, sigma, trunc_min, trunc_max, _check_random_state(2))
+    assert np.allclose(
+        sampler.sample_n(_check_random_state(2), 3),
+        _sample_trunc_norm_fast(mu, sigma, trunc_min, trunc_max,
+                                _check_random_state(2), size=3))
+    sampler = _make_sampler(dist_tuple, legacy_truncnorm=True)
+    assert sampler.sample(_check_random_state(2)) == _sample_trunc_norm(
+        mu, sigma, trunc_min, trunc_max, _check_random_state(2))
+
+
+def test_sampler_sample_n():
+    '''
+    Compiled samplers should return arrays of values following the
+    distribution tuples.
+
+    '''
+    rng = _check_random_state(0)
+    x = _make_sampler(('const', 'car_horn')).sample_n(rng, 3)
+    assert x.dtype == object and list(x) == ['car_horn'] * 3
+    assert list(_make_sampler(('const', 1)).sample_n(rng, 2)) == [1.0, 1.0]
+
+    x = _make_sampler(('choose', ['a', 'b', 'c'])).sample_n(rng, 1000)
+    assert set(x) == {'a', 'b', 'c'}
+    pytest.warns(ScaperWarning, _make_sampler(('choose', ['a', 'a'])).sample_n,
+                 rng, 1)
+    x = _make_sampler(('choose_weighted', [1, 2], [0, 1])).sample_n(rng, 100)
+    assert x.dtype == float and (x == 2).all()
+
+    x = _make_sampler(('uniform', 1, 2)).sample_n(rng, 1000)
+    assert x.shape == (1000,) and (x >= 1).all() and (x <= 2).all()
+    x = _make_sampler(('normal', 5, 0.1)).sample_n(rng, 1000)
+    assert np.isclose(x.mean(), 5, atol=0.05)
+
+    mu, sigma, trunc_min, trunc_max = 2, 1, 0, 5
+    sampler = _make_sampler(('truncnorm', mu, sigma, trunc_min, trunc_max))
+    x = sampler.sample_n(rng, 100000)
+    assert (x >= trunc_min).all() and (x <= trunc_max).all()
+    hist, bins = np.histogram(x, bins=np.arange(0, 10.1, 0.2), density=True)
+    xticks = bins[:-1] + 0.1
+    a, b = (trunc_min - mu) / float(sigma), (trunc_max - mu) / float(sigma)
+    trunc_closed = truncnorm.pdf(xticks, a, b, mu, sigma)
+    assert np.allclose(hist, trunc_closed, atol=0.015)
+
+    pytest.raises(ScaperError, _make_sampler, ('gamma', 1, 1))
+
+
 def test_max_polyphony():
     '''
     Test the computation of polyphony of a scaper soundscape instantiation.
@@ -0,0 +1,101 @@
+'''
+Tests for functions in writer.py
+'''
+
+from scaper.writer import AsyncWriter
+from scaper.scaper_exceptions import ScaperError
+from tests.helpers import create_scaper
+import backports.tempfile
+import numpy as np
+import os
+import pickle
+import pytest
+import soundfile
+import threading
+import time
+
+
+def _append(values, value, delay=0.0):
+    time.sleep(delay)
+    values.append(value)
+
+
+def _fail():
+    raise IOError('disk full')
+
+
+def test_async_writer():
+    # writes run in the background, flush waits for them
+    values = []
+    with AsyncWriter(n_threads=1) as writer:
+        for i in range(5):
+            writer.submit(_append, values, i, delay=0.01)
+        writer.flush()
+        assert values == list(range(5))
+        assert writer.pending() == []
+
+    # no more than max_pending writes are queued
+    event = threading.Event()
+    writer = AsyncWriter(n_threads=1, max_pending=2)
+    writer.submit(event.wait)
+    writer.submit(_append, values, 5)
+    blocked = threading.Thread(target=writer.submit,
+                               args=(_append, values, 6))
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+    event.set()
+    blocked.join()
+    writer.close()
+    assert values == list(range(7))
+
+    # errors are raised by the next call
+    writer = AsyncWriter()
+    writer.submit(_fail)
+    pytest.raises(IOError, writer.flush)
+    writer.flush()
+    future = writer.submit(_fail)
+    future.exception()
+    time.sleep(0.1)
+    pytest.raises(IOError, writer.submit, _append, values, 7)
+    writer.submit(_fail)
+    pytest.raises(IOError, writer.close)
+
+    # errors don't mask the exceptions raised in a with block
+    with pytest.raises(ValueError):
+        with AsyncWriter() as writer:
+            writer.submit(_fail)
+            raise ValueError
+
+    pytest.raises(ScaperError, pickle.dumps, AsyncWriter())
+    with AsyncWriter(np.int64(2), max_pending=np.int64(4)) as writer:
+        assert (writer.n_threads, writer.max_pending) == (2, 4)
+    pytest.raises(ScaperError, AsyncWriter, 0)
+    pytest.raises(ScaperError, AsyncWriter, 2.0)
+    pytest.raises(ScaperError, AsyncWriter, 1, max_pending=0)
+
+
+def test_generate_async_writer():
+    sc = create_scaper()
+
+    with backports.tempfile.TemporaryDirectory() as tmpdir:
+        outputs = []
+        for name, writer in [('sync', None), ('async', AsyncWriter())]:
+            sc.set_random_state(0)
+            paths = [os.path.join(tmpdir, name + ext)
+                     for ext in ['.wav', '.jams', '.txt']]
+            audio, _, _, _ = sc.generate(
+                *paths[:2], txt_path=paths[2], save_isolated_events=True,
+                fix_clipping=True, writer=writer,
+                disable_instantiation_warnings=True)
+            if writer is not None:
+                writer.close()
+            events_path = os.path.join(tmpdir, name + '_events')
+            saved_audio, _ = soundfile.read(paths[0], always_2d=True)
+            assert np.allclose(saved_audio, audio, atol=1e-6)
+            with open(paths[2]) as f:
+                txt = f.read()
+            outputs.append((saved_audio, txt, sorted(os.listdir(events_path)),
+                            os.path.getsize(paths[1]) > 0))
+        assert np.array_equal(outputs[0][0], outputs[1][0])
+        assert outputs[0][1:] == outputs[1][1:]